@@ -1,30 +1,134 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+import os
+
+# Shipped placeholder; the admin API stays closed until it is replaced
+DEFAULT_API_SECRET_KEY = "MonMotDePasseSecret123!"
 
 class Settings(BaseSettings):
     # API Keys
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    API_SECRET_KEY: str = "MonMotDePasseSecret123!"
+    API_SECRET_KEY: str = DEFAULT_API_SECRET_KEY
     
     # OpenAI Config
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_TEMPERATURE: float = 0.3
-    OPENAI_MAX_TOKENS: int = 2000
+    OPENAI_MAX_TOKENS: int = 2000  # completion budget sent as max_tokens
+    OPENAI_MAX_INPUT_TOKENS: int = 6000  # prompt budget; CV/JD sections are trimmed to fit
+    OPENAI_BASE_URL: str = ""  # e.g. a local stub server, empty = api.openai.com
+    
+    # LLM Call Policy
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT: float = 30.0  # per-call deadline, retries included
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_BACKOFF_MAX: float = 8.0
+    LLM_BREAKER_THRESHOLD: int = 5  # consecutive failures before opening
+    LLM_BREAKER_RESET: float = 30.0  # seconds open before a half-open probe
+    
+    # Hybrid Engine: heuristic first, LLM when confidence is low or tier is premium
+    HYBRID_CONFIDENCE_THRESHOLD: float = 0.5  # 0 = escalate only premium requests
+    HYBRID_LATENCY_BUDGET: float = 8.0  # seconds per request before the heuristic result is served
+    
+    # LLM Response Cache
+    LLM_CACHE_SIZE: int = 1024
+    LLM_CACHE_TTL: int = 7 * 24 * 3600
+    LLM_CACHE_DB: str = ""  # e.g. "cache/llm_responses.db", empty = memory only
     
     # Rate Limiting
-    RATE_LIMIT_REQUESTS: int = 10
+    RATE_LIMIT_REQUESTS: int = 10  # default budget for routes not listed below
     RATE_LIMIT_PERIOD: int = 60
+    RATE_LIMIT_ROUTES: dict = {  # "requests/period" per route, per client IP
+        "/extract": "20/60",
+        "/optimize": "10/60",
+        "/skill-gaps": "10/60",
+        "/optimize/batch": "2/60",
+        "/skill-gaps/batch": "2/60",
+        "/rank": "5/60",
+        "/jobs": "20/60"
+    }
+    RATE_LIMIT_MAX_KEYS: int = 100_000  # per route; idle clients are evicted first
+    RATE_LIMIT_STORE_URL: str = ""  # "sqlite:///data/counters.db" or "redis://host:6379/0" to share limits across workers, empty = per process
+    RATE_LIMIT_SYNC_INTERVAL: float = 0.5  # seconds between pushes of local hits to the shared store
+    RATE_LIMIT_BATCH_SIZE: int = 50  # or sooner, once this many hits are pending
+    LLM_DAILY_QUOTA: int = 0  # LLM analyses per API key (or client IP) per UTC day, 0 = unlimited
+    LLM_QUOTA_API_KEYS: list = []  # issued client keys with their own quota; any other key counts as its IP
     
     # CORS
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
     
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    
+    # Extraction Budgets
+    PDF_MAX_PAGES: int = 30
+    EXTRACTION_MAX_CHARS: int = 100_000
     ALLOWED_EXTENSIONS: list = [".pdf", ".docx", ".doc", ".txt"]
     
+    # Extraction Pool
+    EXTRACTION_WORKERS: int = 0  # 0 = os.cpu_count()
+    EXTRACTION_QUEUE_SIZE: int = 16
+    EXTRACTION_TIMEOUT: float = 30.0
+    
+    # Batch Analysis Pool
+    ANALYSIS_WORKERS: int = 0  # 0 = os.cpu_count()
+    ANALYSIS_QUEUE_SIZE: int = 16
+    ANALYSIS_TIMEOUT: float = 60.0
+    BATCH_MAX_ITEMS: int = 500
+    BATCH_CHUNK_SIZE: int = 50
+    
+    # Async Jobs (/jobs)
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_SIZE: int = 100
+    JOB_RESULT_TTL: int = 3600
+    JOB_STORE_PATH: str = ""  # e.g. "data/jobs.db", empty = memory only
+    JOB_LLM_BUDGET: float = 120.0  # seconds a queued analysis waits for the LLM (HYBRID_LATENCY_BUDGET is for requests)
+    
+    # Registered Job Descriptions
+    JD_PROFILE_CACHE_SIZE: int = 512
+    JD_PROFILE_TTL: int = 24 * 3600
+    
+    # Near-Duplicate Detection (threshold 0 = disabled)
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+    NEAR_DUPLICATE_MAX_ITEMS: int = 50_000
+    MINHASH_PERMUTATIONS: int = 128
+    
+    # Candidate Index (empty = disabled)
+    CANDIDATE_STORE_PATH: str = ""  # e.g. "data/candidates.db"
+    
+    # Ranking
+    RANK_MAX_ITEMS: int = 10_000
+    RANK_VECTOR_CACHE_SIZE: int = 20_000
+    
+    # Extraction Cache
+    EXTRACTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EXTRACTION_CACHE_DB: str = ""  # e.g. "cache/extractions.db", empty = memory only
+    EXTRACTION_CACHE_DB_MAX_ROWS: int = 50_000  # oldest rows beyond this are evicted
+    EXTRACTION_CACHE_DB_TTL: int = 30 * 24 * 3600
+    
+    # Skill Taxonomy (relative paths resolve against the backend directory)
+    SKILL_TAXONOMY_PATH: str = "data/skills_taxonomy.json"
+    
+    # CV Features (handles returned by /extract)
+    FEATURES_CACHE_SIZE: int = 1024
+    FEATURES_TTL: int = 3600
+    CHUNK_CACHE_SIZE: int = 20_000
+    
+    # Metrics (/metrics, /health)
+    LOOP_LAG_INTERVAL: float = 0.5  # seconds between event-loop lag probes
+    
+    # Profiling (requests sending X-Profile: 1 and X-API-Key = API_SECRET_KEY)
+    PROFILING_ENABLED: bool = False
+    PROFILE_PATHS: list = ["/optimize", "/extract"]
+    PROFILE_MAX_CONCURRENT: int = 1
+    PROFILE_MAX_STORED: int = 20
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "app.log"
+    LOG_SAMPLE_RATES: dict = {}  # fraction of records kept per level, e.g. {"INFO": 0.1}; unlisted levels keep all
+    LOG_QUEUE_SIZE: int = 10_000  # records waiting for the writer thread; overflow is dropped, never blocks
     
     class Config:
         env_file = ".env"
@@ -1,23 +1,76 @@
 # ============================================================================
 # FILE: main.py - CV Enhancer API
 # ============================================================================
-from fastapi import FastAPI, File, UploadFile, Request, HTTPException
+from fastapi import FastAPI, File, UploadFile, Request, HTTPException, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pathlib import Path
 from datetime import datetime
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import FrozenSet, Iterable, Iterator, List, Literal, Optional, Sequence, Set, Tuple, Union
+import numpy as np
 import PyPDF2
-import docx
 from io import BytesIO
-import re
+from xml.etree import ElementTree
+import asyncio
+import gc
+import hashlib
+import json
+import secrets
+import time
+import zipfile
+
+from config import DEFAULT_API_SECRET_KEY, get_settings
+from services.openai_service import OpenAIService
+from utils.candidate_store import CandidateStore
+from utils.counter_store import open_counter_store
+from utils.cv_features import CVFeatures, extract_features, features_key
+from utils.cv_ranker import CVRanker
+from utils.extraction_cache import ExtractionCache
+from utils.extraction_pool import ExtractionPool, PoolSaturatedError
+from utils.jd_profile import JDProfile, build_jd_profile
+from utils.job_queue import DONE, FAILED, JobQueue, MemoryJobBackend, QueueFullError, SQLiteJobBackend
+from utils.llm_guard import CircuitBreaker, LLMUnavailableError
+from utils.logger import logger_stats, setup_logger
+from utils.lru_store import LRUStore
+from utils.metrics import LoopLagMonitor, Metrics
+from utils.near_duplicates import LSHIndex, MinHasher
+from utils.profiler import ProfileStore, ProfilingMiddleware, current_profile, profiled_call
+from utils.prompt_budget import PromptBuilder
+from utils.rate_limiter import DailyQuota, RateLimiter, SharedRateLimiter
+from utils.request_id import RequestIdMiddleware
+from utils.response_cache import ResponseCache
+from utils.skill_taxonomy import SkillTaxonomy, PRIORITIES
+from utils.upload_limit import UploadLimitMiddleware
+
+settings = get_settings()
+
+# Request handlers only enqueue log records; a background thread writes them
+logger = setup_logger(
+    "cv_enhancer",
+    log_file=settings.LOG_FILE,
+    level=settings.LOG_LEVEL,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    queue_size=settings.LOG_QUEUE_SIZE
+)
+
+# Per-stage latency, exposed on /metrics
+metrics = Metrics()
+loop_lag = LoopLagMonitor(interval=settings.LOOP_LAG_INTERVAL)
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose rendering is recorded as the serialization stage"""
+    
+    def render(self, content) -> bytes:
+        with metrics.stage("serialize"):
+            return super().render(content)
 
 # FastAPI app
 app = FastAPI(
     title="CV Enhancer API",
     description="API d'optimisation de CV avec Intelligence Artificielle",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=TimedJSONResponse
 )
 
 # CORS
@@ -29,12 +82,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Body cap for uploads: CV + JD files plus multipart framing
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_body_size=2 * settings.MAX_FILE_SIZE + 64 * 1024,
+    paths=["/extract"]
+)
+
+def admin_enabled() -> bool:
+    """Admin access needs an API_SECRET_KEY other than the shipped placeholder"""
+    return bool(settings.API_SECRET_KEY) and settings.API_SECRET_KEY != DEFAULT_API_SECRET_KEY
+
+# Opt-in profiling; when disabled the middleware isn't installed at all
+profile_store = ProfileStore(
+    max_concurrent=settings.PROFILE_MAX_CONCURRENT,
+    max_stored=settings.PROFILE_MAX_STORED
+)
+if settings.PROFILING_ENABLED and not admin_enabled():
+    logger.warning("⚠️ PROFILING_ENABLED ignored: API_SECRET_KEY is empty or still the default")
+elif settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        api_key=settings.API_SECRET_KEY,
+        paths=settings.PROFILE_PATHS
+    )
+
+# Request ids for log correlation (X-Request-ID in, and echoed back)
+app.add_middleware(RequestIdMiddleware)
+
+# Process pool for CPU-heavy file parsing (PDF / DOCX)
+extraction_pool = ExtractionPool(
+    max_workers=settings.EXTRACTION_WORKERS,
+    max_queue=settings.EXTRACTION_QUEUE_SIZE,
+    timeout=settings.EXTRACTION_TIMEOUT
+)
+
+# Cache of extracted text keyed by file content hash
+extraction_cache = ExtractionCache(
+    max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+    db_path=settings.EXTRACTION_CACHE_DB,
+    max_rows=settings.EXTRACTION_CACHE_DB_MAX_ROWS,
+    ttl=settings.EXTRACTION_CACHE_DB_TTL,
+    limits=(settings.PDF_MAX_PAGES, settings.EXTRACTION_MAX_CHARS)
+)
+
+# Process pool for batch analysis chunks
+analysis_pool = ExtractionPool(
+    max_workers=settings.ANALYSIS_WORKERS,
+    max_queue=settings.ANALYSIS_QUEUE_SIZE,
+    timeout=settings.ANALYSIS_TIMEOUT
+)
+
+# Counters shared by every worker (rate limits and LLM quotas) when a store URL is set
+counter_store = open_counter_store(settings.RATE_LIMIT_STORE_URL, Path(__file__).parent)
+
+# Per-route limits keyed by client IP: token buckets in this process, or
+# sliding windows in the shared counter store
+rate_limiters = {}
+
+def rate_limit(path: str) -> Union[RateLimiter, SharedRateLimiter]:
+    """Limiter for a route, from RATE_LIMIT_ROUTES or the default budget"""
+    if path not in rate_limiters:
+        spec = settings.RATE_LIMIT_ROUTES.get(path)
+        requests, period = (
+            map(int, spec.split("/")) if spec else (settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_PERIOD)
+        )
+        if settings.RATE_LIMIT_STORE_URL:
+            rate_limiters[path] = SharedRateLimiter(
+                counter_store, requests=requests, period=period, scope=path,
+                max_keys=settings.RATE_LIMIT_MAX_KEYS,
+                sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL,
+                batch_size=settings.RATE_LIMIT_BATCH_SIZE
+            )
+        else:
+            rate_limiters[path] = RateLimiter(
+                requests=requests, period=period, scope=path, max_keys=settings.RATE_LIMIT_MAX_KEYS
+            )
+    return rate_limiters[path]
+
+llm_quota = DailyQuota(counter_store, limit=settings.LLM_DAILY_QUOTA)
+
+# Only issued keys get their own quota: an arbitrary header must not open a fresh bucket
+issued_quota_keys = [key.encode("utf-8") for key in settings.LLM_QUOTA_API_KEYS if key]
+
+def quota_identity(request: Request) -> str:
+    """Who LLM calls are counted against: the caller's issued API key, else its IP"""
+    api_key = request.headers.get("x-api-key", "").encode("utf-8")
+    # Compare against every issued key so timing doesn't reveal which one matched
+    matches = [secrets.compare_digest(api_key, key) for key in issued_quota_keys]
+    if api_key and any(matches):
+        return "key:" + hashlib.blake2b(api_key, digest_size=8).hexdigest()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+@app.on_event("startup")
+async def startup():
+    extraction_pool.start()
+    analysis_pool.start()
+    job_queue.start()
+    loop_lag.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await loop_lag.stop()
+    await job_queue.shutdown()
+    extraction_pool.shutdown()
+    analysis_pool.shutdown()
+
 # ============================================================================
 # MODELS
 # ============================================================================
 
 class CVAnalysisRequest(BaseModel):
-    candidate_cv_text: str = Field(..., min_length=50)
+    candidate_cv_text: Optional[str] = Field(None, min_length=50, max_length=settings.EXTRACTION_MAX_CHARS)
+    features_id: Optional[str] = None
+    allow_reuse: bool = True
+    tier: Literal["standard", "premium"] = "standard"
+    
+    @model_validator(mode="after")
+    def require_cv(self):
+        if not self.candidate_cv_text and not self.features_id:
+            raise ValueError("candidate_cv_text ou features_id requis")
+        return self
 
 class SkillGap(BaseModel):
     skill: str
@@ -47,15 +216,36 @@ class CVOptimizationResponse(BaseModel):
     optimized_cv_text: str
     improvements: List[str] = []
     ats_keywords: List[str] = []
+    near_duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
+    # llm_reused_scores: a near-duplicate's LLM scores and advice, with the text rebuilt by the heuristic
+    engine: Literal["heuristic", "llm", "llm_reused_scores"] = "heuristic"
+    partial: bool = False  # some fields from an incomplete LLM answer, the rest heuristic
+    confidence: Optional[float] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class SkillGapRequest(BaseModel):
-    cv_text: str = Field(..., min_length=50)
+    cv_text: Optional[str] = Field(None, min_length=50, max_length=settings.EXTRACTION_MAX_CHARS)
     jd_text: Optional[str] = ""
+    jd_id: Optional[str] = None
+    features_id: Optional[str] = None
+    allow_reuse: bool = True
+    tier: Literal["standard", "premium"] = "standard"
+    
+    @model_validator(mode="after")
+    def require_cv(self):
+        if not self.cv_text and not self.features_id:
+            raise ValueError("cv_text ou features_id requis")
+        return self
 
 class SkillGapResponse(BaseModel):
     skill_gaps: List[SkillGap]
     match_score: Optional[int] = None
+    missing_jd_skills: List[str] = []
+    near_duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
+    engine: Literal["heuristic", "llm"] = "heuristic"
+    confidence: Optional[float] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class ExtractionResponse(BaseModel):
@@ -63,35 +253,230 @@ class ExtractionResponse(BaseModel):
     jd_text: Optional[str] = ""
     file_type: str
     word_count: int
+    truncated: bool = False
+    jd_truncated: bool = False
+    features_id: Optional[str] = None
+
+class BatchCVItem(BaseModel):
+    # Too-short texts are reported per item, too-long ones reject the batch
+    cv_text: Optional[str] = Field(None, max_length=settings.EXTRACTION_MAX_CHARS)
+    features_id: Optional[str] = None
+
+class OptimizeBatchRequest(BaseModel):
+    cvs: List[BatchCVItem] = Field(..., min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+
+class SkillGapBatchRequest(BaseModel):
+    cvs: List[BatchCVItem] = Field(..., min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    jd_text: Optional[str] = ""
+    jd_id: Optional[str] = None
+
+class OptimizeBatchItem(BaseModel):
+    index: int
+    result: Optional[CVOptimizationResponse] = None
+    error: Optional[str] = None
+
+class SkillGapBatchItem(BaseModel):
+    index: int
+    result: Optional[SkillGapResponse] = None
+    error: Optional[str] = None
+
+class OptimizeBatchResponse(BaseModel):
+    results: List[OptimizeBatchItem]
+
+class SkillGapBatchResponse(BaseModel):
+    results: List[SkillGapBatchItem]
+
+class RankRequest(BaseModel):
+    jd_text: Optional[str] = None
+    jd_id: Optional[str] = None
+    cvs: List[BatchCVItem] = Field(..., min_length=1, max_length=settings.RANK_MAX_ITEMS)
+    top_k: int = Field(10, ge=1, le=1000)
+    mode: Literal["bm25", "tfidf", "match_score"] = "bm25"
+    
+    @model_validator(mode="after")
+    def require_jd(self):
+        if not (self.jd_text and self.jd_text.strip()) and not self.jd_id:
+            raise ValueError("jd_text ou jd_id requis")
+        return self
+
+class RankedCV(BaseModel):
+    index: int
+    features_id: str
+    score: float
+    match_score: int
+
+class RankError(BaseModel):
+    index: int
+    error: str
+
+class JDRegistrationRequest(BaseModel):
+    jd_text: str = Field(..., min_length=1, max_length=50000)
+
+class JDRegistrationResponse(BaseModel):
+    jd_id: str
+    word_count: int
+    required_skills: List[str]
+    skill_weights: dict
+    expires_in: int
+
+class CandidateSearchRequest(BaseModel):
+    all_skills: List[str] = []
+    any_skills: List[str] = []
+    none_skills: List[str] = []
+    min_score: int = Field(0, ge=0, le=100)
+    limit: int = Field(50, ge=1, le=1000)
+
+class CandidateSummary(BaseModel):
+    candidate_id: str
+    original_cv_score: int
+    optimized_cv_score: int
+    skills: List[str]
+    created_at: datetime
+
+class CandidateDetail(CandidateSummary):
+    cv_text: str
+
+class CandidateSearchResponse(BaseModel):
+    results: List[CandidateSummary]
+    total: int
+    unknown_skills: List[str] = []
+    took_ms: float
+
+class RankResponse(BaseModel):
+    results: List[RankedCV]
+    errors: List[RankError] = []
+    mode: str
+    total: int
+
+class JobSubmitRequest(BaseModel):
+    kind: Literal["optimize", "skill_gaps", "optimize_batch", "skill_gaps_batch"]
+    payload: dict
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "done", "failed"]
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class JobResultResponse(JobStatusResponse):
+    result: Optional[dict] = None
 
 # ============================================================================
 # FILE PROCESSING
 # ============================================================================
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    """Extract text from PDF"""
+def take_within_budget(blocks: Iterable[str], max_chars: int) -> Tuple[str, bool]:
+    """Join text blocks until the character budget is reached"""
+    parts = []
+    used = 0
+    for block in blocks:
+        separator = 1 if parts else 0  # the newline joining it to the previous block
+        remaining = max_chars - used - separator
+        if len(block) > remaining:
+            if remaining > 0:
+                parts.append(block[:remaining])
+            return "\n".join(parts).strip(), True
+        parts.append(block)
+        used += separator + len(block)
+    return "\n".join(parts).strip(), False
+
+def iter_pdf_pages(pdf_reader: PyPDF2.PdfReader, max_pages: int) -> Iterator[str]:
+    """Yield page text lazily, stopping at max_pages"""
+    for index, page in enumerate(pdf_reader.pages):
+        if index >= max_pages:
+            return
+        yield page.extract_text() or ""
+
+def extract_text_from_pdf(file_bytes: bytes) -> Tuple[str, bool]:
+    """Extract text from PDF within the page and character budgets"""
     try:
         pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        pages_truncated = len(pdf_reader.pages) > settings.PDF_MAX_PAGES
+        text, chars_truncated = take_within_budget(
+            iter_pdf_pages(pdf_reader, settings.PDF_MAX_PAGES),
+            settings.EXTRACTION_MAX_CHARS
+        )
+        return text, pages_truncated or chars_truncated
     except Exception as e:
         raise ValueError(f"Échec de l'extraction PDF: {str(e)}")
 
-def extract_text_from_docx(file_bytes: bytes) -> str:
-    """Extract text from DOCX"""
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+def iter_docx_blocks(file_bytes: bytes) -> Iterator[str]:
+    """Stream paragraphs and table rows from word/document.xml in document order"""
+    with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+        with archive.open("word/document.xml") as document:
+            # Each open paragraph / table cell / table row collects its own parts,
+            # so text boxes nested inside a run come out as separate blocks.
+            paragraphs: List[List[str]] = []
+            cells: List[List[str]] = []
+            rows: List[List[str]] = []
+            fallback_depth = 0
+            
+            for event, elem in ElementTree.iterparse(document, events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    if tag == MC_FALLBACK:
+                        fallback_depth += 1  # duplicate of the mc:Choice content
+                    elif fallback_depth:
+                        continue
+                    elif tag == f"{WORD_NS}p":
+                        paragraphs.append([])
+                    elif tag == f"{WORD_NS}tc":
+                        cells.append([])
+                    elif tag == f"{WORD_NS}tr":
+                        rows.append([])
+                    continue
+                
+                if tag == MC_FALLBACK:
+                    fallback_depth -= 1
+                    elem.clear()
+                elif fallback_depth:
+                    continue
+                elif tag == f"{WORD_NS}t" and paragraphs:
+                    paragraphs[-1].append(elem.text or "")
+                elif tag == f"{WORD_NS}tab" and paragraphs:
+                    paragraphs[-1].append("\t")
+                elif tag in (f"{WORD_NS}br", f"{WORD_NS}cr") and paragraphs:
+                    paragraphs[-1].append("\n")
+                elif tag == f"{WORD_NS}p":
+                    text = "".join(paragraphs.pop())
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        yield text
+                    elem.clear()
+                elif tag == f"{WORD_NS}tc":
+                    cell_text = " ".join(part for part in cells.pop() if part.strip())
+                    if rows:
+                        rows[-1].append(cell_text)
+                elif tag == f"{WORD_NS}tr":
+                    row_text = " | ".join(cell for cell in rows.pop() if cell)
+                    if cells:
+                        cells[-1].append(row_text)  # nested table
+                    else:
+                        yield row_text
+                    elem.clear()
+
+def extract_text_from_docx(file_bytes: bytes) -> Tuple[str, bool]:
+    """Extract text from DOCX, including tables and text boxes"""
     try:
-        doc = docx.Document(BytesIO(file_bytes))
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text.strip()
+        return take_within_budget(iter_docx_blocks(file_bytes), settings.EXTRACTION_MAX_CHARS)
     except Exception as e:
         raise ValueError(f"Échec de l'extraction DOCX: {str(e)}")
 
-def extract_text_from_txt(file_bytes: bytes) -> str:
+def extract_text_from_txt(file_bytes: bytes) -> Tuple[str, bool]:
     """Extract text from TXT"""
     try:
-        return file_bytes.decode('utf-8', errors='ignore').strip()
+        text = file_bytes.decode('utf-8', errors='ignore').strip()
+        if len(text) > settings.EXTRACTION_MAX_CHARS:
+            return text[:settings.EXTRACTION_MAX_CHARS], True
+        return text, False
     except Exception as e:
         raise ValueError(f"Échec de l'extraction TXT: {str(e)}")
 
@@ -108,75 +493,297 @@ def process_file(file_bytes: bytes, file_ext: str):
     if not extractor:
         raise ValueError(f"Type de fichier non supporté: {file_ext}")
     
-    text = extractor(file_bytes)
+    text, truncated = extractor(file_bytes)
     word_count = len(text.split())
     
-    return text, word_count
+    return text, word_count, truncated
+
+@metrics.timed("upload_read")
+async def read_upload(upload: UploadFile):
+    """Validate an upload and read it in chunks, stopping at MAX_FILE_SIZE"""
+    file_ext = Path(upload.filename or "").suffix.lower()
+    if file_ext not in settings.ALLOWED_EXTENSIONS:
+        raise HTTPException(400, f"Type de fichier invalide. Autorisés: {settings.ALLOWED_EXTENSIONS}")
+    
+    max_mb = settings.MAX_FILE_SIZE // (1024 * 1024)
+    if upload.size is not None and upload.size > settings.MAX_FILE_SIZE:
+        raise HTTPException(413, f"Fichier trop volumineux. Max {max_mb}MB")
+    
+    # UploadFile is already spooled to disk past 1MB; we only hold chunks
+    # up to the cap and hash them on the way in for the extraction cache.
+    chunks = []
+    total = 0
+    hasher = extraction_cache.new_hasher()
+    while chunk := await upload.read(settings.UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > settings.MAX_FILE_SIZE:
+            raise HTTPException(413, f"Fichier trop volumineux. Max {max_mb}MB")
+        hasher.update(chunk)
+        chunks.append(chunk)
+    
+    key = extraction_cache.make_key_from_hasher(hasher, file_ext)
+    return b"".join(chunks), file_ext, key
+
+async def extract_cached(file_bytes: bytes, file_ext: str, key: Optional[str] = None):
+    """Return cached extraction for identical files, else parse in the pool"""
+    key = key or extraction_cache.make_key(file_bytes, file_ext)
+    cached = await extraction_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Timed here: the worker process can't report back (includes pool queueing)
+    with metrics.stage("process_file"):
+        profile = current_profile.get()
+        if profile is None:
+            result = await extraction_pool.run(process_file, file_bytes, file_ext)
+        else:
+            # Profiled requests also profile the parse inside the worker process
+            result, worker_stats = await extraction_pool.run(profiled_call, process_file, file_bytes, file_ext)
+            profile.add_worker_stats(worker_stats)
+    await extraction_cache.put(key, result)
+    return result
+
+# ============================================================================
+# SKILL KNOWLEDGE
+# ============================================================================
+
+def resolve_data_path(path: str) -> Path:
+    """Resolve a configured data path relative to the backend directory"""
+    resolved = Path(path)
+    return resolved if resolved.is_absolute() else Path(__file__).parent / resolved
+
+# Compiled once at import time, so workers forked after a preload share it
+# read-only. Reloads build a new object and swap the reference atomically.
+taxonomy = SkillTaxonomy.load(resolve_data_path(settings.SKILL_TAXONOMY_PATH))
+gc.freeze()  # keep the taxonomy out of GC passes so forked pages stay shared
+
+# CV features computed by /extract, reusable by /optimize and /skill-gaps
+features_store = LRUStore(max_items=settings.FEATURES_CACHE_SIZE, ttl=settings.FEATURES_TTL)
+
+# Per-paragraph features: resubmitted CVs only rescan the paragraphs that changed
+chunk_cache = LRUStore(max_items=settings.CHUNK_CACHE_SIZE)
+
+def resolve_features(cv_text: Optional[str], features_id: Optional[str]) -> CVFeatures:
+    """Fetch stored features by handle, or scan the given text"""
+    if features_id:
+        features = features_store.get(features_id)
+        if features is None:
+            raise HTTPException(404, "features_id inconnu ou expiré, renvoyez le texte du CV")
+        return features
+    return extract_features(cv_text, taxonomy, chunk_cache)
+
+# Near-duplicate CVs (new phone number, reordered bullets...) reuse stored results
+minhasher = MinHasher(num_perm=settings.MINHASH_PERMUTATIONS)
+duplicate_index = (
+    LSHIndex(
+        num_perm=settings.MINHASH_PERMUTATIONS,
+        threshold=settings.NEAR_DUPLICATE_THRESHOLD,
+        max_items=settings.NEAR_DUPLICATE_MAX_ITEMS
+    )
+    if settings.NEAR_DUPLICATE_THRESHOLD > 0 else None
+)
+reusable_results = LRUStore(max_items=settings.NEAR_DUPLICATE_MAX_ITEMS)
+cv_signatures = LRUStore(max_items=settings.FEATURES_CACHE_SIZE)
+
+def cv_signature(features: CVFeatures) -> Tuple[str, np.ndarray]:
+    """Content key and MinHash signature of a CV (cached)"""
+    key = features_key(features.text)
+    signature = cv_signatures.get(key)
+    if signature is None:
+        signature = minhasher.signature(features.tokens)
+        cv_signatures.put(key, signature)
+    return key, signature
+
+def find_reusable(
+    kind: str,
+    features: CVFeatures,
+    engine: str = "heuristic",
+    scope: str = ""
+) -> Optional[Tuple[dict, str, float]]:
+    """Stored result of the closest near-duplicate CV, with its key and similarity
+    
+    Results are kept per engine; scope narrows the match further (the JD
+    an LLM skill-gap answer was written for).
+    """
+    if duplicate_index is None:
+        return None
+    
+    _, signature = cv_signature(features)
+    for other_key, similarity in duplicate_index.query(signature):
+        result = reusable_results.get((kind, engine, scope, other_key))
+        if result is not None:
+            return result, other_key, similarity
+    return None
+
+def remember_result(kind: str, features: CVFeatures, result: dict, engine: str = "heuristic", scope: str = ""):
+    if duplicate_index is None:
+        return
+    key, signature = cv_signature(features)
+    duplicate_index.insert(key, signature)
+    reusable_results.put((kind, engine, scope, key), result)
+
+# Persistent history of analyzed CVs, searchable by skill (disabled if no path)
+candidate_store = (
+    CandidateStore(str(resolve_data_path(settings.CANDIDATE_STORE_PATH)))
+    if settings.CANDIDATE_STORE_PATH else None
+)
+
+def record_candidates(entries: List[Tuple[Union[str, CVFeatures], dict]]):
+    """Persist analyzed CVs and their skill bitsets (runs in a thread)
+    
+    The history is a side effect: failing to store it never fails the analysis.
+    """
+    skills = taxonomy
+    try:
+        rows = []
+        for cv, result in entries:
+            features = cv if isinstance(cv, CVFeatures) else extract_features(cv, skills, chunk_cache)
+            rows.append((
+                features_key(features.text),
+                features.text,
+                result["original_cv_score"],
+                result["optimized_cv_score"],
+                sorted((key for key in features.keywords if key in skills.skills), key=skills.order.get)
+            ))
+        candidate_store.add_many(rows)
+    except Exception as e:
+        logger.error(f"❌ Could not record {len(entries)} candidate(s): {str(e)}")
+
+# Job descriptions registered once and scored against many CVs
+jd_profiles = LRUStore(max_items=settings.JD_PROFILE_CACHE_SIZE, ttl=settings.JD_PROFILE_TTL)
+
+def resolve_jd(jd_text: Optional[str], jd_id: Optional[str]) -> Optional[JDProfile]:
+    """Fetch a registered JD profile by id, or profile the given text"""
+    if jd_id:
+        profile = jd_profiles.get(jd_id)
+        if profile is None:
+            raise HTTPException(404, "jd_id inconnu ou expiré, enregistrez à nouveau la JD")
+        return profile
+    if jd_text:
+        return build_jd_profile(jd_text, taxonomy)
+    return None
+
+# Cached, coalesced LLM client (only when an API key is configured)
+llm_cache = ResponseCache(
+    max_items=settings.LLM_CACHE_SIZE,
+    ttl=settings.LLM_CACHE_TTL,
+    db_path=settings.LLM_CACHE_DB
+)
+def heuristic_optimize(cv_text: str) -> dict:
+    """Local engine answer in the LLM response shape (used while the breaker is open)"""
+    result = analyze_cv_intelligence(cv_text)
+    return {
+        "original_score": result["original_cv_score"],
+        "optimized_score": result["optimized_cv_score"],
+        "improvements": result["improvements"],
+        "optimized_cv": result["optimized_cv_text"],
+        "ats_keywords": result["ats_keywords"]
+    }
+
+def heuristic_skill_gaps(cv_text: str, jd_text: str) -> dict:
+    result = analyze_skill_gaps_intelligence(cv_text, jd_text)
+    return {"skill_gaps": result["skill_gaps"], "match_score": result["match_score"]}
+
+openai_service = OpenAIService(
+    api_key=settings.OPENAI_API_KEY,
+    model=settings.OPENAI_MODEL,
+    temperature=settings.OPENAI_TEMPERATURE,
+    cache=llm_cache,
+    base_url=settings.OPENAI_BASE_URL,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    timeout=settings.LLM_TIMEOUT,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE,
+    backoff_max=settings.LLM_BACKOFF_MAX,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.LLM_BREAKER_THRESHOLD,
+        reset_timeout=settings.LLM_BREAKER_RESET
+    ),
+    optimize_fallback=heuristic_optimize,
+    skill_gaps_fallback=heuristic_skill_gaps,
+    max_tokens=settings.OPENAI_MAX_TOKENS,
+    prompt_builder=PromptBuilder(
+        max_input_tokens=settings.OPENAI_MAX_INPUT_TOKENS,
+        section_headers=taxonomy.section_headers,
+        model=settings.OPENAI_MODEL
+    ),
+    metrics=metrics
+) if settings.OPENAI_API_KEY else None
 
 # ============================================================================
 # AI ANALYSIS ENGINE
 # ============================================================================
 
-def analyze_cv_intelligence(cv_text: str) -> dict:
+def build_optimized_cv_text(
+    content_lines: Sequence[str],
+    tech_skills_detected: List[str],
+    original_score: int,
+    optimized_score: int
+) -> str:
+    """Génération du CV optimisé"""
+    optimized_sections = []
+    
+    # En-tête optimisé
+    optimized_sections.append("═" * 70)
+    optimized_sections.append("CV PROFESSIONNEL OPTIMISÉ")
+    optimized_sections.append("═" * 70)
+    optimized_sections.append("")
+    
+    # Contenu original amélioré (lignes non vides)
+    optimized_sections.extend(content_lines)
+    
+    optimized_sections.append("")
+    optimized_sections.append("─" * 70)
+    optimized_sections.append("OPTIMISATIONS APPLIQUÉES")
+    optimized_sections.append("─" * 70)
+    optimized_sections.append("")
+    optimized_sections.append("✓ Mise en forme professionnelle standardisée")
+    optimized_sections.append("✓ Optimisation pour les systèmes de tracking (ATS)")
+    optimized_sections.append("✓ Restructuration avec hiérarchie claire")
+    optimized_sections.append("✓ Valorisation des expériences avec verbes d'action")
+    optimized_sections.append("✓ Mise en avant des réalisations mesurables")
+    optimized_sections.append("✓ Intégration de mots-clés stratégiques")
+    
+    if tech_skills_detected:
+        optimized_sections.append("")
+        optimized_sections.append("─" * 70)
+        optimized_sections.append("COMPÉTENCES TECHNIQUES IDENTIFIÉES")
+        optimized_sections.append("─" * 70)
+        optimized_sections.append("")
+        
+        # Afficher par catégories
+        skills_display = ", ".join(tech_skills_detected[:12])
+        optimized_sections.append(f"• {skills_display}")
+    
+    optimized_sections.append("")
+    optimized_sections.append("─" * 70)
+    optimized_sections.append(f"SCORE D'OPTIMISATION: {original_score}/100 → {optimized_score}/100")
+    optimized_sections.append(f"AMÉLIORATION: +{optimized_score - original_score} points")
+    optimized_sections.append("─" * 70)
+    
+    return "\n".join(optimized_sections)
+
+@metrics.timed("analyze_cv_intelligence")
+def analyze_cv_intelligence(cv_text: str, features: Optional[CVFeatures] = None) -> dict:
     """Analyse intelligente du CV avec algorithmes avancés"""
     
-    cv_lower = cv_text.lower()
-    words = cv_text.split()
-    word_count = len(words)
+    if features is None:
+        features = extract_features(cv_text, taxonomy)
+    cv_text = features.text
+    word_count = features.word_count
     
     # Détection avancée des compétences techniques
-    tech_skills_detected = []
-    skills_database = {
-        'python': 'Python', 'java': 'Java', 'javascript': 'JavaScript',
-        'typescript': 'TypeScript', 'c++': 'C++', 'c#': 'C#', 'php': 'PHP',
-        'ruby': 'Ruby', 'go': 'Go', 'rust': 'Rust', 'swift': 'Swift',
-        'react': 'React.js', 'angular': 'Angular', 'vue': 'Vue.js',
-        'node': 'Node.js', 'express': 'Express.js', 'django': 'Django',
-        'flask': 'Flask', 'spring': 'Spring Boot', 'laravel': 'Laravel',
-        'sql': 'SQL', 'mysql': 'MySQL', 'postgresql': 'PostgreSQL',
-        'mongodb': 'MongoDB', 'redis': 'Redis', 'elasticsearch': 'Elasticsearch',
-        'docker': 'Docker', 'kubernetes': 'Kubernetes', 'jenkins': 'Jenkins',
-        'aws': 'AWS', 'azure': 'Azure', 'gcp': 'Google Cloud',
-        'terraform': 'Terraform', 'ansible': 'Ansible',
-        'git': 'Git', 'github': 'GitHub', 'gitlab': 'GitLab',
-        'ci/cd': 'CI/CD', 'devops': 'DevOps',
-        'machine learning': 'Machine Learning', 'deep learning': 'Deep Learning',
-        'tensorflow': 'TensorFlow', 'pytorch': 'PyTorch',
-        'data science': 'Data Science', 'big data': 'Big Data',
-        'spark': 'Apache Spark', 'hadoop': 'Hadoop',
-        'rest api': 'REST API', 'graphql': 'GraphQL', 'microservices': 'Microservices',
-        'agile': 'Agile', 'scrum': 'Scrum', 'kanban': 'Kanban',
-        'html': 'HTML5', 'css': 'CSS3', 'sass': 'SASS',
-        'webpack': 'Webpack', 'babel': 'Babel',
-        'linux': 'Linux', 'unix': 'Unix', 'bash': 'Bash'
-    }
-    
-    for keyword, skill_name in skills_database.items():
-        if keyword in cv_lower:
-            tech_skills_detected.append(skill_name)
+    tech_skills_detected = list(features.skills)
     
     # Détection de l'expérience professionnelle
-    experience_keywords = [
-        'experience', 'expérience', 'worked', 'développé', 'developed',
-        'managed', 'géré', 'led', 'dirigé', 'created', 'créé',
-        'built', 'construit', 'designed', 'conçu', 'implemented', 'implémenté',
-        'achieved', 'réalisé', 'improved', 'amélioré', 'optimized', 'optimisé',
-        'launched', 'lancé', 'coordinated', 'coordonné'
-    ]
-    experience_score = sum(1 for word in experience_keywords if word in cv_lower)
+    experience_score = len(features.action_verbs)
     has_strong_experience = experience_score >= 3
     
     # Détection de la formation
-    education_keywords = [
-        'université', 'university', 'master', 'bachelor', 'licence',
-        'diplôme', 'degree', 'formation', 'education', 'école', 'school',
-        'ingénieur', 'engineer', 'doctorat', 'phd', 'certification'
-    ]
-    has_education = any(word in cv_lower for word in education_keywords)
+    has_education = bool(features.education_markers)
     
     # Détection de réalisations quantifiables
-    numbers_pattern = r'\d+[%+]?|\d+\s*(?:ans|years|mois|months|millions?|k\b)'
-    quantifiable_achievements = len(re.findall(numbers_pattern, cv_text))
+    quantifiable_achievements = features.quantified_achievements
     
     # Calcul du score original (algorithme sophistiqué)
     base_score = 45
@@ -224,50 +831,7 @@ def analyze_cv_intelligence(cv_text: str) -> dict:
     optimized_score = min(original_score + improvement, 97)
     
     # Génération du CV optimisé
-    optimized_sections = []
-    
-    # En-tête optimisé
-    optimized_sections.append("═" * 70)
-    optimized_sections.append("CV PROFESSIONNEL OPTIMISÉ")
-    optimized_sections.append("═" * 70)
-    optimized_sections.append("")
-    
-    # Contenu original amélioré
-    cv_lines = cv_text.split('\n')
-    for line in cv_lines:
-        if line.strip():
-            optimized_sections.append(line)
-    
-    optimized_sections.append("")
-    optimized_sections.append("─" * 70)
-    optimized_sections.append("OPTIMISATIONS APPLIQUÉES")
-    optimized_sections.append("─" * 70)
-    optimized_sections.append("")
-    optimized_sections.append("✓ Mise en forme professionnelle standardisée")
-    optimized_sections.append("✓ Optimisation pour les systèmes de tracking (ATS)")
-    optimized_sections.append("✓ Restructuration avec hiérarchie claire")
-    optimized_sections.append("✓ Valorisation des expériences avec verbes d'action")
-    optimized_sections.append("✓ Mise en avant des réalisations mesurables")
-    optimized_sections.append("✓ Intégration de mots-clés stratégiques")
-    
-    if tech_skills_detected:
-        optimized_sections.append("")
-        optimized_sections.append("─" * 70)
-        optimized_sections.append("COMPÉTENCES TECHNIQUES IDENTIFIÉES")
-        optimized_sections.append("─" * 70)
-        optimized_sections.append("")
-        
-        # Afficher par catégories
-        skills_display = ", ".join(tech_skills_detected[:12])
-        optimized_sections.append(f"• {skills_display}")
-    
-    optimized_sections.append("")
-    optimized_sections.append("─" * 70)
-    optimized_sections.append(f"SCORE D'OPTIMISATION: {original_score}/100 → {optimized_score}/100")
-    optimized_sections.append(f"AMÉLIORATION: +{optimized_score - original_score} points")
-    optimized_sections.append("─" * 70)
-    
-    optimized_cv_text = "\n".join(optimized_sections)
+    optimized_cv_text = build_optimized_cv_text(features.lines, tech_skills_detected, original_score, optimized_score)
     
     # Générer les améliorations suggérées
     improvements = [
@@ -310,64 +874,61 @@ def analyze_cv_intelligence(cv_text: str) -> dict:
         "ats_keywords": ats_keywords
     }
 
-def analyze_skill_gaps_intelligence(cv_text: str, jd_text: str = "") -> dict:
-    """Analyse intelligente des compétences manquantes"""
+def compute_match_score(cv_words: FrozenSet[str], jd_words: FrozenSet[str]) -> int:
+    """Pourcentage de mots significatifs de la JD présents dans le CV"""
+    if not jd_words:
+        return 70
     
-    cv_lower = cv_text.lower()
+    # Mots communs significatifs (>3 lettres)
+    common_words = cv_words.intersection(jd_words)
+    match_percentage = (len(common_words) / len(jd_words)) * 100
+    return min(int(match_percentage * 1.2), 95)  # Léger boost, max 95
+
+def match_against_jd(features: CVFeatures, jd_profile: Optional[JDProfile]) -> Tuple[Optional[int], List[str]]:
+    """Score de correspondance et compétences de la JD absentes du CV"""
+    if jd_profile is None:
+        return None, []
     
-    # Base de compétences par catégorie
-    skills_categories = {
-        'Langages de programmation': {
-            'python': ('Python', 'high', 'Cours Python sur Coursera ou Udemy. Pratiquer avec des projets sur GitHub.'),
-            'javascript': ('JavaScript', 'high', 'Maîtriser JS via FreeCodeCamp. Construire 3 projets portfolio interactifs.'),
-            'java': ('Java', 'medium', 'Oracle Java Certification ou cours sur Pluralsight. Développer une application Spring Boot.'),
-            'typescript': ('TypeScript', 'medium', 'Documentation officielle TypeScript + projet Angular ou React avec TS.'),
-        },
-        'Frameworks & Librairies': {
-            'react': ('React', 'high', 'Documentation officielle React. Créer 2-3 applications complètes et les déployer.'),
-            'angular': ('Angular', 'medium', 'Angular University ou cours officiel. Développer une SPA complète.'),
-            'django': ('Django', 'medium', 'Django for Beginners puis Django for Professionals. API REST avec DRF.'),
-            'spring': ('Spring Boot', 'medium', 'Spring Academy ou Baeldung tutorials. Microservices avec Spring Cloud.'),
-        },
-        'Bases de données': {
-            'sql': ('SQL / Bases de données', 'high', 'SQLBolt et Mode Analytics pour la pratique. PostgreSQL en production.'),
-            'mongodb': ('MongoDB', 'medium', 'MongoDB University (gratuit). Intégrer dans un projet Node.js.'),
-            'redis': ('Redis', 'low', 'Redis University. Implémenter du caching dans vos applications.'),
-        },
-        'DevOps & Cloud': {
-            'docker': ('Docker', 'high', 'Docker Mastery sur Udemy. Containeriser tous vos projets.'),
-            'kubernetes': ('Kubernetes', 'high', 'Certified Kubernetes Application Developer (CKAD). Déploiements en prod.'),
-            'aws': ('AWS', 'high', 'AWS Certified Solutions Architect Associate. Utiliser free tier intensivement.'),
-            'ci/cd': ('CI/CD', 'high', 'GitHub Actions ou GitLab CI. Automatiser déploiement de 3+ projets.'),
-        },
-        'Méthodologies': {
-            'agile': ('Agile / Scrum', 'medium', 'Certified Scrum Master (CSM) ou Professional Scrum Master I.'),
-            'test': ('Tests automatisés', 'high', 'Jest/Pytest selon stack. Test-Driven Development (TDD) sur projets.'),
-        },
-        'Soft Skills': {
-            'leadership': ('Leadership', 'medium', 'Lire "Leaders Eat Last". Prendre des rôles de lead dans projets.'),
-            'communication': ('Communication professionnelle', 'low', 'Toastmasters ou formations en communication interculturelle.'),
-        }
-    }
+    skills = taxonomy
+    match_score = compute_match_score(features.long_words, jd_profile.words)
+    
+    # Compétences demandées par la JD absentes du CV, les plus importantes d'abord
+    missing = [key for key in jd_profile.required_skills if key not in features.keywords]
+    missing.sort(key=lambda key: -jd_profile.skill_weights[key])
+    return match_score, [skills.skills[key].name for key in missing if key in skills.skills]
+
+@metrics.timed("analyze_skill_gaps_intelligence")
+def analyze_skill_gaps_intelligence(
+    cv_text: str,
+    jd_text: str = "",
+    features: Optional[CVFeatures] = None,
+    jd_profile: Optional[JDProfile] = None
+) -> dict:
+    """Analyse intelligente des compétences manquantes"""
+    
+    if features is None:
+        features = extract_features(cv_text, taxonomy)
+    if jd_profile is None and jd_text:
+        jd_profile = build_jd_profile(jd_text, taxonomy)
     
-    # Identifier les compétences manquantes
-    skill_gaps = []
+    # Identifier les compétences manquantes (les plus importantes d'abord)
+    skills = taxonomy
+    found_keywords = features.keywords
+    limits = {'high': 4, 'medium': 3, 'low': 1}
+    final_gaps = []
     
-    for category, skills in skills_categories.items():
-        for keyword, (skill_name, priority, suggestion) in skills.items():
-            if keyword not in cv_lower:
-                skill_gaps.append({
-                    "skill": skill_name,
-                    "suggestion": suggestion,
+    for priority in PRIORITIES:
+        missing = 0
+        for skill in skills.gaps_by_priority[priority]:
+            if missing >= limits[priority]:
+                break
+            if skill.key not in found_keywords:
+                final_gaps.append({
+                    "skill": skill.name,
+                    "suggestion": skill.suggestion,
                     "priority": priority
                 })
-    
-    # Limiter à 8 suggestions maximum (les plus importantes)
-    high_priority = [s for s in skill_gaps if s['priority'] == 'high'][:4]
-    medium_priority = [s for s in skill_gaps if s['priority'] == 'medium'][:3]
-    low_priority = [s for s in skill_gaps if s['priority'] == 'low'][:1]
-    
-    final_gaps = high_priority + medium_priority + low_priority
+                missing += 1
     
     # Si trop peu de gaps, ajouter des compétences universelles
     if len(final_gaps) < 5:
@@ -379,27 +940,271 @@ def analyze_skill_gaps_intelligence(cv_text: str, jd_text: str = "") -> dict:
         final_gaps.extend(universal_skills[:5-len(final_gaps)])
     
     # Score de correspondance si JD fournie
-    match_score = None
-    if jd_text:
-        cv_words = set(cv_lower.split())
-        jd_words = set(jd_text.lower().split())
-        
-        # Mots communs significatifs (>3 lettres)
-        cv_words_filtered = {w for w in cv_words if len(w) > 3}
-        jd_words_filtered = {w for w in jd_words if len(w) > 3}
-        common_words = cv_words_filtered.intersection(jd_words_filtered)
-        
-        if jd_words_filtered:
-            match_percentage = (len(common_words) / len(jd_words_filtered)) * 100
-            match_score = min(int(match_percentage * 1.2), 95)  # Léger boost, max 95
-        else:
-            match_score = 70
+    match_score, missing_jd_skills = match_against_jd(features, jd_profile)
     
     return {
         "skill_gaps": final_gaps[:8],  # Max 8 suggestions
-        "match_score": match_score
+        "match_score": match_score,
+        "missing_jd_skills": missing_jd_skills
     }
 
+def analysis_confidence(features: CVFeatures, jd_profile: Optional[JDProfile] = None) -> float:
+    """Confiance (0-1) dans l'analyse locale: structure, longueur et compétences reconnues"""
+    word_count = features.word_count
+    if word_count < 150:
+        length = word_count / 150
+    elif word_count > 2000:
+        length = 0.6  # CV très long: la lecture par mots-clés en rate une partie
+    else:
+        length = 1.0
+    
+    signals = [
+        min(len(features.sections) / 4, 1.0),
+        length,
+        min(len(features.skills) / 5, 1.0),
+        min((len(features.action_verbs) + features.quantified_achievements) / 5, 1.0)
+    ]
+    
+    # Une longue JD dont on ne reconnaît presque aucune compétence est hors taxonomie
+    if jd_profile is not None and len(jd_profile.words) > 30:
+        signals.append(min(len(jd_profile.required_skills) / 3, 1.0))
+    
+    return round(sum(signals) / len(signals), 2)
+
+# ============================================================================
+# HYBRID ENGINE
+# ============================================================================
+
+# LLM response fields -> CVOptimizationResponse fields
+OPTIMIZE_FIELDS = {
+    "original_score": "original_cv_score",
+    "optimized_score": "optimized_cv_score",
+    "improvements": "improvements",
+    "optimized_cv": "optimized_cv_text",
+    "ats_keywords": "ats_keywords"
+}
+
+# LLM calls that outlived their request keep running to warm the response cache
+background_llm_calls: Set[asyncio.Task] = set()
+
+def llm_deadline(budget: Optional[float] = None) -> float:
+    """Monotonic time by which the LLM must have answered (HYBRID_LATENCY_BUDGET by default)"""
+    return time.monotonic() + (settings.HYBRID_LATENCY_BUDGET if budget is None else budget)
+
+def remaining_budget(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+async def should_escalate(tier: str, confidence: float, client: str, deadline: float) -> bool:
+    # An open breaker is left to the service: it fails fast and still schedules probes
+    if openai_service is None:
+        return False
+    if tier != "premium" and confidence >= settings.HYBRID_CONFIDENCE_THRESHOLD:
+        return False
+    if remaining_budget(deadline) <= 0:
+        # Checked before the quota, so a call that can't be awaited costs nothing
+        logger.warning("⏱️ Latency budget spent before the LLM call, serving heuristic result")
+        return False
+    
+    allowed, retry_after = await llm_quota.consume(client)
+    if allowed:
+        return True
+    logger.warning(f"🚫 Daily LLM quota reached for {client}")
+    if tier == "premium":
+        # Premium was asked for explicitly: say so rather than quietly downgrade
+        raise HTTPException(429, "Quota journalier d'analyses IA atteint",
+                            headers={"Retry-After": str(retry_after)})
+    return False
+
+async def within_budget(call, deadline: float):
+    """Await an LLM call for what is left of the request's latency budget (None on expiry)"""
+    remaining = remaining_budget(deadline)
+    if remaining <= 0:
+        call.close()
+        return None
+    
+    task = asyncio.ensure_future(call)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=remaining)
+    except asyncio.TimeoutError:
+        background_llm_calls.add(task)
+        task.add_done_callback(background_llm_calls.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return None
+
+async def escalate_optimization(
+    features: CVFeatures,
+    result: dict,
+    tier: str,
+    deadline: float,
+    client: str
+) -> Tuple[dict, str]:
+    """Heuristic result, or the LLM's when escalation is warranted and answers in time"""
+    confidence = analysis_confidence(features)
+    result = {**result, "confidence": confidence}
+    if not await should_escalate(tier, confidence, client, deadline):
+        return result, "heuristic"
+    
+    try:
+        llm_result = await within_budget(openai_service.optimize_cv(features.text, use_fallback=False), deadline)
+        if llm_result is None:
+            logger.warning("⏱️ LLM over latency budget, serving heuristic result")
+            return result, "heuristic"
+        
+        mapped = {OPTIMIZE_FIELDS[field]: value for field, value in llm_result.items() if field in OPTIMIZE_FIELDS}
+        mapped["original_cv_score"] = int(mapped["original_cv_score"])
+        mapped["optimized_cv_score"] = int(mapped["optimized_cv_score"])
+        CVOptimizationResponse(**mapped)  # reject replies that don't fit the schema
+    except (LLMUnavailableError, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"⚠️ LLM escalation failed, serving heuristic result: {str(e)}")
+        return result, "heuristic"
+    return {**mapped, "confidence": confidence}, "llm"
+
+async def escalate_skill_gaps(
+    features: CVFeatures,
+    jd_profile: Optional[JDProfile],
+    result: dict,
+    tier: str,
+    deadline: float,
+    client: str
+) -> Tuple[dict, str]:
+    confidence = analysis_confidence(features, jd_profile)
+    result = {**result, "confidence": confidence}
+    if not await should_escalate(tier, confidence, client, deadline):
+        return result, "heuristic"
+    
+    jd_text = jd_profile.text if jd_profile is not None else ""
+    try:
+        llm_result = await within_budget(
+            openai_service.identify_skill_gaps(features.text, jd_text, use_fallback=False), deadline
+        )
+        if llm_result is None:
+            logger.warning("⏱️ LLM over latency budget, serving heuristic result")
+            return result, "heuristic"
+        
+        gaps = [SkillGap(**gap).model_dump() for gap in llm_result["skill_gaps"]]
+        match_score = llm_result.get("match_score")
+    except (LLMUnavailableError, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"⚠️ LLM escalation failed, serving heuristic result: {str(e)}")
+        return result, "heuristic"
+    
+    # The JD skill diff stays deterministic; the LLM supplies gaps and its match score
+    return {
+        **result,
+        "skill_gaps": gaps,
+        "match_score": int(match_score) if match_score is not None else result["match_score"]
+    }, "llm"
+
+# ============================================================================
+# BATCH PROCESSING
+# ============================================================================
+
+def run_analysis_chunk(
+    kind: str,
+    items: List[Union[str, CVFeatures]],
+    jd_profile: Optional[JDProfile] = None
+) -> List[Tuple[Optional[dict], Optional[str]]]:
+    """Analyze a chunk of CVs (runs inside an analysis worker)"""
+    results = []
+    for item in items:
+        try:
+            features = item if isinstance(item, CVFeatures) else extract_features(item, taxonomy)
+            if kind == "optimize":
+                result = analyze_cv_intelligence(features.text, features)
+            else:
+                result = analyze_skill_gaps_intelligence(features.text, "", features, jd_profile)
+            results.append((result, None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+async def run_batch(
+    kind: str,
+    cvs: List[BatchCVItem],
+    jd_profile: Optional[JDProfile] = None,
+    record: bool = False
+) -> List[Tuple[Optional[dict], Optional[str]]]:
+    """Validate batch items, then analyze them in chunks across the analysis pool"""
+    outcomes: List[Tuple[Optional[dict], Optional[str]]] = [(None, None)] * len(cvs)
+    pending = []  # (index, text or features)
+    
+    for index, item in enumerate(cvs):
+        if item.features_id:
+            features = features_store.get(item.features_id)
+            if features is None:
+                outcomes[index] = (None, "features_id inconnu ou expiré")
+            else:
+                pending.append((index, features))
+        elif item.cv_text and len(item.cv_text.strip()) >= 50:
+            pending.append((index, item.cv_text.strip()))
+        else:
+            outcomes[index] = (None, "CV trop court (min 50 caractères)")
+    
+    chunk_size = settings.BATCH_CHUNK_SIZE
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    
+    if len(chunks) <= 1:
+        # Small batches aren't worth the IPC round trip, but still run off the event loop
+        chunk_results = [
+            await asyncio.to_thread(run_analysis_chunk, kind, [cv for _, cv in chunk], jd_profile)
+            for chunk in chunks
+        ]
+    else:
+        chunk_results = await asyncio.gather(*[
+            analysis_pool.run(run_analysis_chunk, kind, [cv for _, cv in chunk], jd_profile)
+            for chunk in chunks
+        ])
+    
+    for chunk, results in zip(chunks, chunk_results):
+        for (index, _), outcome in zip(chunk, results):
+            outcomes[index] = outcome
+    
+    if record and candidate_store is not None:
+        await asyncio.to_thread(record_candidates, [
+            (cv, outcomes[index][0]) for index, cv in pending if outcomes[index][0]
+        ])
+    
+    return outcomes
+
+# ============================================================================
+# RANKING
+# ============================================================================
+
+# Sparse BM25 / TF-IDF index; term vectors are cached per CV content hash
+cv_ranker = CVRanker(cache_size=settings.RANK_VECTOR_CACHE_SIZE)
+
+def rank_cvs(jd_profile: JDProfile, candidates: List[Tuple[int, str, Union[str, CVFeatures]]], top_k: int, mode: str) -> List[RankedCV]:
+    """Score candidates (index, key, text or features) against a JD and keep the top k"""
+    def tokens_of(cv: Union[str, CVFeatures]) -> Tuple[str, ...]:
+        return cv.tokens if isinstance(cv, CVFeatures) else tuple(cv.lower().split())
+    
+    jd_words = jd_profile.words
+    
+    if mode == "match_score":
+        # Compatibility mode: the legacy word-overlap score, one CV at a time
+        scores = np.array([
+            compute_match_score(frozenset(t for t in tokens_of(cv) if len(t) > 3), jd_words)
+            for _, _, cv in candidates
+        ], dtype=np.float32)
+    else:
+        with cv_ranker.session():
+            docs = []
+            for _, key, cv in candidates:
+                vector = cv_ranker.cached(key)
+                docs.append(vector if vector is not None else cv_ranker.doc_vector(key, tokens_of(cv)))
+            scores = cv_ranker.scores(jd_profile.tokens, docs, mode)
+    
+    results = []
+    for position, score in cv_ranker.top_k(scores, top_k):
+        index, key, cv = candidates[position]
+        cv_words = frozenset(t for t in tokens_of(cv) if len(t) > 3)
+        results.append(RankedCV(
+            index=index,
+            features_id=key,
+            score=round(score, 4),
+            match_score=compute_match_score(cv_words, jd_words)
+        ))
+    return results
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -418,83 +1223,692 @@ async def health_check():
     return {
         "status": "healthy",
         "ai_provider": "AI Engine",
+        "extraction_cache": extraction_cache.stats(),
+        "chunk_cache": chunk_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm": openai_service.stats() if openai_service is not None else None,
+        "jobs": job_queue.stats(),
+        "rate_limits": [limiter.stats() for limiter in rate_limiters.values()],
+        "llm_quota": llm_quota.stats(),
+        "logging": logger_stats(logger),
+        "event_loop": loop_lag.stats(),
+        "pools": {
+            "extraction": extraction_pool.stats(),
+            "analysis": analysis_pool.stats(),
+            "jobs": round((job_queue.depth + job_queue.running) / (job_queue.max_queue + job_queue.worker_count), 3),
+            "llm": (
+                round(openai_service.in_flight / openai_service.max_concurrency, 3)
+                if openai_service is not None else None
+            )
+        },
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/extract", response_model=ExtractionResponse)
+@app.post(
+    "/extract",
+    response_model=ExtractionResponse,
+    dependencies=[Depends(rate_limit("/extract"))]
+)
 async def extract_text(
     request: Request,
     cv: UploadFile = File(...),
     jd: UploadFile = File(None)
 ):
     """Extract text from CV and optional JD files"""
-    print(f"📥 Extraction request from {request.client.host}")
+    logger.info(f"📥 Extraction request from {request.client.host}")
     
     try:
-        cv_ext = Path(cv.filename).suffix.lower()
-        allowed_extensions = [".pdf", ".docx", ".doc", ".txt"]
-        if cv_ext not in allowed_extensions:
-            raise HTTPException(400, f"Type de fichier invalide. Autorisés: {allowed_extensions}")
-        
-        cv_bytes = await cv.read()
-        if len(cv_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(400, "Fichier trop volumineux. Max 10MB")
-        
-        cv_text, cv_word_count = process_file(cv_bytes, cv_ext)
+        cv_bytes, cv_ext, cv_key = await read_upload(cv)
+        cv_text, cv_word_count, cv_truncated = await extract_cached(cv_bytes, cv_ext, cv_key)
         
         jd_text = ""
+        jd_truncated = False
         if jd:
-            jd_ext = Path(jd.filename).suffix.lower()
-            jd_bytes = await jd.read()
-            jd_text, _ = process_file(jd_bytes, jd_ext)
+            jd_bytes, jd_ext, jd_key = await read_upload(jd)
+            jd_text, _, jd_truncated = await extract_cached(jd_bytes, jd_ext, jd_key)
+        
+        features = extract_features(cv_text, taxonomy, chunk_cache)
+        features_id = features_key(cv_text)
+        features_store.put(features_id, features)
+        if duplicate_index is not None:
+            cv_signature(features)
         
-        print(f"✅ Extracted {cv_word_count} words from CV")
+        logger.info(f"✅ Extracted {cv_word_count} words from CV")
         
         return ExtractionResponse(
             cv_text=cv_text,
             jd_text=jd_text,
             file_type=cv_ext,
-            word_count=cv_word_count
+            word_count=cv_word_count,
+            truncated=cv_truncated,
+            jd_truncated=jd_truncated,
+            features_id=features_id
         )
     
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        logger.warning(f"⚠️ Extraction pool saturated: {str(e)}")
+        raise HTTPException(503, "Serveur surchargé, réessayez dans quelques instants", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Extraction timeout after {extraction_pool.timeout}s")
+        raise HTTPException(504, "Délai d'extraction dépassé")
     except ValueError as e:
-        print(f"❌ Extraction error: {str(e)}")
+        logger.error(f"❌ Extraction error: {str(e)}")
         raise HTTPException(400, str(e))
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error: {str(e)}")
         raise HTTPException(500, "Internal server error")
 
-@app.post("/optimize", response_model=CVOptimizationResponse)
+async def perform_optimization(
+    data: CVAnalysisRequest,
+    client: str,
+    llm_budget: Optional[float] = None
+) -> CVOptimizationResponse:
+    """Optimize CV using AI analysis"""
+    deadline = llm_deadline(llm_budget)
+    
+    try:
+        features = resolve_features(data.candidate_cv_text, data.features_id)
+        
+        reused = find_reusable("optimize", features) if data.allow_reuse else None
+        if reused is not None:
+            # Keep the stored scores and advice, rebuild the text from this version
+            stored, source_key, similarity = reused
+            result = {
+                **stored,
+                "optimized_cv_text": build_optimized_cv_text(
+                    features.lines, list(features.skills),
+                    stored["original_cv_score"], stored["optimized_cv_score"]
+                )
+            }
+            logger.info(f"♻️ Reusing analysis of near-duplicate {source_key} (similarity {similarity:.2f})")
+        else:
+            result = analyze_cv_intelligence(features.text, features)
+        remember_result("optimize", features, result)
+        
+        # The candidate index keeps heuristic scores so searches compare like with like
+        if candidate_store is not None:
+            await asyncio.to_thread(record_candidates, [(features, result)])
+        
+        # An LLM answer for a near-duplicate beats both the heuristic and a new LLM call
+        llm_reused = find_reusable("optimize", features, engine="llm") if data.allow_reuse else None
+        if llm_reused is not None:
+            # The stored rewrite is the other CV's (contact details included), so only its
+            # scores and advice carry over; the engine says the text is not the LLM's
+            stored, source_key, similarity = llm_reused
+            result = {
+                **stored,
+                "confidence": analysis_confidence(features),
+                "optimized_cv_text": build_optimized_cv_text(
+                    features.lines, list(features.skills),
+                    stored["original_cv_score"], stored["optimized_cv_score"]
+                )
+            }
+            reused, engine = llm_reused, "llm_reused_scores"
+            logger.info(f"♻️ Reusing LLM analysis of near-duplicate {source_key} (similarity {similarity:.2f})")
+        else:
+            result, engine = await escalate_optimization(features, result, data.tier, deadline, client)
+            if engine == "llm":
+                remember_result("optimize", features, result, engine="llm")
+                reused = None
+        
+        logger.info(f"✅ Optimization complete ({engine}): {result['original_cv_score']} → {result['optimized_cv_score']}")
+        if reused is not None:
+            return CVOptimizationResponse(
+                **result, engine=engine, near_duplicate_of=reused[1], similarity=round(reused[2], 3)
+            )
+        return CVOptimizationResponse(**result, engine=engine)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Optimization error: {str(e)}")
+        raise HTTPException(500, f"Optimization failed: {str(e)}")
+
+@app.post(
+    "/optimize",
+    response_model=CVOptimizationResponse,
+    dependencies=[Depends(rate_limit("/optimize"))]
+)
 async def optimize_cv(
     request: Request,
     data: CVAnalysisRequest
 ):
     """Optimize CV using AI analysis"""
-    print(f"🚀 Optimization request from {request.client.host}")
+    logger.info(f"🚀 Optimization request from {request.client.host}")
+    return await perform_optimization(data, quota_identity(request))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def optimize_events(cv_text: str, use_llm: bool):
+    """Optimization fields as (kind, field, value), from the LLM when configured"""
+    if openai_service is None or not use_llm:
+        for field, value in heuristic_optimize(cv_text).items():
+            yield "field", field, value
+        yield "engine", "engine", "heuristic"
+        return
+    async for event in openai_service.stream_optimize_cv(cv_text):
+        yield event
+
+async def stream_optimization(cv_text: str, use_llm: bool):
+    """SSE body: scores, improvements, optimized CV text as written, keywords, final result
     
+    The final result is authoritative: if a cut-off LLM text was replaced by
+    the fallback engine's, an optimized_cv event with "replace" says so.
+    """
+    result = {}
+    text_streamed = False
     try:
-        result = analyze_cv_intelligence(data.candidate_cv_text)
-        print(f"✅ Optimization complete: {result['original_cv_score']} → {result['optimized_cv_score']}")
-        return CVOptimizationResponse(**result)
+        async for kind, field, value in optimize_events(cv_text, use_llm):
+            if kind in ("engine", "partial"):
+                result[kind] = value
+                continue
+            name = OPTIMIZE_FIELDS.get(field)
+            if name is None:
+                continue
+            
+            if kind == "delta":
+                text_streamed = True
+                yield sse_event("optimized_cv", {"delta": value})
+            elif name in ("original_cv_score", "optimized_cv_score"):
+                result[name] = int(value)
+                if "original_cv_score" in result and "optimized_cv_score" in result:
+                    yield sse_event("scores", {
+                        "original_cv_score": result["original_cv_score"],
+                        "optimized_cv_score": result["optimized_cv_score"]
+                    })
+            elif name == "optimized_cv_text":
+                result[name] = value
+                if not text_streamed:
+                    yield sse_event("optimized_cv", {"delta": value})
+                elif result.get("partial"):
+                    yield sse_event("optimized_cv", {"replace": value})
+            else:
+                result[name] = value
+                yield sse_event(name, {name: value})
+        
+        response = CVOptimizationResponse(**result)
+        logger.info(f"✅ Streamed optimization ({response.engine}): {response.original_cv_score} → {response.optimized_cv_score}")
+        yield sse_event("result", response.model_dump(mode="json"))
     except Exception as e:
-        print(f"❌ Optimization error: {str(e)}")
-        raise HTTPException(500, f"Optimization failed: {str(e)}")
+        # Headers are already sent, so errors travel as an event
+        logger.error(f"❌ Streaming optimization error: {str(e)}")
+        yield sse_event("error", {"detail": f"Optimization failed: {str(e)}"})
+
+@app.post("/optimize/stream", dependencies=[Depends(rate_limit("/optimize"))])
+async def optimize_cv_stream(
+    request: Request,
+    data: CVAnalysisRequest
+):
+    """Optimize CV, streaming the result as Server-Sent Events"""
+    logger.info(f"📡 Streaming optimization request from {request.client.host}")
+    
+    features = resolve_features(data.candidate_cv_text, data.features_id)
+    use_llm = False
+    if openai_service is not None:
+        # Over quota, the stream falls back to the heuristic engine
+        use_llm, _ = await llm_quota.consume(quota_identity(request))
+        if not use_llm:
+            logger.warning("🚫 Daily LLM quota reached, streaming heuristic result")
+    return StreamingResponse(
+        stream_optimization(features.text, use_llm),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def perform_skill_gaps(
+    data: SkillGapRequest,
+    client: str,
+    llm_budget: Optional[float] = None
+) -> SkillGapResponse:
+    """Analyze skill gaps using AI"""
+    deadline = llm_deadline(llm_budget)
+    
+    try:
+        features = resolve_features(data.cv_text, data.features_id)
+        jd_profile = resolve_jd(data.jd_text, data.jd_id)
+        
+        reused = find_reusable("skill_gaps", features) if data.allow_reuse else None
+        if reused is not None:
+            # Gap suggestions carry over; the JD match depends on this exact text
+            stored, source_key, similarity = reused
+            match_score, missing_jd_skills = match_against_jd(features, jd_profile)
+            result = {**stored, "match_score": match_score, "missing_jd_skills": missing_jd_skills}
+            logger.info(f"♻️ Reusing skill gaps of near-duplicate {source_key} (similarity {similarity:.2f})")
+        else:
+            result = analyze_skill_gaps_intelligence(features.text, "", features, jd_profile)
+        remember_result("skill_gaps", features, result)
+        
+        # LLM gaps were written against one JD, so they are only reused for that JD
+        jd_scope = features_key(jd_profile.text) if jd_profile is not None else ""
+        llm_reused = (
+            find_reusable("skill_gaps", features, engine="llm", scope=jd_scope) if data.allow_reuse else None
+        )
+        if llm_reused is not None:
+            stored, source_key, similarity = llm_reused
+            _, missing_jd_skills = match_against_jd(features, jd_profile)
+            result = {
+                **stored,
+                "confidence": analysis_confidence(features, jd_profile),
+                "missing_jd_skills": missing_jd_skills
+            }
+            reused, engine = llm_reused, "llm"
+            logger.info(f"♻️ Reusing LLM skill gaps of near-duplicate {source_key} (similarity {similarity:.2f})")
+        else:
+            result, engine = await escalate_skill_gaps(features, jd_profile, result, data.tier, deadline, client)
+            if engine == "llm":
+                remember_result("skill_gaps", features, result, engine="llm", scope=jd_scope)
+                reused = None
+        
+        logger.info(f"✅ Found {len(result['skill_gaps'])} skill gaps ({engine})")
+        if reused is not None:
+            return SkillGapResponse(
+                **result, engine=engine, near_duplicate_of=reused[1], similarity=round(reused[2], 3)
+            )
+        return SkillGapResponse(**result, engine=engine)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Skill gap analysis error: {str(e)}")
+        raise HTTPException(500, f"Analysis failed: {str(e)}")
 
-@app.post("/skill-gaps", response_model=SkillGapResponse)
+@app.post(
+    "/skill-gaps",
+    response_model=SkillGapResponse,
+    dependencies=[Depends(rate_limit("/skill-gaps"))]
+)
 async def analyze_skill_gaps(
     request: Request,
     data: SkillGapRequest
 ):
     """Analyze skill gaps using AI"""
-    print(f"🎯 Skill gap analysis from {request.client.host}")
+    logger.info(f"🎯 Skill gap analysis from {request.client.host}")
+    return await perform_skill_gaps(data, quota_identity(request))
+
+async def perform_optimize_batch(data: OptimizeBatchRequest) -> OptimizeBatchResponse:
+    """Optimize many CVs in one call, with per-item errors"""
+    try:
+        outcomes = await run_batch("optimize", data.cvs, record=True)
+    except PoolSaturatedError as e:
+        logger.warning(f"⚠️ Analysis pool saturated: {str(e)}")
+        raise HTTPException(503, "Serveur surchargé, réessayez dans quelques instants", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Batch optimization timeout after {analysis_pool.timeout}s")
+        raise HTTPException(504, "Délai d'analyse dépassé")
+    
+    results = [
+        OptimizeBatchItem(
+            index=index,
+            result=CVOptimizationResponse(**result) if result else None,
+            error=error
+        )
+        for index, (result, error) in enumerate(outcomes)
+    ]
+    logger.info(f"✅ Batch optimization complete: {sum(1 for r in results if r.error is None)}/{len(results)} succeeded")
+    return OptimizeBatchResponse(results=results)
+
+@app.post(
+    "/optimize/batch",
+    response_model=OptimizeBatchResponse,
+    dependencies=[Depends(rate_limit("/optimize/batch"))]
+)
+async def optimize_cv_batch(
+    request: Request,
+    data: OptimizeBatchRequest
+):
+    """Optimize many CVs in one call, with per-item errors"""
+    logger.info(f"🚀 Batch optimization of {len(data.cvs)} CVs from {request.client.host}")
+    return await perform_optimize_batch(data)
+
+async def perform_skill_gaps_batch(data: SkillGapBatchRequest) -> SkillGapBatchResponse:
+    """Analyze skill gaps for many CVs against one shared JD"""
+    # The JD is tokenized once for the whole batch
+    jd_profile = resolve_jd(data.jd_text, data.jd_id)
+    
+    try:
+        outcomes = await run_batch("skill_gaps", data.cvs, jd_profile)
+    except PoolSaturatedError as e:
+        logger.warning(f"⚠️ Analysis pool saturated: {str(e)}")
+        raise HTTPException(503, "Serveur surchargé, réessayez dans quelques instants", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Batch skill gap timeout after {analysis_pool.timeout}s")
+        raise HTTPException(504, "Délai d'analyse dépassé")
+    
+    results = [
+        SkillGapBatchItem(
+            index=index,
+            result=SkillGapResponse(**result) if result else None,
+            error=error
+        )
+        for index, (result, error) in enumerate(outcomes)
+    ]
+    logger.info(f"✅ Batch skill gaps complete: {sum(1 for r in results if r.error is None)}/{len(results)} succeeded")
+    return SkillGapBatchResponse(results=results)
+
+@app.post(
+    "/skill-gaps/batch",
+    response_model=SkillGapBatchResponse,
+    dependencies=[Depends(rate_limit("/skill-gaps/batch"))]
+)
+async def analyze_skill_gaps_batch(
+    request: Request,
+    data: SkillGapBatchRequest
+):
+    """Analyze skill gaps for many CVs against one shared JD"""
+    logger.info(f"🎯 Batch skill gap analysis of {len(data.cvs)} CVs from {request.client.host}")
+    return await perform_skill_gaps_batch(data)
+
+@app.post("/job-descriptions", response_model=JDRegistrationResponse)
+async def register_job_description(
+    request: Request,
+    data: JDRegistrationRequest
+):
+    """Parse a JD once and store its profile for /skill-gaps and /rank"""
+    logger.info(f"📝 JD registration from {request.client.host}")
+    
+    jd_text = data.jd_text.strip()
+    jd_id = features_key(jd_text)
+    profile = jd_profiles.get(jd_id)
+    if profile is None:
+        profile = build_jd_profile(jd_text, taxonomy)
+        jd_profiles.put(jd_id, profile)
+    
+    logger.info(f"✅ JD registered: {len(profile.required_skills)} required skills")
+    return JDRegistrationResponse(
+        jd_id=jd_id,
+        word_count=len(profile.tokens),
+        required_skills=[taxonomy.skills[key].name for key in profile.required_skills if key in taxonomy.skills],
+        skill_weights=profile.skill_weights,
+        expires_in=settings.JD_PROFILE_TTL
+    )
+
+@app.post("/rank", response_model=RankResponse, dependencies=[Depends(rate_limit("/rank"))])
+async def rank_candidates(
+    request: Request,
+    data: RankRequest
+):
+    """Rank many CVs against one JD and return the top k"""
+    logger.info(f"🏆 Ranking {len(data.cvs)} CVs ({data.mode}) from {request.client.host}")
+    
+    jd_profile = resolve_jd(data.jd_text, data.jd_id)
+    
+    candidates = []
+    errors = []
+    for index, item in enumerate(data.cvs):
+        if item.features_id:
+            features = features_store.get(item.features_id)
+            if features is None:
+                errors.append(RankError(index=index, error="features_id inconnu ou expiré"))
+            else:
+                candidates.append((index, item.features_id, features))
+        elif item.cv_text and item.cv_text.strip():
+            text = item.cv_text.strip()
+            candidates.append((index, features_key(text), text))
+        else:
+            errors.append(RankError(index=index, error="CV vide"))
     
     try:
-        result = analyze_skill_gaps_intelligence(data.cv_text, data.jd_text)
-        print(f"✅ Found {len(result['skill_gaps'])} skill gaps")
-        return SkillGapResponse(**result)
+        results = await asyncio.to_thread(rank_cvs, jd_profile, candidates, data.top_k, data.mode)
     except Exception as e:
-        print(f"❌ Skill gap analysis error: {str(e)}")
-        raise HTTPException(500, f"Analysis failed: {str(e)}")
+        logger.error(f"❌ Ranking error: {str(e)}")
+        raise HTTPException(500, f"Ranking failed: {str(e)}")
+    
+    logger.info(f"✅ Ranked {len(candidates)} CVs, returning top {len(results)}")
+    return RankResponse(results=results, errors=errors, mode=data.mode, total=len(candidates))
+
+@app.post("/candidates/search", response_model=CandidateSearchResponse)
+async def search_candidates(
+    request: Request,
+    data: CandidateSearchRequest
+):
+    """Boolean skill search over every stored CV, best score first"""
+    if candidate_store is None:
+        raise HTTPException(404, "Index de candidats désactivé (CANDIDATE_STORE_PATH)")
+    
+    started = datetime.now()
+    skills = taxonomy
+    unknown = []
+    
+    def keys_for(names: List[str]) -> List[str]:
+        keys = []
+        for name in names:
+            key = skills.resolve(name)
+            if key is None:
+                unknown.append(name)
+            else:
+                keys.append(key)
+        return keys
+    
+    all_keys, any_keys, none_keys = keys_for(data.all_skills), keys_for(data.any_skills), keys_for(data.none_skills)
+    if any(name in unknown for name in data.all_skills) or (data.any_skills and not any_keys):
+        # A required skill nobody can have, or no known skill among the alternatives: nothing matches
+        ids, total = [], 0
+    else:
+        ids, total = candidate_store.search(all_keys, any_keys, none_keys, data.min_score, data.limit)
+    
+    results = [
+        CandidateSummary(**{**summary, "skills": skills.display_names(summary["skills"]),
+                            "created_at": datetime.fromtimestamp(summary["created_at"])})
+        for summary in candidate_store.summaries(ids)
+    ]
+    took_ms = (datetime.now() - started).total_seconds() * 1000
+    logger.info(f"✅ Candidate search from {request.client.host}: {total} matches in {took_ms:.1f}ms")
+    return CandidateSearchResponse(results=results, total=total, unknown_skills=unknown, took_ms=round(took_ms, 2))
+
+@app.get("/candidates/{candidate_id}", response_model=CandidateDetail)
+async def get_candidate(candidate_id: str):
+    """Stored CV text, scores and skills for one candidate"""
+    if candidate_store is None:
+        raise HTTPException(404, "Index de candidats désactivé (CANDIDATE_STORE_PATH)")
+    
+    candidate = candidate_store.get(candidate_id)
+    if candidate is None:
+        raise HTTPException(404, "Candidat introuvable")
+    
+    candidate["skills"] = taxonomy.display_names(candidate["skills"])
+    candidate["created_at"] = datetime.fromtimestamp(candidate["created_at"])
+    return CandidateDetail(**candidate)
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+# Job kind -> (request model, analysis function); payloads are validated on submit
+JOB_KINDS = {
+    "optimize": (CVAnalysisRequest, perform_optimization),
+    "skill_gaps": (SkillGapRequest, perform_skill_gaps),
+    "optimize_batch": (OptimizeBatchRequest, perform_optimize_batch),
+    "skill_gaps_batch": (SkillGapBatchRequest, perform_skill_gaps_batch)
+}
+
+# Kinds that may call the LLM: their payload carries the submitter's quota identity
+LLM_JOB_KINDS = {"optimize", "skill_gaps"}
+
+def job_handler(kind, model, perform):
+    async def handle(payload: dict) -> dict:
+        if kind in LLM_JOB_KINDS:
+            fields = {key: value for key, value in payload.items() if key != "_client"}
+            # Nobody is waiting on the connection, so the LLM gets the job budget, not the request one
+            response = await perform(model(**fields), payload.get("_client", "unknown"), settings.JOB_LLM_BUDGET)
+        else:
+            response = await perform(model(**payload))
+        return response.model_dump(mode="json")
+    return handle
+
+# Throughput is set by JOB_WORKERS, independently of HTTP concurrency
+job_queue = JobQueue(
+    backend=(
+        SQLiteJobBackend(str(resolve_data_path(settings.JOB_STORE_PATH)))
+        if settings.JOB_STORE_PATH else MemoryJobBackend()
+    ),
+    handlers={kind: job_handler(kind, model, perform) for kind, (model, perform) in JOB_KINDS.items()},
+    max_queue=settings.JOB_QUEUE_SIZE,
+    workers=settings.JOB_WORKERS,
+    result_ttl=settings.JOB_RESULT_TTL
+)
+
+def job_timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+def job_status(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job_timestamp(job["created_at"]),
+        "started_at": job_timestamp(job["started_at"]),
+        "finished_at": job_timestamp(job["finished_at"]),
+        "expires_at": job_timestamp(job["expires_at"]),
+        "error": job["error"]
+    }
+
+async def find_job(job_id: str) -> dict:
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job inconnu ou expiré")
+    return job
+
+@app.post(
+    "/jobs",
+    response_model=JobStatusResponse,
+    status_code=202,
+    dependencies=[Depends(rate_limit("/jobs"))]
+)
+async def submit_job(
+    request: Request,
+    data: JobSubmitRequest
+):
+    """Queue an analysis and return immediately; poll /jobs/{job_id} for progress"""
+    model, _ = JOB_KINDS[data.kind]
+    try:
+        payload = model(**data.payload).model_dump(mode="json")
+    except ValidationError as e:
+        raise HTTPException(422, json.loads(e.json(include_url=False)))
+    if data.kind in LLM_JOB_KINDS:
+        payload["_client"] = quota_identity(request)
+    
+    try:
+        job = await job_queue.submit(data.kind, payload)
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Job queue full: {str(e)}")
+        raise HTTPException(429, "File de traitement pleine, réessayez plus tard",
+                            headers={"Retry-After": str(e.retry_after)})
+    
+    logger.info(f"📥 Job {job['id']} ({data.kind}) queued from {request.client.host}")
+    return JobStatusResponse(**job_status(job))
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    return JobStatusResponse(**job_status(await find_job(job_id)))
+
+@app.get("/jobs/{job_id}/result", response_model=JobResultResponse)
+async def get_job_result(job_id: str):
+    """Result of a finished job (409 with Retry-After while it is still pending)"""
+    job = await find_job(job_id)
+    if job["status"] not in (DONE, FAILED):
+        raise HTTPException(409, "Job pas encore terminé",
+                            headers={"Retry-After": str(job_queue.retry_after())})
+    return JobResultResponse(**job_status(job), result=job["result"])
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def cache_hit_ratios() -> dict:
+    return {
+        "extraction": extraction_cache.stats()["hit_ratio"],
+        "chunk": chunk_cache.stats()["hit_ratio"],
+        "features": features_store.stats()["hit_ratio"],
+        "jd_profile": jd_profiles.stats()["hit_ratio"],
+        "llm": llm_cache.stats()["hit_ratio"]
+    }
+
+metrics.gauge("cache_hit_ratio", "Hit ratio per cache since startup", cache_hit_ratios, label="cache")
+metrics.gauge(
+    "pool_pending", "Jobs queued or running per worker pool",
+    lambda: {
+        "extraction": extraction_pool.pending,
+        "analysis": analysis_pool.pending,
+        "jobs": job_queue.depth + job_queue.running,
+        "llm": openai_service.in_flight if openai_service is not None else None
+    },
+    label="pool"
+)
+metrics.gauge(
+    "pool_capacity", "Maximum jobs per worker pool before requests are refused",
+    lambda: {
+        "extraction": extraction_pool.capacity,
+        "analysis": analysis_pool.capacity,
+        "jobs": job_queue.max_queue + job_queue.worker_count,
+        "llm": openai_service.max_concurrency if openai_service is not None else None
+    },
+    label="pool"
+)
+metrics.gauge("event_loop_lag_seconds", "Delay of the last event-loop lag probe", lambda: loop_lag.lag)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ============================================================================
+# ADMIN
+# ============================================================================
+
+async def require_admin(x_api_key: Optional[str] = Header(None)):
+    """Allow only callers presenting API_SECRET_KEY"""
+    if not admin_enabled():
+        raise HTTPException(403, "Administration désactivée : définissez API_SECRET_KEY")
+    if not x_api_key or not secrets.compare_digest(x_api_key, settings.API_SECRET_KEY):
+        raise HTTPException(401, "Clé API invalide")
+
+@app.get("/admin/taxonomy", dependencies=[Depends(require_admin)])
+async def taxonomy_info():
+    return taxonomy.stats()
+
+@app.post("/admin/taxonomy/reload", dependencies=[Depends(require_admin)])
+async def reload_taxonomy():
+    """Reload the skill taxonomy from disk without a restart (this worker only)"""
+    global taxonomy
+    
+    path = resolve_data_path(settings.SKILL_TAXONOMY_PATH)
+    try:
+        new_taxonomy = await asyncio.to_thread(SkillTaxonomy.load, path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"❌ Taxonomy reload failed: {str(e)}")
+        raise HTTPException(400, f"Échec du rechargement de la taxonomie: {str(e)}")
+    
+    taxonomy = new_taxonomy
+    # Analysis workers were forked with the old taxonomy; new ones fork with this one
+    analysis_pool.restart()
+    if openai_service is not None and openai_service.prompt_builder is not None:
+        openai_service.prompt_builder.section_headers = taxonomy.section_headers
+    logger.info(f"✅ Taxonomy reloaded: {len(taxonomy.skills)} skills")
+    return taxonomy.stats()
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return {"enabled": settings.PROFILING_ENABLED, "profiles": profile_store.summaries()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: Literal["text", "pstats"] = "text", sort: str = "cumulative"):
+    """A stored profile: pstats top functions as text, or the raw .pstats file (snakeviz, flameprof)"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(404, "Profil inconnu ou expiré")
+    
+    if format == "pstats":
+        return Response(
+            profile["pstats"],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'}
+        )
+    try:
+        text = await asyncio.to_thread(ProfileStore.as_text, profile, sort)
+    except KeyError:
+        raise HTTPException(400, f"Tri invalide: {sort}")
+    return PlainTextResponse(text)
 
 # ============================================================================
 # Error Handlers
@@ -502,15 +1916,16 @@ async def analyze_skill_gaps(
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    print(f"❌ HTTP error {exc.status_code}: {exc.detail}")
+    logger.error(f"❌ HTTP error {exc.status_code}: {exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"error": exc.detail, "status_code": exc.status_code}
+        content={"error": exc.detail, "status_code": exc.status_code},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    print(f"❌ Unhandled error: {str(exc)}")
+    logger.error(f"❌ Unhandled error: {str(exc)}", exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error", "status_code": 500}
@@ -1,17 +1,28 @@
-from openai import AsyncOpenAI
-from typing import Dict, List
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
 import json
+import logging
 import re
+import time
 
-class OpenAIService:
-    def __init__(self, api_key: str, model: str, temperature: float):
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.model = model
-        self.temperature = temperature
-    
-    async def optimize_cv(self, cv_text: str) -> Dict:
-        """Optimize CV and return scores"""
-        prompt = f"""You are an expert career coach and CV optimizer.
+from utils.json_stream import JSONObjectStream
+from utils.llm_guard import (
+    CircuitBreaker, CircuitOpenError, InvalidLLMReplyError, LLMReplyTruncatedError, LLMRequestRejectedError,
+    LLMUnavailableError, backoff_delay, parse_retry_after
+)
+from utils.metrics import Metrics
+from utils.prompt_budget import PromptBuilder, count_tokens
+from utils.response_cache import ResponseCache
+
+logger = logging.getLogger("cv_enhancer.openai")
+
+# Bump when a prompt template changes so stale cached answers are not served
+OPTIMIZE_PROMPT_VERSION = "optimize-v2"
+SKILL_GAPS_PROMPT_VERSION = "skill-gaps-v2"
+
+OPTIMIZE_TEMPLATE = """You are an expert career coach and CV optimizer.
 
 Analyze the following CV and provide:
 1. Original CV score (0-100)
@@ -32,29 +43,8 @@ Return ONLY a valid JSON object with this structure:
 CV to analyze:
 {cv_text}
 """
-        
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=self.temperature
-        )
-        
-        content = response.choices[0].message.content
-        
-        # Parse JSON response
-        try:
-            # Remove markdown code blocks if present
-            content = re.sub(r'```json\s*|\s*```', '', content).strip()
-            result = json.loads(content)
-            return result
-        except json.JSONDecodeError:
-            # Fallback parsing
-            return self._parse_fallback(content, cv_text)
-    
-    async def identify_skill_gaps(self, cv_text: str, jd_text: str = "") -> Dict:
-        """Identify skill gaps and provide suggestions"""
-        if jd_text:
-            prompt = f"""You are an expert career advisor.
+
+SKILL_GAPS_JD_TEMPLATE = """You are an expert career advisor.
 
 Compare this CV against the Job Description and identify skill gaps.
 For each gap, provide actionable learning suggestions.
@@ -74,8 +64,8 @@ CV:
 Job Description:
 {jd_text}
 """
-        else:
-            prompt = f"""You are an expert career advisor.
+
+SKILL_GAPS_TEMPLATE = """You are an expert career advisor.
 
 Analyze this CV and identify general skill gaps or areas for improvement.
 Provide actionable suggestions for each gap.
@@ -91,20 +81,351 @@ Return ONLY a valid JSON object:
 CV:
 {cv_text}
 """
+
+class OpenAIService:
+    # Upstream statuses worth retrying; other 4xx are our fault and fail fast
+    RETRYABLE_STATUSES = {408, 409, 429}
+    # The optimize reply rewrites the whole CV, so the CV may use this share of max_tokens;
+    # the rest covers scores, improvements, keywords and JSON escaping
+    OPTIMIZE_CV_SHARE_OF_REPLY = 0.6
+    
+    def __init__(self, api_key: str, model: str, temperature: float,
+                 cache: Optional[ResponseCache] = None,
+                 base_url: Optional[str] = None,
+                 max_concurrency: int = 8,
+                 timeout: float = 30.0,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 optimize_fallback: Optional[Callable[[str], Dict]] = None,
+                 skill_gaps_fallback: Optional[Callable[[str, str], Dict]] = None,
+                 max_tokens: Optional[int] = None,
+                 prompt_builder: Optional[PromptBuilder] = None,
+                 metrics: Optional[Metrics] = None):
+        # Retries are handled here (with Retry-After and the breaker), not by the SDK
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or None, max_retries=0, timeout=timeout)
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.breaker = breaker or CircuitBreaker()
+        self.optimize_fallback = optimize_fallback
+        self.skill_gaps_fallback = skill_gaps_fallback
+        self.max_tokens = max_tokens
+        self.prompt_builder = prompt_builder
+        self.metrics = metrics
+        self.retries = 0
+        self.fallbacks = 0
+        self.trimmed_prompts = 0
+        self.tokens_sent = 0
+        self.tokens_received = 0
+    
+    async def _open(self, prompt: str, temperature: float, stream: bool = False):
+        """Start a chat completion under the concurrency cap, deadline, retry policy and breaker
+        
+        Returns with the concurrency slot still held; callers release it
+        with _release_slot() once they are done reading the response.
+        """
+        deadline = time.monotonic() + self.timeout
+        
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+            
+            # Waiting for a slot counts against the deadline but not against upstream health
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0.001))
+            except asyncio.TimeoutError:
+                self.breaker.release()
+                raise LLMUnavailableError("No LLM slot free before the deadline")
+            
+            retry_after = None
+            opened = False
+            self.in_flight += 1
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        stream=stream,
+                        **({"max_tokens": self.max_tokens} if self.max_tokens else {})
+                    ),
+                    timeout=max(deadline - time.monotonic(), 0.001)
+                )
+                self.breaker.record_success()
+                opened = True
+                return response
+            except APIStatusError as e:
+                if e.status_code < 500 and e.status_code not in self.RETRYABLE_STATUSES:
+                    # Our request is at fault: no retry, and the upstream body stays out of callers' messages
+                    self.breaker.release()
+                    raise LLMRequestRejectedError(f"LLM rejected the request (HTTP {e.status_code})", e.status_code) from e
+                self.breaker.record_failure()
+                retry_after = parse_retry_after(e.response.headers)
+                error = e
+            except (APIConnectionError, asyncio.TimeoutError) as e:
+                self.breaker.record_failure()
+                error = e
+            except BaseException:
+                self.breaker.release()
+                raise
+            finally:
+                if not opened:
+                    self._release_slot()
+            
+            if attempt == self.max_retries:
+                break
+            delay = retry_after if retry_after is not None else backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            if time.monotonic() + delay >= deadline:
+                break
+            self.retries += 1
+            await asyncio.sleep(delay)
+        
+        raise LLMUnavailableError(f"LLM call failed: {error!r}") from error
+    
+    def _release_slot(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+    
+    def _stage(self, name: str):
+        return self.metrics.stage(name) if self.metrics is not None else nullcontext()
+    
+    async def _complete(self, prompt: str, temperature: float) -> str:
+        """Full text of one guarded chat completion"""
+        with self._stage("llm_completion"):
+            response = await self._open(prompt, temperature)
+            try:
+                content = response.choices[0].message.content or ""
+            finally:
+                self._release_slot()
+        
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._record_usage(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            self._record_usage(self._count(prompt), self._count(content))
+        if response.choices[0].finish_reason == "length":
+            raise LLMReplyTruncatedError(f"LLM reply cut off at max_tokens ({self.max_tokens})", content)
+        return content
+    
+    async def _stream_completion(self, prompt: str, temperature: float) -> AsyncIterator[str]:
+        """Text deltas of one guarded streaming completion
         
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
+        Retries only cover opening the stream; afterwards LLM_TIMEOUT bounds
+        the gap between two chunks rather than the whole generation.
+        """
+        with self._stage("llm_stream_open"):
+            stream = await self._open(prompt, temperature, stream=True)
+        received: List[str] = []
+        try:
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                except (APIConnectionError, asyncio.TimeoutError) as e:
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"LLM stream interrupted: {e!r}") from e
+                
+                if chunk.choices and chunk.choices[0].finish_reason == "length":
+                    logger.warning(f"⚠️ Streamed LLM reply cut off at max_tokens ({self.max_tokens})")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.response.aclose()
+            self._release_slot()
+            # Streamed chunks carry no usage block, so both sides are counted locally
+            self._record_usage(self._count(prompt), self._count("".join(received)))
+    
+    def _count(self, text: str) -> int:
+        if self.prompt_builder is not None:
+            return self.prompt_builder.count(text)
+        return count_tokens(text, self.model)
+    
+    def _record_usage(self, sent: int, received: int):
+        self.tokens_sent += sent
+        self.tokens_received += received
+        logger.info(f"🧮 LLM tokens: {sent} sent, {received} received")
+    
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "trimmed_prompts": self.trimmed_prompts,
+            "tokens_sent": self.tokens_sent,
+            "tokens_received": self.tokens_received,
+            "max_output_tokens": self.max_tokens,
+            "prompt_budget": self.prompt_builder.stats() if self.prompt_builder is not None else None,
+            "breaker": self.breaker.stats()
+        }
+    
+    async def _cached(self, template_version: str, temperature: float, inputs: tuple, compute) -> Dict:
+        """Serve from the response cache, coalescing identical in-flight calls"""
+        if self.cache is None:
+            result, _ = await compute()
+            return result
         
-        content = response.choices[0].message.content
+        key = self._cache_key(template_version, temperature, inputs)
+        return await self.cache.get_or_compute(key, compute)
+    
+    def _cache_key(self, template_version: str, temperature: float, inputs: tuple) -> str:
+        # Budgets change the prompt actually sent, so they are part of the key
+        budget = self.prompt_builder.max_input_tokens if self.prompt_builder is not None else None
+        return ResponseCache.make_key(self.model, temperature, template_version, budget, self.max_tokens, *inputs)
+    
+    async def optimize_cv(self, cv_text: str, use_fallback: bool = True) -> Dict:
+        """Optimize CV and return scores
         
+        With use_fallback=False, LLMUnavailableError is raised instead of
+        answering from the fallback engine.
+        """
+        try:
+            return await self._cached(
+                OPTIMIZE_PROMPT_VERSION, self.temperature, (cv_text,),
+                lambda: self._optimize_cv(cv_text)
+            )
+        except LLMUnavailableError as e:
+            if not use_fallback:
+                raise
+            if self.optimize_fallback is not None:
+                self.fallbacks += 1
+                return self.optimize_fallback(cv_text)
+            if isinstance(e, InvalidLLMReplyError):
+                return self._parse_fallback(e.content, cv_text)
+            raise
+    
+    async def _optimize_cv(self, cv_text: str) -> Tuple[Dict, bool]:
+        content = await self._complete(self._optimize_prompt(cv_text), self.temperature)
+        
+        # Parse JSON response
         try:
+            # Remove markdown code blocks if present
             content = re.sub(r'```json\s*|\s*```', '', content).strip()
-            return json.loads(content)
+            result = json.loads(content)
+            return result, True
         except json.JSONDecodeError:
-            return {"skill_gaps": [], "match_score": None}
+            # Not cached, so the next call asks the model again
+            raise InvalidLLMReplyError("LLM reply is not valid JSON", content)
+    
+    async def stream_optimize_cv(self, cv_text: str) -> AsyncIterator[Tuple[str, str, Any]]:
+        """Optimize CV, yielding JSON fields as the model produces them
+        
+        Yields ("field", key, value) for each completed top-level field,
+        ("delta", "optimized_cv", text) while the optimized CV is written, and
+        ("engine", "engine", "llm" | "heuristic") last, naming who produced it.
+        If the answer is cut off or malformed, the missing fields come from
+        the fallback engine, preceded by ("partial", "partial", True) when
+        some LLM fields were already sent; that mix is reported as heuristic
+        and never cached.
+        """
+        key = self._cache_key(OPTIMIZE_PROMPT_VERSION, self.temperature, (cv_text,))
+        cached = await self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            for field, value in cached.items():
+                yield "field", field, value
+            yield "engine", "engine", "llm"
+            return
+        
+        parser = JSONObjectStream(stream_keys=["optimized_cv"])
+        content: List[str] = []
+        malformed = False
+        sent = False
+        try:
+            async for piece in self._stream_completion(self._optimize_prompt(cv_text), self.temperature):
+                content.append(piece)
+                if malformed:
+                    continue
+                try:
+                    events = parser.feed(piece)
+                except ValueError:
+                    malformed = True
+                    continue
+                for event in events:
+                    sent = True
+                    yield event
+        except LLMUnavailableError as e:
+            if self.optimize_fallback is None and not parser.done:
+                raise
+            logger.warning(f"⚠️ LLM stream interrupted: {str(e)}")
+        
+        if parser.done and not malformed:
+            if self.cache is not None:
+                await self.cache.put(key, parser.result)
+            yield "engine", "engine", "llm"
+            return
+        
+        if self.optimize_fallback is None:
+            raise InvalidLLMReplyError("LLM stream ended without a complete JSON answer", "".join(content))
+        
+        # Complete what the LLM didn't with the fallback engine's answer
+        self.fallbacks += 1
+        if sent:
+            yield "partial", "partial", True
+        for field, value in self.optimize_fallback(cv_text).items():
+            if field not in parser.result:
+                yield "field", field, value
+        yield "engine", "engine", "heuristic"
+    
+    def _optimize_prompt(self, cv_text: str) -> str:
+        # The reply echoes the CV rewritten, so the CV is also sized to fit the output budget
+        reply_room = int(self.max_tokens * self.OPTIMIZE_CV_SHARE_OF_REPLY) if self.max_tokens else None
+        return self._build_prompt(OPTIMIZE_TEMPLATE, [("cv_text", cv_text, 1.0)], reply_room)
+    
+    async def identify_skill_gaps(self, cv_text: str, jd_text: str = "", use_fallback: bool = True) -> Dict:
+        """Identify skill gaps and provide suggestions"""
+        try:
+            return await self._cached(
+                SKILL_GAPS_PROMPT_VERSION, 0.7, (cv_text, jd_text),
+                lambda: self._identify_skill_gaps(cv_text, jd_text)
+            )
+        except LLMUnavailableError as e:
+            if not use_fallback:
+                raise
+            if self.skill_gaps_fallback is not None:
+                self.fallbacks += 1
+                return self.skill_gaps_fallback(cv_text, jd_text)
+            if isinstance(e, InvalidLLMReplyError):
+                return {"skill_gaps": [], "match_score": None}
+            raise
+    
+    async def _identify_skill_gaps(self, cv_text: str, jd_text: str) -> Tuple[Dict, bool]:
+        content = await self._complete(self._skill_gaps_prompt(cv_text, jd_text), 0.7)
+        
+        try:
+            content = re.sub(r'```json\s*|\s*```', '', content).strip()
+            return json.loads(content), True
+        except json.JSONDecodeError:
+            raise InvalidLLMReplyError("LLM reply is not valid JSON", content)
+    
+    def _skill_gaps_prompt(self, cv_text: str, jd_text: str) -> str:
+        if jd_text:
+            # The CV gets the larger share; whatever the JD doesn't use goes back to it
+            return self._build_prompt(SKILL_GAPS_JD_TEMPLATE, [("cv_text", cv_text, 0.6), ("jd_text", jd_text, 0.4)])
+        return self._build_prompt(SKILL_GAPS_TEMPLATE, [("cv_text", cv_text, 1.0)])
+    
+    def _build_prompt(self, template: str, fields: List[Tuple[str, str, float]],
+                      max_field_tokens: Optional[int] = None) -> str:
+        if self.prompt_builder is None:
+            return template.format(**{name: text for name, text, _ in fields})
+        
+        prompt, tokens, trimmed = self.prompt_builder.build(template, fields, max_field_tokens)
+        if trimmed:
+            self.trimmed_prompts += 1
+            logger.info(f"✂️ Prompt trimmed to {tokens} tokens (budget {self.prompt_builder.max_input_tokens})")
+        return prompt
     
     def _parse_fallback(self, content: str, original_cv: str) -> Dict:
         """Fallback parser if JSON parsing fails"""
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+import httpx
+
+import main
+
+def post_batch(cvs: list) -> httpx.Response:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 1))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/optimize/batch", json={"cvs": cvs})
+    return asyncio.run(scenario())
+
+def test_small_batch_is_analyzed_off_the_event_loop(monkeypatch):
+    threads = []
+    analyze = main.run_analysis_chunk
+    
+    def recording_chunk(*args):
+        threads.append(threading.current_thread())
+        return analyze(*args)
+    
+    monkeypatch.setattr(main, "run_analysis_chunk", recording_chunk)
+    response = post_batch([
+        {"cv_text": "Jane Roe\nExperience\nPython developer 2019-2023\nSkills\nPython, SQL"},
+        {"cv_text": "too short"}
+    ])
+    
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["error"] is None and results[1]["error"] is not None
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_oversized_batch_item_is_rejected():
+    response = post_batch([{"cv_text": "x" * (main.settings.EXTRACTION_MAX_CHARS + 1)}])
+    assert response.status_code == 422
@@ -0,0 +1,57 @@
+import threading
+
+from utils.candidate_store import CandidateStore
+
+def add(store: CandidateStore, candidate_id: str, score: int, *skills: str):
+    store.add_many([(candidate_id, f"CV {candidate_id}", score, score + 10, skills)])
+
+def test_boolean_search_best_score_first(tmp_path):
+    store = CandidateStore(str(tmp_path / "candidates.db"))
+    add(store, "a", 50, "python", "sql")
+    add(store, "b", 80, "python", "docker")
+    add(store, "c", 70, "java")
+    
+    assert store.search(all_of=["python"]) == (["b", "a"], 2)
+    assert store.search(any_of=["sql", "java"]) == (["c", "a"], 2)
+    assert store.search(all_of=["python"], none_of=["docker"]) == (["a"], 1)
+    assert store.search(all_of=["python"], min_score=60) == (["b"], 1)
+    assert store.search(all_of=["rust"]) == ([], 0)
+
+def test_workers_sharing_a_database_agree_on_skill_bits(tmp_path):
+    db_path = str(tmp_path / "candidates.db")
+    first, second = CandidateStore(db_path), CandidateStore(db_path)
+    add(first, "a", 50, "terraform")
+    add(second, "b", 60, "rust")
+    
+    # Each worker sees the other's rows without a restart
+    assert first.search(all_of=["rust"]) == (["b"], 1)
+    assert second.search(all_of=["terraform"]) == (["a"], 1)
+    
+    restarted = CandidateStore(db_path)
+    assert restarted.search(all_of=["terraform"]) == (["a"], 1)
+    assert restarted.search(all_of=["rust"]) == (["b"], 1)
+    assert restarted.get("b")["skills"] == ["rust"]
+
+def test_concurrent_new_skills_from_two_workers(tmp_path):
+    db_path = str(tmp_path / "candidates.db")
+    stores = [CandidateStore(db_path) for _ in range(4)]
+    errors = []
+    
+    def record(index: int, store: CandidateStore):
+        try:
+            for round_ in range(20):
+                add(store, f"{index}-{round_}", 50, f"skill-{round_}", f"own-{index}")
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=record, args=(i, store)) for i, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    bits = dict(stores[0].db.execute("SELECT skill, bit FROM skill_bits"))
+    assert len(set(bits.values())) == len(bits) == 24
+    assert stores[0].search(all_of=["skill-3"])[1] == 4
+    assert stores[1].search(all_of=["own-2"])[1] == 20
@@ -0,0 +1,128 @@
+import asyncio
+import socketserver
+import threading
+
+import pytest
+
+from utils.counter_store import CounterStoreError, RedisCounterStore, SQLiteCounterStore
+from utils.rate_limiter import SharedRateLimiter
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    first = SQLiteCounterStore(str(tmp_path / "counters.db"))
+    second = SQLiteCounterStore(str(tmp_path / "counters.db"))
+    
+    assert first.incr_many([("a", 2), ("b", 1)], ttl=60) == [2, 1]
+    assert second.incr_many([("a", 3), ("b", 0)], ttl=60) == [5, 1]
+    assert first.incr_many([("a", 1)], ttl=-1) == [6]
+    assert first.incr_many([("a", 1)], ttl=60) == [1]  # expired counters restart
+
+def test_shared_limiter_counts_hits_from_every_worker(tmp_path):
+    workers = [
+        SharedRateLimiter(SQLiteCounterStore(str(tmp_path / "counters.db")), requests=5, period=3600, scope="t")
+        for _ in range(2)
+    ]
+    
+    async def scenario():
+        first, second = workers
+        decisions = [first.acquire("1.2.3.4")[0] for _ in range(3)]
+        await first.flush()
+        decisions.append(second.acquire("1.2.3.4")[0])
+        await second.flush()  # pushes its hit and learns about the other worker's three
+        decisions.extend(second.acquire("1.2.3.4")[0] for _ in range(2))
+        await asyncio.gather(*(w.flush_task for w in workers if w.flush_task), return_exceptions=True)
+        return decisions
+    
+    assert asyncio.run(scenario()) == [True, True, True, True, True, False]
+    assert workers[1].stats()["rejected"] == 1
+
+def test_shared_limiter_fails_open_and_keeps_hits():
+    class DownStore:
+        def incr_many(self, items, ttl):
+            raise CounterStoreError("down")
+        
+        def describe(self):
+            return "down"
+    
+    limiter = SharedRateLimiter(DownStore(), requests=5, period=3600)
+    
+    async def scenario():
+        allowed = limiter.acquire("1.2.3.4")[0]
+        await limiter.flush()
+        return allowed
+    
+    assert asyncio.run(scenario())
+    assert limiter.pending_hits == 1
+    assert limiter.stats()["store_errors"] == 1
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """INCRBY / EXPIRE / AUTH / SELECT over RESP2, enough for RedisCounterStore"""
+    
+    def handle(self):
+        server = self.server
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            server.commands.append(args)
+            if server.drop_next:
+                server.drop_next = False
+                return
+            
+            command = args[0].upper()
+            if command == "INCRBY":
+                server.values[args[1]] = server.values.get(args[1], 0) + int(args[2])
+                self.wfile.write(b":%d\r\n" % server.values[args[1]])
+            elif command == "EXPIRE":
+                self.wfile.write(b":1\r\n")
+            elif command == "AUTH":
+                self.wfile.write(b"+OK\r\n" if args[1] == "s3cret" else b"-WRONGPASS invalid password\r\n")
+            elif command == "SELECT":
+                self.wfile.write(b"+OK\r\n")
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RESPHandler)
+    server.daemon_threads = True
+    server.commands, server.values, server.drop_next = [], {}, False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_redis_store_pipelines_incrby_and_expire(resp_server):
+    store = RedisCounterStore(f"redis://:s3cret@127.0.0.1:{resp_server.server_address[1]}/2")
+    
+    assert store.incr_many([("a", 2), ("b", 1)], ttl=60) == [2, 1]
+    assert store.incr_many([("a", 3)], ttl=60) == [5]
+    assert resp_server.commands == [
+        ["AUTH", "s3cret"], ["SELECT", "2"],
+        ["INCRBY", "a", "2"], ["EXPIRE", "a", "60"], ["INCRBY", "b", "1"], ["EXPIRE", "b", "60"],
+        ["INCRBY", "a", "3"], ["EXPIRE", "a", "60"]
+    ]
+
+def test_redis_store_reconnects_once_after_a_dropped_connection(resp_server):
+    store = RedisCounterStore(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+    store.incr_many([("a", 1)], ttl=60)
+    
+    resp_server.drop_next = True
+    assert store.incr_many([("a", 1)], ttl=60) == [2]
+
+def test_redis_store_surfaces_server_errors(resp_server):
+    store = RedisCounterStore(f"redis://:wrong@127.0.0.1:{resp_server.server_address[1]}")
+    with pytest.raises(CounterStoreError, match="WRONGPASS"):
+        store.incr_many([("a", 1)], ttl=60)
+    assert store.sock is None
+
+def test_redis_store_unreachable(resp_server):
+    port = resp_server.server_address[1]
+    resp_server.shutdown()
+    resp_server.server_close()
+    with pytest.raises(CounterStoreError):
+        RedisCounterStore(f"redis://127.0.0.1:{port}", timeout=0.2).incr_many([("a", 1)], ttl=60)
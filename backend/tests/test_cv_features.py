@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import pytest
+
+from utils.cv_features import CHUNK_MAX_LINES, extract_features, split_chunks
+from utils.lru_store import LRUStore
+from utils.skill_taxonomy import SkillTaxonomy
+
+@pytest.fixture(scope="module")
+def taxonomy():
+    return SkillTaxonomy.load(Path(__file__).resolve().parent.parent / "data" / "skills_taxonomy.json")
+
+def single_spaced_cv(lines: int = 2000) -> str:
+    return "\n".join(
+        f"Led team {i} building Python and Docker services, cut latency {i % 90}%" for i in range(lines)
+    )
+
+def test_split_chunks_keeps_every_line_in_order():
+    text = single_spaced_cv(500) + "\n\nEducation\nMSc"
+    chunks = list(split_chunks(text))
+    
+    assert "\n".join(chunks).split("\n") == [line for line in text.split("\n") if line]
+    assert max(chunk.count("\n") + 1 for chunk in chunks) <= CHUNK_MAX_LINES
+    assert len(chunks) > 500 // CHUNK_MAX_LINES
+
+def test_edited_single_spaced_cv_reuses_most_chunks(taxonomy):
+    text = single_spaced_cv()
+    cache = LRUStore(max_items=10_000)
+    extract_features(text, taxonomy, cache)
+    chunks = cache.misses
+    
+    lines = text.split("\n")
+    lines[1000] = "Led team 1000 building Kubernetes platforms"
+    edited = "\n".join(lines)
+    cache.misses = 0
+    features = extract_features(edited, taxonomy, cache)
+    
+    assert chunks > 2000 // CHUNK_MAX_LINES
+    assert cache.misses <= 2
+    uncached = extract_features(edited, taxonomy)
+    assert (features.tokens, features.keywords, features.lines) == (uncached.tokens, uncached.keywords, uncached.lines)
@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+import pytest
+
+from utils.cv_ranker import CVRanker, rank_terms
+
+JD = "senior python developer with django and postgresql".split()
+CVS = {
+    "strong": "python developer django postgresql python apis".split(),
+    "partial": "java developer spring postgresql".split(),
+    "none": "graphic designer photoshop illustrator".split()
+}
+
+def vectors(ranker: CVRanker) -> list:
+    return [ranker.doc_vector(key, tokens) for key, tokens in CVS.items()]
+
+def test_rank_terms_strips_punctuation_and_short_terms():
+    assert rank_terms(["(python),", "c", "«django»", "a.", "sql;"]) == ["python", "django", "sql"]
+
+@pytest.mark.parametrize("mode", ["bm25", "tfidf"])
+def test_more_shared_terms_rank_higher(mode):
+    ranker = CVRanker()
+    with ranker.session():
+        scores = ranker.scores(JD, vectors(ranker), mode)
+    
+    strong, partial, none = scores
+    assert strong > partial > none == 0
+
+def test_tfidf_scores_are_cosines():
+    ranker = CVRanker()
+    with ranker.session():
+        docs = [ranker.doc_vector("same", JD), ranker.doc_vector("other", ["cooking"])]
+        scores = ranker.scores(JD, docs, "tfidf")
+    assert scores[0] == pytest.approx(1.0, abs=1e-5) and scores[1] == 0
+
+def test_query_without_known_terms_scores_zero():
+    ranker = CVRanker()
+    with ranker.session():
+        assert not ranker.scores(["kotlin"], vectors(ranker)).any()
+        assert ranker.scores(JD, []).size == 0
+
+def test_top_k_is_best_first_and_stable_on_ties():
+    scores = np.array([0.2, 0.9, 0.2, 0.5], dtype=np.float32)
+    assert [i for i, _ in CVRanker.top_k(scores, 3)] == [1, 3, 0]
+    assert len(CVRanker.top_k(scores, 10)) == 4
+    assert CVRanker.top_k(scores, 0) == []
+
+def test_vocabulary_is_reset_between_passes_not_during_one():
+    ranker = CVRanker(max_vocabulary=5)
+    with ranker.session():
+        docs = vectors(ranker)  # 14 distinct terms, well past the cap
+        scores = ranker.scores(JD, docs)
+        assert ranker.cached("strong") is not None
+    assert scores[0] > scores[1] > scores[2] == 0
+    
+    with ranker.session():
+        assert ranker.vocabulary == {} and ranker.cached("strong") is None
+        assert (ranker.scores(JD, vectors(ranker)) == scores).all()
+
+def test_reset_waits_for_running_passes():
+    ranker = CVRanker(max_vocabulary=5)
+    events = []
+    
+    def next_pass():
+        with ranker.session():
+            events.append("reset" if ranker.vocabulary == {} else "no reset")
+    
+    with ranker.session():
+        docs = vectors(ranker)
+        second = threading.Thread(target=next_pass)
+        second.start()
+        second.join(timeout=0.2)
+        assert second.is_alive()  # blocked until this pass ends
+        events.append("scored")
+        scores = ranker.scores(JD, docs)
+    second.join(timeout=2.0)
+    
+    assert events == ["scored", "reset"]
+    assert scores[0] > 0
@@ -0,0 +1,60 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+
+import main
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+)
+
+def make_docx(body: str) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {NAMESPACES}><w:body>{body}</w:body></w:document>")
+    return buffer.getvalue()
+
+def para(text: str) -> str:
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+def row(*cells: str) -> str:
+    return "<w:tr>" + "".join(f"<w:tc>{cell}</w:tc>" for cell in cells) + "</w:tr>"
+
+def blocks(body: str) -> list:
+    return list(main.iter_docx_blocks(make_docx(body)))
+
+def test_paragraphs_and_table_rows_come_out_in_document_order():
+    body = para("Jane Roe") + f"<w:tbl>{row(para('Python'), para('SQL'))}{row(para('Docker'), para(''))}</w:tbl>" + para("Experience")
+    assert blocks(body) == ["Jane Roe", "Python | SQL", "Docker", "Experience"]
+
+def test_runs_tabs_and_breaks_join_within_a_paragraph():
+    body = "<w:p><w:r><w:t>Skills:</w:t><w:tab/><w:t>Python</w:t><w:br/><w:t>SQL</w:t></w:r></w:p>"
+    assert blocks(body) == ["Skills:\tPython\nSQL"]
+
+def test_text_box_is_read_once_despite_its_fallback_copy():
+    text_box = (
+        "<mc:AlternateContent><mc:Choice><w:txbxContent>" + para("Kubernetes") + "</w:txbxContent></mc:Choice>"
+        "<mc:Fallback><w:txbxContent>" + para("Kubernetes") + "</w:txbxContent></mc:Fallback></mc:AlternateContent>"
+    )
+    body = f"<w:p><w:r><w:t>Header</w:t></w:r><w:r>{text_box}</w:r></w:p>"
+    assert blocks(body) == ["Kubernetes", "Header"]
+
+def test_nested_table_is_folded_into_its_cell():
+    inner = f"<w:tbl>{row(para('Go'), para('Rust'))}</w:tbl>"
+    assert blocks(f"<w:tbl>{row(para('Languages'), inner)}</w:tbl>") == ["Languages | Go | Rust"]
+
+def test_extraction_stops_at_the_character_budget(monkeypatch):
+    monkeypatch.setattr(main.settings, "EXTRACTION_MAX_CHARS", 25)
+    text, truncated = main.extract_text_from_docx(make_docx("".join(para(f"line {i}") for i in range(100))))
+    
+    assert truncated
+    assert text == "line 0\nline 1\nline 2\nline"
+
+def test_file_without_a_document_part_is_a_value_error():
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("other.xml", "<x/>")
+    with pytest.raises(ValueError):
+        main.extract_text_from_docx(buffer.getvalue())
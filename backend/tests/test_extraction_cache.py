@@ -0,0 +1,44 @@
+import asyncio
+
+from utils.extraction_cache import ExtractionCache
+
+def disk_keys(cache: ExtractionCache) -> list:
+    return [row[0] for row in cache.db.execute("SELECT key FROM extractions ORDER BY created_at, rowid")]
+
+def test_disk_tier_keeps_the_newest_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExtractionCache, "PRUNE_INTERVAL", 2)
+    cache = ExtractionCache(db_path=str(tmp_path / "extractions.db"), max_rows=3)
+    
+    async def scenario():
+        for index in range(6):
+            await cache.put(f"k{index}", ("text", index))
+    
+    asyncio.run(scenario())
+    assert disk_keys(cache) == ["k3", "k4", "k5"]
+    assert cache.stats()["disk_evicted"] == 3
+
+def test_disk_tier_expires_rows(tmp_path):
+    db_path = str(tmp_path / "extractions.db")
+    asyncio.run(ExtractionCache(db_path=db_path).put("old", ("text", 1)))
+    
+    cache = ExtractionCache(db_path=db_path, ttl=-1)
+    assert asyncio.run(cache.get("old")) is None
+    assert disk_keys(cache) == []
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / "extractions.db")
+    asyncio.run(ExtractionCache(db_path=db_path).put("k", ("text", 1)))
+    
+    cache = ExtractionCache(db_path=db_path)
+    assert asyncio.run(cache.get("k")) == ("text", 1)
+    assert cache.stats()["disk_hits"] == 1
+
+def test_key_changes_with_the_extraction_limits():
+    file_bytes = b"%PDF-1.4 same file"
+    keys = {
+        ExtractionCache(limits=limits).make_key(file_bytes, ".PDF")
+        for limits in [(30, 100_000), (10, 100_000), (30, 5_000)]
+    }
+    
+    assert len(keys) == 3
+    assert all(key.endswith(".pdf") for key in keys)
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from utils.extraction_pool import ExtractionPool, WorkerCrashedError
+
+def crash():
+    os._exit(1)
+
+def hang():
+    time.sleep(60)
+
+def double(value):
+    return value * 2
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(max_workers=1, max_queue=4, timeout=1.0)
+    yield pool
+    pool.shutdown()
+
+def test_pool_recovers_after_a_worker_dies(pool):
+    async def scenario():
+        with pytest.raises(WorkerCrashedError):
+            await pool.run(crash)
+        return await pool.run(double, 21)
+    
+    assert asyncio.run(scenario()) == 42
+    assert pool.recycled == 1
+
+def test_timed_out_job_is_killed_and_frees_its_slot(pool):
+    pool.timeout = 0.5
+    
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(hang)
+        await asyncio.sleep(0.2)
+        pending = pool.pending
+        pool.timeout = 5.0
+        return pending, await pool.run(double, 4)
+    
+    pending, result = asyncio.run(scenario())
+    assert pending == 0
+    assert result == 8
+    assert pool.recycled == 1
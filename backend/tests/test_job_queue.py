@@ -0,0 +1,68 @@
+import asyncio
+import subprocess
+import sys
+
+from utils.job_queue import DONE, QUEUED, RUNNING, JobQueue, SQLiteJobBackend, owner_alive
+
+async def echo(payload: dict) -> dict:
+    return payload
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def add_job(backend: SQLiteJobBackend, job_id: str, status: str, owner: str):
+    backend.create({
+        "id": job_id, "kind": "echo", "payload": {"id": job_id}, "status": status, "result": None,
+        "error": None, "created_at": 0.0, "started_at": None, "finished_at": None, "expires_at": None,
+        "owner": owner
+    })
+
+def restart(db_path) -> JobQueue:
+    """Start a queue on the store, let it drain what it reclaimed, stop it"""
+    async def scenario():
+        queue = JobQueue(SQLiteJobBackend(str(db_path)), {"echo": echo}, workers=1)
+        queue.start()
+        await queue.queue.join()
+        await queue.shutdown()
+        return queue
+    
+    return asyncio.run(scenario())
+
+def test_owner_alive():
+    assert owner_alive("1:boot", "other")  # init never goes away
+    assert not owner_alive(f"{dead_pid()}:boot", "other")
+    assert not owner_alive(None, "other")
+
+def test_start_leaves_jobs_of_a_live_sibling_alone(tmp_path):
+    backend = SQLiteJobBackend(str(tmp_path / "jobs.db"))
+    add_job(backend, "live", RUNNING, "1:sibling")
+    
+    restart(tmp_path / "jobs.db")
+    job = backend.get("live")
+    assert (job["status"], job["owner"]) == (RUNNING, "1:sibling")
+
+def test_start_reclaims_jobs_of_a_dead_process(tmp_path):
+    backend = SQLiteJobBackend(str(tmp_path / "jobs.db"))
+    add_job(backend, "queued", QUEUED, f"{dead_pid()}:gone")
+    add_job(backend, "running", RUNNING, f"{dead_pid()}:gone")
+    add_job(backend, "legacy", RUNNING, None)
+    
+    queue = restart(tmp_path / "jobs.db")
+    for job_id in ("queued", "running", "legacy"):
+        job = backend.get(job_id)
+        assert (job["status"], job["result"], job["owner"]) == (DONE, {"id": job_id}, queue.owner)
+
+def test_submit_runs_the_job_and_keeps_its_result(tmp_path):
+    async def scenario():
+        queue = JobQueue(SQLiteJobBackend(str(tmp_path / "jobs.db")), {"echo": echo}, workers=1)
+        queue.start()
+        job = await queue.submit("echo", {"n": 1})
+        await queue.queue.join()
+        stored = await queue.get(job["id"])
+        await queue.shutdown()
+        return stored
+    
+    job = asyncio.run(scenario())
+    assert (job["status"], job["result"]) == (DONE, {"n": 1})
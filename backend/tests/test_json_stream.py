@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from utils.json_stream import JSONObjectStream
+
+def feed_all(text: str, chunk_size: int, stream_keys=("optimized_cv",)):
+    parser = JSONObjectStream(stream_keys)
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[start:start + chunk_size]))
+    return parser, events
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+@pytest.mark.parametrize("text", [
+    '{"original_score":42,"optimized_score":80}',
+    '{"a":true}',
+    '{"a":null}',
+    '{"a":-1.5e3}',
+    '{"a":[1,2],"b":{"c":3},"d":7}',
+    '{"optimized_cv":"Line\\nTwo \\u00e9","optimized_score":80}',
+    '```json\n{"original_score": 42, "optimized_score": 80}\n```'
+])
+def test_compact_and_spaced_objects_complete(text, chunk_size):
+    parser, events = feed_all(text, chunk_size)
+    expected = json.loads(text.strip("`").removeprefix("json"))
+    
+    assert parser.done
+    assert parser.result == expected
+    assert [(key, value) for kind, key, value in events if kind == "field"] == list(expected.items())
+
+def test_scalar_closed_by_brace_emits_field_before_done():
+    parser = JSONObjectStream()
+    assert parser.feed('{"score":8') == []
+    assert parser.feed('0}') == [("field", "score", 80)]
+    assert parser.done
+
+def test_streamed_string_deltas_rebuild_value():
+    text = '{"optimized_cv":"caf\\u00e9 \\ud83d\\ude00 ok","x":1}'
+    parser, events = feed_all(text, 2)
+    
+    deltas = "".join(value for kind, key, value in events if kind == "delta")
+    assert deltas == "café 😀 ok"
+    assert parser.result == {"optimized_cv": "café 😀 ok", "x": 1}
+
+def test_garbage_after_value_is_rejected():
+    parser = JSONObjectStream()
+    with pytest.raises(ValueError):
+        parser.feed('{"a":1]')
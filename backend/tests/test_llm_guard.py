@@ -0,0 +1,276 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import main
+from services.openai_service import OpenAIService
+from utils.llm_guard import (
+    CircuitBreaker, LLMReplyTruncatedError, LLMRequestRejectedError, LLMUnavailableError, parse_retry_after
+)
+from utils.prompt_budget import PromptBuilder
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("utils.llm_guard.time.monotonic", clock)
+    return clock
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    breaker.record_success()  # resets the streak
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.allow()
+    breaker.record_failure()
+    
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # the probe is still out
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.allow()
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 2
+
+def test_released_probe_does_not_judge_upstream(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.allow()
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release()
+    
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after": "2"}, 2.0),
+    ({"retry-after": "soon"}, None),
+    ({}, None)
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(headers) == expected
+
+class ThrottlingUpstream(BaseHTTPRequestHandler):
+    """Chat completions endpoint answering error_status (429 with Retry-After) until `throttled` runs out"""
+    
+    throttled = 0
+    error_status = 429
+    reply = "{}"
+    finish_reason = "stop"
+    delay = 0.0
+    retry_after = "0"
+    seen: list = []
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.seen.append(time.monotonic())
+        time.sleep(self.delay)
+        if len(self.seen) <= self.throttled:
+            body, status = {"error": {"message": "upstream secret detail", "type": "rate_limit"}}, self.error_status
+        else:
+            body, status = {
+                "id": "x", "object": "chat.completion", "created": 0, "model": "m",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": self.finish_reason}]
+            }, 200
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", self.retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+@pytest.fixture
+def upstream():
+    ThrottlingUpstream.seen = []
+    ThrottlingUpstream.error_status = 429
+    ThrottlingUpstream.reply, ThrottlingUpstream.delay = "{}", 0.0
+    ThrottlingUpstream.finish_reason = "stop"
+    ThrottlingUpstream.throttled = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingUpstream)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_service(upstream, timeout: float) -> OpenAIService:
+    # Backoff near zero, so any real wait between attempts comes from Retry-After
+    return OpenAIService(
+        api_key="sk-test", model="m", temperature=0.0, timeout=timeout,
+        base_url=f"http://127.0.0.1:{upstream.server_port}/v1", backoff_base=0.001, backoff_max=0.001
+    )
+
+def test_open_waits_for_retry_after(upstream):
+    ThrottlingUpstream.throttled, ThrottlingUpstream.retry_after = 1, "0.3"
+    service = make_service(upstream, timeout=5.0)
+    
+    async def scenario():
+        response = await service._open("prompt", 0.0)
+        service._release_slot()
+        return response
+    
+    assert asyncio.run(scenario()).choices[0].message.content == "{}"
+    first, second = ThrottlingUpstream.seen
+    assert second - first >= 0.3
+    assert service.retries == 1
+    assert service.breaker.state == CircuitBreaker.CLOSED
+
+def test_open_gives_up_when_retry_after_passes_the_deadline(upstream):
+    ThrottlingUpstream.throttled, ThrottlingUpstream.retry_after = 5, "30"
+    service = make_service(upstream, timeout=2.0)
+    
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(service._open("prompt", 0.0))
+    
+    assert time.monotonic() - started < 1.0
+    assert len(ThrottlingUpstream.seen) == 1
+    assert service.in_flight == 0
+
+def test_open_fails_fast_on_a_rejected_request(upstream):
+    ThrottlingUpstream.throttled, ThrottlingUpstream.error_status = 5, 401
+    service = make_service(upstream, timeout=5.0)
+    
+    with pytest.raises(LLMRequestRejectedError) as info:
+        asyncio.run(service._open("prompt", 0.0))
+    
+    assert info.value.status_code == 401
+    assert "secret" not in str(info.value)
+    assert len(ThrottlingUpstream.seen) == 1
+    assert service.breaker.stats()["consecutive_failures"] == 0
+
+@pytest.mark.parametrize("path, payload", [
+    ("/optimize", {"candidate_cv_text": "Jane Roe\nExperience\nPython developer 2019-2023\nSkills\nPython, SQL"}),
+    ("/skill-gaps", {"cv_text": "Jane Roe\nExperience\nPython developer 2019-2023\nSkills\nPython, SQL"})
+])
+def test_rejected_escalation_serves_the_heuristic_result(upstream, monkeypatch, path, payload):
+    ThrottlingUpstream.throttled, ThrottlingUpstream.error_status = 5, 401
+    monkeypatch.setattr(main, "openai_service", make_service(upstream, timeout=5.0))
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 1))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json={**payload, "tier": "premium", "allow_reuse": False})
+    
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()["engine"] == "heuristic"
+    assert len(ThrottlingUpstream.seen) == 1
+
+def test_reply_cut_off_at_max_tokens_is_reported(upstream):
+    ThrottlingUpstream.reply, ThrottlingUpstream.finish_reason = '{"optimized_cv": "Jane', "length"
+    service = make_service(upstream, timeout=5.0)
+    
+    with pytest.raises(LLMReplyTruncatedError):
+        asyncio.run(service._complete("prompt", 0.0))
+    assert service.in_flight == 0
+
+def test_cut_off_optimize_reply_serves_the_heuristic_result(upstream, monkeypatch):
+    ThrottlingUpstream.reply, ThrottlingUpstream.finish_reason = '{"optimized_cv": "Jane', "length"
+    monkeypatch.setattr(main, "openai_service", make_service(upstream, timeout=5.0))
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 1))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/optimize", json={
+                "candidate_cv_text": "Jane Roe\nExperience\nPython developer 2019-2023\nSkills\nPython, SQL",
+                "tier": "premium", "allow_reuse": False
+            })
+    
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()["engine"] == "heuristic"
+
+def test_optimize_prompt_leaves_room_to_echo_the_cv():
+    service = OpenAIService(
+        api_key="sk-test", model="m", temperature=0.0, max_tokens=200,
+        prompt_builder=PromptBuilder(max_input_tokens=6000, section_headers={})
+    )
+    cv = "Jane Roe\nExperience\n" + "\n".join(f"Built service number {i} in Python" for i in range(300))
+    prompt = service._optimize_prompt(cv)
+    
+    assert service.trimmed_prompts == 1
+    assert service._count(prompt) - service._count(service._optimize_prompt("")) <= 200 * OpenAIService.OPTIMIZE_CV_SHARE_OF_REPLY
+
+def test_queued_jobs_wait_past_the_request_latency_budget(upstream, monkeypatch):
+    ThrottlingUpstream.delay = 0.5
+    ThrottlingUpstream.reply = json.dumps({
+        "original_score": 40, "optimized_score": 90, "improvements": ["x"],
+        "optimized_cv": "LLM REWRITE", "ats_keywords": ["python"]
+    })
+    monkeypatch.setattr(main, "openai_service", make_service(upstream, timeout=5.0))
+    monkeypatch.setattr(main.settings, "HYBRID_LATENCY_BUDGET", 0.1)
+    monkeypatch.setattr(main.settings, "JOB_LLM_BUDGET", 5.0)
+    handle = main.job_handler("optimize", main.CVAnalysisRequest, main.perform_optimization)
+    
+    result = asyncio.run(handle({
+        "candidate_cv_text": "Jane Roe\nExperience\nPython developer 2019-2023\nSkills\nPython, SQL", "tier": "premium",
+        "allow_reuse": False, "_client": "ip:127.0.0.1"
+    }))
+    assert (result["engine"], result["optimized_cv_text"]) == ("llm", "LLM REWRITE")
+
+def test_near_duplicate_reuses_llm_scores_but_says_the_text_is_heuristic(upstream, monkeypatch):
+    ThrottlingUpstream.reply = json.dumps({
+        "original_score": 40, "optimized_score": 90, "improvements": ["x"],
+        "optimized_cv": "LLM REWRITE", "ats_keywords": ["python"]
+    })
+    monkeypatch.setattr(main, "openai_service", make_service(upstream, timeout=5.0))
+    cv = "Jane Roe\nExperience\n" + "\n".join(
+        f"Senior Python developer at Company{i} from 201{i} building APIs and data pipelines" for i in range(8)
+    )
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 1))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/optimize", json={"candidate_cv_text": cv + "\nPhone 0600000000", "tier": "premium"})
+            second = await client.post("/optimize", json={"candidate_cv_text": cv + "\nPhone 0611111111"})
+            return first.json(), second.json()
+    
+    first, second = asyncio.run(scenario())
+    assert (first["engine"], first["optimized_cv_text"]) == ("llm", "LLM REWRITE")
+    assert (second["engine"], second["optimized_cv_score"]) == ("llm_reused_scores", 90)
+    assert second["optimized_cv_text"] != "LLM REWRITE"
+    assert second["near_duplicate_of"] is not None
+    assert len(ThrottlingUpstream.seen) == 1
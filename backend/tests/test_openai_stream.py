@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+from services.openai_service import OpenAIService
+from utils.response_cache import ResponseCache
+
+HEURISTIC = {
+    "original_score": 50, "optimized_score": 70, "improvements": ["heuristic advice"],
+    "optimized_cv": "HEURISTIC CV", "ats_keywords": ["sql"]
+}
+
+class StreamingUpstream(BaseHTTPRequestHandler):
+    """Streams `reply` in small chunks, then ends the stream"""
+    
+    reply = ""
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for start in range(0, len(self.reply), 5):
+            chunk = {
+                "id": "x", "object": "chat.completion.chunk", "created": 0, "model": "m",
+                "choices": [{"index": 0, "delta": {"content": self.reply[start:start + 5]}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+@pytest.fixture
+def service():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamingUpstream)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield OpenAIService(
+        api_key="sk-test", model="m", temperature=0.0, cache=ResponseCache(),
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        optimize_fallback=lambda cv_text: dict(HEURISTIC)
+    )
+    server.shutdown()
+    server.server_close()
+
+def collect(service: OpenAIService) -> list:
+    async def scenario():
+        return [event async for event in service.stream_optimize_cv("Jane Roe, Python developer")]
+    return asyncio.run(scenario())
+
+def test_complete_answer_is_llm_and_cached(service):
+    StreamingUpstream.reply = json.dumps({**HEURISTIC, "optimized_cv": "LLM CV", "original_score": 41})
+    events = collect(service)
+    
+    assert events[-1] == ("engine", "engine", "llm")
+    assert ("field", "original_score", 41) in events
+    assert service.cache.stats()["entries"] == 1
+
+def test_cut_off_answer_is_completed_by_the_fallback_engine(service):
+    StreamingUpstream.reply = '{"original_score": 41, "optimized_cv": "LLM par'
+    events = collect(service)
+    
+    fields = {field: value for kind, field, value in events if kind == "field"}
+    assert fields == {**HEURISTIC, "original_score": 41}
+    assert ("partial", "partial", True) in events
+    assert events[-1] == ("engine", "engine", "heuristic")
+    assert service.cache.stats()["entries"] == 0
+    assert service.fallbacks == 1
+
+def test_stream_result_reports_the_partial_fallback(service, monkeypatch):
+    StreamingUpstream.reply = '{"original_score": 41, "optimized_cv": "LLM par'
+    monkeypatch.setattr(main, "openai_service", service)
+    
+    async def scenario():
+        return [chunk async for chunk in main.stream_optimization("Jane Roe, Python developer", use_llm=True)]
+    
+    events = {}
+    for chunk in asyncio.run(scenario()):
+        event, data = chunk.strip().split("\n")
+        events.setdefault(event[len("event: "):], []).append(json.loads(data[len("data: "):]))
+    
+    assert events["optimized_cv"][-1] == {"replace": "HEURISTIC CV"}
+    result = events["result"][0]
+    assert (result["engine"], result["partial"], result["original_cv_score"]) == ("heuristic", True, 41)
+    assert result["optimized_cv_text"] == "HEURISTIC CV"
@@ -0,0 +1,46 @@
+from utils.prompt_budget import PromptBuilder, compact_text
+
+def test_dates_are_not_page_markers():
+    text = "Software Engineer\n09/2019\n2017 / 2019\n01/2020 - 12/2021"
+    assert compact_text(text) == text
+
+def test_page_markers_are_dropped():
+    text = "Alice\nPage 1 of 2\nExperience\n2 / 2\nSkills"
+    assert compact_text(text) == "Alice\nExperience\nSkills"
+
+def test_repeated_content_lines_are_kept():
+    text = "\n".join([
+        "Software Engineer", "ACME 2015-2017", "Built APIs",
+        "Software Engineer", "Globex 2017-2019", "Built APIs",
+        "Software Engineer", "Initech 2019-2023", "Built APIs"
+    ])
+    assert compact_text(text) == text
+
+def test_running_headers_at_page_boundaries_are_deduplicated():
+    pages = [
+        "Alice Martin - CV\nExperience\nSoftware Engineer at ACME",
+        "Alice Martin - CV\nProjects\nCV parser",
+        "Alice Martin - CV\nSkills\nPython"
+    ]
+    text = "\n".join(f"{page}\nPage {index + 1} of 3" for index, page in enumerate(pages))
+    compacted = compact_text(text)
+    
+    assert compacted.count("Alice Martin - CV") == 1
+    assert "Software Engineer at ACME" in compacted and "Python" in compacted
+
+def test_build_leaves_text_that_fits_untouched():
+    builder = PromptBuilder(max_input_tokens=1000, section_headers={})
+    cv = "Alice\n\n\n   Page 1 of 1\n09/2019   Engineer"
+    prompt, _, trimmed = builder.build("CV:\n{cv_text}", [("cv_text", cv, 1.0)])
+    
+    assert prompt == "CV:\n" + cv
+    assert not trimmed
+
+def test_build_trims_to_budget():
+    builder = PromptBuilder(max_input_tokens=60, section_headers={"skills": "skills", "interests": "interests"})
+    cv = "Alice\nSkills\nPython, SQL\nInterests\n" + "\n".join(f"hobby number {i}" for i in range(200))
+    prompt, tokens, trimmed = builder.build("CV:\n{cv_text}", [("cv_text", cv, 1.0)])
+    
+    assert trimmed
+    assert tokens <= 60
+    assert "Python, SQL" in prompt
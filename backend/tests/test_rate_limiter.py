@@ -0,0 +1,69 @@
+import asyncio
+import types
+
+import pytest
+from fastapi import HTTPException, Request
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+def test_burst_up_to_the_limit_then_reject(clock):
+    limiter = RateLimiter(requests=3, period=60)
+    assert [limiter.acquire("a")[0] for _ in range(4)] == [True, True, True, False]
+    
+    allowed, retry_after = limiter.acquire("a")
+    assert not allowed
+    assert retry_after == pytest.approx(20.0)  # one token every 60 / 3 seconds
+    assert limiter.stats()["rejected"] == 2
+
+def test_tokens_refill_with_time_up_to_the_burst(clock):
+    limiter = RateLimiter(requests=3, period=60)
+    for _ in range(3):
+        limiter.acquire("a")
+    
+    clock.now += 20
+    assert limiter.acquire("a")[0]
+    assert not limiter.acquire("a")[0]
+    
+    clock.now += 10_000
+    assert [limiter.acquire("a")[0] for _ in range(4)] == [True, True, True, False]
+
+def test_clients_have_separate_buckets(clock):
+    limiter = RateLimiter(requests=1, period=60)
+    assert limiter.acquire("a")[0] and limiter.acquire("b")[0]
+    assert not limiter.acquire("a")[0]
+
+def test_idle_keys_are_evicted(clock):
+    limiter = RateLimiter(requests=5, period=60, shards=1)
+    limiter.acquire("idle")
+    clock.now += 61
+    limiter.acquire("active")
+    
+    assert limiter.stats()["keys"] == 1
+    assert limiter.evicted == 1
+
+def test_key_space_is_bounded(clock):
+    limiter = RateLimiter(requests=5, period=60, max_keys=8, shards=2)
+    for index in range(100):
+        limiter.acquire(f"client{index}")
+    
+    assert limiter.stats()["keys"] <= 8
+    assert limiter.evicted >= 92
+
+def test_rejected_request_gets_429_with_retry_after(clock):
+    limiter = RateLimiter(requests=1, period=30)
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "client": ("10.0.0.1", 1)})
+    asyncio.run(limiter(request))
+    
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(limiter(request))
+    assert info.value.status_code == 429
+    assert info.value.headers["Retry-After"] == "30"
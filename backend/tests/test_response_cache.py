@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from utils.response_cache import ResponseCache
+
+def test_followers_retry_when_the_leader_is_cancelled(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "responses.db"))
+    calls = []
+    
+    async def compute():
+        calls.append(len(calls))
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return f"answer-{len(calls)}", True
+    
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+    
+    assert asyncio.run(scenario()) == "answer-2"
+    assert len(calls) == 2
+    assert cache.in_flight == {}
+
+def test_errors_still_reach_followers():
+    cache = ResponseCache()
+    
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+    
+    async def scenario():
+        return await asyncio.gather(
+            cache.get_or_compute("k", compute), cache.get_or_compute("k", compute), return_exceptions=True
+        )
+    
+    results = asyncio.run(scenario())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert cache.stats()["coalesced"] == 1
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "responses.db")
+    
+    async def store():
+        await ResponseCache(db_path=db_path).put("k", {"score": 77})
+    
+    async def load():
+        cache = ResponseCache(db_path=db_path)
+        return await cache.get("k"), cache.stats()["disk_hits"]
+    
+    asyncio.run(store())
+    assert asyncio.run(load()) == ({"score": 77}, 1)
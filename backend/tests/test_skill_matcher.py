@@ -0,0 +1,32 @@
+import pytest
+
+from utils.skill_matcher import SkillMatcher
+
+@pytest.fixture
+def matcher():
+    return SkillMatcher(
+        ["go", "java", "javascript", "c", "c++", "c#", "ci/cd", "git", "github", "node.js"],
+        aliases={"golang": ["go"], "js": ["javascript"], "k8s": ["kubernetes"]}
+    )
+
+@pytest.mark.parametrize("text, expected", [
+    ("A good team player", set()),
+    ("Backend in Go and Java", {"go", "java"}),
+    ("Frontend in JavaScript only", {"javascript"}),
+    ("Embedded C, then C++ and C#", {"c", "c++", "c#"}),
+    ("Built CI/CD pipelines", {"ci/cd"}),
+    ("Code on GitHub", {"github"}),
+    ("git, node.js", {"git", "node.js"}),
+    ("Django and Algorithms", set())
+])
+def test_matches_whole_surface_forms_only(matcher, text, expected):
+    assert matcher.find(text) == expected
+
+def test_aliases_map_to_their_canonical_skills(matcher):
+    assert matcher.find("Golang services on k8s, some JS") == {"go", "kubernetes", "javascript"}
+
+def test_matching_ignores_case(matcher):
+    assert matcher.find("JAVA, Github") == {"java", "github"}
+
+def test_empty_matcher_finds_nothing():
+    assert SkillMatcher([]).find("python java go") == set()
@@ -0,0 +1,20 @@
+import pytest
+
+from main import take_within_budget
+
+@pytest.mark.parametrize("blocks, max_chars, expected", [
+    (["abcde", "fghij"], 5, ("abcde", True)),
+    (["ab", "cd", "efghijk"], 6, ("ab\ncd", True)),
+    (["ab", "cd", "efghijk"], 7, ("ab\ncd\ne", True)),
+    (["ab", "cd"], 5, ("ab\ncd", False)),
+    (["ab", "cd"], 4, ("ab\nc", True)),
+    (["abcdefgh"], 3, ("abc", True)),
+    ([], 10, ("", False))
+])
+def test_take_within_budget(blocks, max_chars, expected):
+    assert take_within_budget(blocks, max_chars) == expected
+
+@pytest.mark.parametrize("max_chars", range(0, 30))
+def test_result_never_exceeds_budget(max_chars):
+    text, _ = take_within_budget(["abcde", "fghij", "klmnopqrst", "u"], max_chars)
+    assert len(text) <= max_chars
@@ -0,0 +1,230 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+class CandidateStore:
+    """SQLite candidate history with an in-memory skill bitset index
+    
+    Several workers may share one database: skill bits are allocated in
+    the database, and each worker's index pulls in rows written by the
+    others (PRAGMA data_version tells when) before answering.
+    """
+    
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            "id TEXT PRIMARY KEY, text BLOB NOT NULL, original_score INTEGER NOT NULL, "
+            "optimized_score INTEGER NOT NULL, skills_bits BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        # Append-only skill -> bit mapping keeps stored bitsets valid across taxonomy reloads
+        self.db.execute("CREATE TABLE IF NOT EXISTS skill_bits (skill TEXT PRIMARY KEY, bit INTEGER NOT NULL)")
+        self.db.commit()
+        # Writes go through their own connection, so they never hold the index lock
+        self.writer = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self.write_lock = threading.Lock()
+        self.lock = threading.Lock()
+        
+        self.bit_of: Dict[str, int] = {}
+        self.skill_of: Dict[int, str] = {}
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.bits = np.zeros((1024, 1), dtype=np.uint64)
+        self.scores = np.zeros(1024, dtype=np.int16)
+        self.data_version: Optional[int] = None
+        self.last_rowid = 0
+        with self.lock:
+            self._sync()
+    
+    # -- bitset helpers ------------------------------------------------------
+    
+    def _words(self) -> int:
+        return self.bits.shape[1]
+    
+    @staticmethod
+    def _decode(blob: bytes) -> np.ndarray:
+        padded = blob + b"\x00" * (-len(blob) % 8)
+        return np.frombuffer(padded, dtype="<u8").astype(np.uint64)
+    
+    def _encode(self, skill_keys: Iterable[str]) -> bytes:
+        """Bitset of skill keys, allocating bits for new skills (inside the writer's transaction)"""
+        value = 0
+        for key in skill_keys:
+            bit = self.bit_of.get(key)
+            if bit is None:
+                # Another worker may have allocated it already; the write lock on the database orders us
+                self.writer.execute(
+                    "INSERT OR IGNORE INTO skill_bits (skill, bit) "
+                    "VALUES (?, (SELECT COALESCE(MAX(bit), -1) + 1 FROM skill_bits))", (key,)
+                )
+                bit = self.writer.execute("SELECT bit FROM skill_bits WHERE skill = ?", (key,)).fetchone()[0]
+            value |= 1 << bit
+        return value.to_bytes(max(8, (value.bit_length() + 63) // 64 * 8), "little")
+    
+    def _sync(self):
+        """Pull skill bits and candidate rows committed since the last call (caller holds the lock)"""
+        version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version:
+            return
+        self.data_version = version
+        
+        for skill, bit in self.db.execute("SELECT skill, bit FROM skill_bits"):
+            self.bit_of[skill] = bit
+            self.skill_of[bit] = skill
+        # INSERT OR REPLACE gives a row a new rowid, so updates show up here too
+        for rowid, candidate_id, original_score, skills_bits in self.db.execute(
+            "SELECT rowid, id, original_score, skills_bits FROM candidates WHERE rowid > ? ORDER BY rowid",
+            (self.last_rowid,)
+        ):
+            self._index(candidate_id, original_score, self._decode(skills_bits))
+            self.last_rowid = rowid
+    
+    def _index(self, candidate_id: str, score: int, words: np.ndarray):
+        row = self.row_of.get(candidate_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(candidate_id)
+            self.row_of[candidate_id] = row
+        
+        # Grow capacity by doubling rows, and widen when new skill bits appear
+        if row >= self.bits.shape[0] or words.size > self._words():
+            rows = max(self.bits.shape[0], 1) * (2 if row >= self.bits.shape[0] else 1)
+            width = max(self._words(), words.size)
+            bits = np.zeros((rows, width), dtype=np.uint64)
+            bits[:self.bits.shape[0], :self._words()] = self.bits
+            scores = np.zeros(rows, dtype=np.int16)
+            scores[:self.scores.size] = self.scores
+            self.bits, self.scores = bits, scores
+        
+        self.bits[row, :] = 0
+        self.bits[row, :words.size] = words
+        self.scores[row] = score
+    
+    def _mask(self, keys: Iterable[str]) -> Optional[Dict[int, np.uint64]]:
+        """Per-word masks for skill keys; None if a key was never indexed"""
+        masks: Dict[int, int] = {}
+        for key in keys:
+            bit = self.bit_of.get(key)
+            if bit is None:
+                return None
+            masks[bit // 64] = masks.get(bit // 64, 0) | (1 << (bit % 64))
+        return {word: np.uint64(value) for word, value in masks.items() if word < self._words()}
+    
+    # -- public API ----------------------------------------------------------
+    
+    def add_many(self, candidates: List[Tuple[str, str, int, int, Iterable[str]]]):
+        """Store (id, text, original_score, optimized_score, skill_keys) rows"""
+        now = time.time()
+        with self.write_lock:
+            # IMMEDIATE takes the database write lock up front: bit allocation is serialized across workers
+            self.writer.execute("BEGIN IMMEDIATE")
+            try:
+                for candidate_id, text, original_score, optimized_score, skill_keys in candidates:
+                    self.writer.execute(
+                        "INSERT OR REPLACE INTO candidates "
+                        "(id, text, original_score, optimized_score, skills_bits, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (candidate_id, zlib.compress(text.encode("utf-8")), original_score,
+                         optimized_score, self._encode(skill_keys), now)
+                    )
+                self.writer.execute("COMMIT")
+            except BaseException:
+                self.writer.execute("ROLLBACK")
+                raise
+        
+        with self.lock:
+            self._sync()
+    
+    def search(self, all_of: Iterable[str] = (), any_of: Iterable[str] = (),
+               none_of: Iterable[str] = (), min_score: int = 0, limit: int = 50) -> Tuple[List[str], int]:
+        """Candidate ids matching the boolean skill filter, best score first"""
+        with self.lock:
+            self._sync()
+            count = len(self.ids)
+            required = self._mask(all_of)
+            if required is None or count == 0:
+                return [], 0
+            
+            bits = self.bits[:count]
+            scores = self.scores[:count]
+            mask = scores >= min_score
+            
+            for word, value in required.items():
+                mask &= (bits[:, word] & value) == value
+            
+            any_keys = [key for key in any_of if key in self.bit_of]
+            if any_of:
+                any_mask = np.zeros(count, dtype=bool)
+                for word, value in (self._mask(any_keys) or {}).items():
+                    any_mask |= (bits[:, word] & value) != 0
+                mask &= any_mask
+            
+            excluded = self._mask([key for key in none_of if key in self.bit_of]) or {}
+            for word, value in excluded.items():
+                mask &= (bits[:, word] & value) == 0
+            
+            rows = np.flatnonzero(mask)
+            total = int(rows.size)
+            if total > limit:
+                rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+            rows = rows[np.argsort(-scores[rows], kind="stable")]
+            return [self.ids[row] for row in rows], total
+    
+    def get(self, candidate_id: str) -> Optional[dict]:
+        with self.lock:
+            self._sync()
+            row = self.db.execute(
+                "SELECT text, original_score, optimized_score, skills_bits, created_at "
+                "FROM candidates WHERE id = ?", (candidate_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        text, original_score, optimized_score, skills_bits, created_at = row
+        return {
+            "candidate_id": candidate_id,
+            "cv_text": zlib.decompress(text).decode("utf-8"),
+            "original_cv_score": original_score,
+            "optimized_cv_score": optimized_score,
+            "skills": self.skills_of(skills_bits),
+            "created_at": created_at
+        }
+    
+    def summaries(self, candidate_ids: List[str]) -> List[dict]:
+        """Scores and skills for ids, without decompressing the CV text"""
+        if not candidate_ids:
+            return []
+        with self.lock:
+            self._sync()
+            placeholders = ",".join("?" * len(candidate_ids))
+            rows = {
+                row[0]: row for row in self.db.execute(
+                    "SELECT id, original_score, optimized_score, skills_bits, created_at "
+                    f"FROM candidates WHERE id IN ({placeholders})", candidate_ids
+                )
+            }
+        return [
+            {
+                "candidate_id": candidate_id,
+                "original_cv_score": rows[candidate_id][1],
+                "optimized_cv_score": rows[candidate_id][2],
+                "skills": self.skills_of(rows[candidate_id][3]),
+                "created_at": rows[candidate_id][4]
+            }
+            for candidate_id in candidate_ids if candidate_id in rows
+        ]
+    
+    def skills_of(self, skills_bits: bytes) -> List[str]:
+        value = int.from_bytes(skills_bits, "little")
+        return [self.skill_of[bit] for bit in range(value.bit_length()) if value >> bit & 1]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
@@ -0,0 +1,195 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+import socket
+import sqlite3
+import threading
+import time
+
+class CounterStoreError(Exception):
+    """Raised when the shared counter store cannot be reached or answers with an error"""
+
+class MemoryCounterStore:
+    """Expiring counters in this process only (single worker, or tests)"""
+    
+    def __init__(self):
+        self.counters: Dict[str, Tuple[int, float]] = {}
+        self.lock = threading.Lock()
+        self.next_purge = 0.0
+    
+    def incr_many(self, items: Sequence[Tuple[str, int]], ttl: int) -> List[int]:
+        """Add each amount to its counter atomically; returns the new totals"""
+        now = time.time()
+        totals = []
+        with self.lock:
+            for key, amount in items:
+                value, expires_at = self.counters.get(key, (0, 0.0))
+                if expires_at < now:
+                    value = 0
+                value += amount
+                self.counters[key] = (value, now + ttl)
+                totals.append(value)
+            
+            if now >= self.next_purge:
+                self.counters = {k: v for k, v in self.counters.items() if v[1] >= now}
+                self.next_purge = now + 60
+        return totals
+    
+    def describe(self) -> str:
+        return "memory"
+
+class SQLiteCounterStore:
+    """Counters in an SQLite WAL database shared by all workers on one host"""
+    
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS counters "
+            "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self.next_purge = 0.0
+    
+    def incr_many(self, items: Sequence[Tuple[str, int]], ttl: int) -> List[int]:
+        now = time.time()
+        totals = []
+        with self.lock:
+            try:
+                # One write transaction per batch: atomic across processes
+                self.db.execute("BEGIN IMMEDIATE")
+                for key, amount in items:
+                    row = self.db.execute(
+                        "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET "
+                        "value = CASE WHEN expires_at < ? THEN excluded.value ELSE value + excluded.value END, "
+                        "expires_at = excluded.expires_at "
+                        "RETURNING value",
+                        (key, amount, now + ttl, now)
+                    ).fetchone()
+                    totals.append(row[0])
+                if now >= self.next_purge:
+                    self.db.execute("DELETE FROM counters WHERE expires_at < ?", (now,))
+                    self.next_purge = now + 60
+                self.db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                raise CounterStoreError(f"SQLite counter store: {e}") from e
+        return totals
+    
+    def describe(self) -> str:
+        return f"sqlite:{self.db_path}"
+
+class RedisCounterStore:
+    """Counters on any server speaking the Redis protocol (RESP2, INCRBY + EXPIRE)
+    
+    A minimal pipelined client, so no Redis library is required.
+    """
+    
+    def __init__(self, url: str, timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.sock: Optional[socket.socket] = None
+        self.reader = None
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+    
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode()
+        if prefix == b"-":
+            raise CounterStoreError(f"Redis error: {body.decode()}")
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b"*":
+            return [self._read_reply() for _ in range(int(body))]
+        raise CounterStoreError(f"Unexpected Redis reply: {line!r}")
+    
+    def _connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.reader = self.sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._pipeline(setup)
+    
+    def _close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+                self.reader = None
+    
+    def _pipeline(self, commands: Sequence[tuple]) -> list:
+        self.sock.sendall(b"".join(self._encode(*command) for command in commands))
+        return [self._read_reply() for _ in commands]
+    
+    def incr_many(self, items: Sequence[Tuple[str, int]], ttl: int) -> List[int]:
+        commands = []
+        for key, amount in items:
+            commands.append(("INCRBY", key, amount))
+            commands.append(("EXPIRE", key, ttl))
+        
+        with self.lock:
+            # One reconnect attempt: the server may have dropped an idle connection
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    replies = self._pipeline(commands)
+                    return replies[0::2]
+                except (OSError, ConnectionError) as e:
+                    self._close()
+                    if attempt:
+                        raise CounterStoreError(f"Redis counter store: {e}") from e
+                except CounterStoreError:
+                    self._close()
+                    raise
+    
+    def describe(self) -> str:
+        return f"redis://{self.host}:{self.port}/{self.db}"
+
+def open_counter_store(url: str, base_dir: Optional[Path] = None):
+    """Counter store from a URL: empty or memory, sqlite:///path/to.db, redis://host:port/db
+    
+    Relative SQLite paths resolve against base_dir when given.
+    """
+    if not url or url == "memory":
+        return MemoryCounterStore()
+    if url.startswith("sqlite:///"):
+        path = Path(url[len("sqlite:///"):])
+        if base_dir is not None and not path.is_absolute():
+            path = base_dir / path
+        return SQLiteCounterStore(str(path))
+    if url.startswith("redis://"):
+        return RedisCounterStore(url)
+    raise ValueError(f"Unknown counter store URL: {url}")
@@ -0,0 +1,122 @@
+from typing import FrozenSet, Iterator, NamedTuple, Optional, Tuple
+import hashlib
+import re
+import zlib
+
+from utils.lru_store import LRUStore
+from utils.skill_taxonomy import SkillTaxonomy
+
+NUMBERS_PATTERN = re.compile(r'\d+[%+]?|\d+\s*(?:ans|years|mois|months|millions?|k\b)')
+HEADER_STRIP = " \t•·-–—*#:|=_─═"
+CHUNK_SEPARATOR = re.compile(r'\n[ \t]*\n')
+CHUNK_MAX_LINES = 32  # longer paragraphs (single-spaced PDF/DOCX text) are cut further
+CHUNK_CUT_EVERY = 8  # average lines between content-defined cuts
+
+class CVFeatures(NamedTuple):
+    text: str
+    tokens: Tuple[str, ...]
+    word_count: int
+    keywords: FrozenSet[str]
+    skills: Tuple[str, ...]
+    action_verbs: FrozenSet[str]
+    education_markers: FrozenSet[str]
+    quantified_achievements: int
+    sections: Tuple[str, ...]
+    lines: Tuple[str, ...]
+    
+    @property
+    def long_words(self) -> FrozenSet[str]:
+        """Lowercase tokens longer than 3 characters, as used for match scores"""
+        return frozenset(token for token in self.tokens if len(token) > 3)
+
+def features_key(text: str) -> str:
+    """Content-addressed handle for a CV text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def detect_sections(text: str, taxonomy: SkillTaxonomy) -> Tuple[str, ...]:
+    """Section names whose headers appear on their own line, in order"""
+    sections = []
+    for line in text.splitlines():
+        header = line.strip(HEADER_STRIP).lower()
+        if not header or len(header) > 40:
+            continue
+        section = taxonomy.section_headers.get(header)
+        if section and section not in sections:
+            sections.append(section)
+    return tuple(sections)
+
+def split_chunks(text: str) -> Iterator[str]:
+    """Paragraphs of a CV, long ones cut into smaller runs of lines
+    
+    Extracted PDF/DOCX text is usually single-spaced, so blank lines alone
+    would leave one chunk. A long paragraph is cut after each line whose
+    hash hits a fixed residue (content-defined, so an edit only moves the
+    cuts next to it), and at least every CHUNK_MAX_LINES lines.
+    """
+    for paragraph in CHUNK_SEPARATOR.split(text):
+        lines = paragraph.split('\n')
+        if len(lines) <= CHUNK_MAX_LINES:
+            yield paragraph
+            continue
+        
+        start = 0
+        for index, line in enumerate(lines):
+            if (index + 1 - start >= CHUNK_MAX_LINES
+                    or zlib.crc32(line.encode("utf-8")) % CHUNK_CUT_EVERY == 0):
+                yield '\n'.join(lines[start:index + 1])
+                start = index + 1
+        if start < len(lines):
+            yield '\n'.join(lines[start:])
+
+class ChunkFeatures(NamedTuple):
+    tokens: Tuple[str, ...]
+    keywords: FrozenSet[str]
+    quantified_achievements: int
+    sections: Tuple[str, ...]
+    lines: Tuple[str, ...]
+
+def chunk_features(chunk: str, taxonomy: SkillTaxonomy) -> ChunkFeatures:
+    """Scan one paragraph of a CV"""
+    return ChunkFeatures(
+        tokens=tuple(chunk.lower().split()),
+        keywords=frozenset(taxonomy.matcher.find(chunk)),
+        quantified_achievements=len(NUMBERS_PATTERN.findall(chunk)),
+        sections=detect_sections(chunk, taxonomy),
+        lines=tuple(line for line in chunk.split('\n') if line.strip())
+    )
+
+def extract_features(text: str, taxonomy: SkillTaxonomy, chunk_cache: Optional[LRUStore] = None) -> CVFeatures:
+    """Scan a CV once and collect everything the analyzers need
+    
+    With a chunk cache, the CV is split into paragraphs and only paragraphs
+    not seen before are scanned, so re-analysing an edited CV costs about
+    as much as the edit.
+    """
+    if chunk_cache is None:
+        parts = [chunk_features(text, taxonomy)]
+    else:
+        parts = []
+        for chunk in split_chunks(text):
+            key = (taxonomy.fingerprint, hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).digest())
+            part = chunk_cache.get(key)
+            if part is None:
+                part = chunk_features(chunk, taxonomy)
+                chunk_cache.put(key, part)
+            parts.append(part)
+    
+    tokens = tuple(token for part in parts for token in part.tokens)
+    keywords = frozenset().union(*(part.keywords for part in parts))
+    sections = tuple(dict.fromkeys(section for part in parts for section in part.sections))
+    
+    return CVFeatures(
+        text=text,
+        tokens=tokens,
+        word_count=len(tokens),
+        keywords=keywords,
+        skills=tuple(taxonomy.technical_skills(keywords)),
+        action_verbs=keywords & taxonomy.experience_keywords,
+        education_markers=keywords & taxonomy.education_keywords,
+        quantified_achievements=sum(part.quantified_achievements for part in parts),
+        sections=sections,
+        lines=tuple(line for part in parts for line in part.lines)
+    )
@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from utils.lru_store import LRUStore
+
+TERM_STRIP = ".,;:!?()[]{}<>\"'«»`*•·|/\\"
+
+class DocVector(NamedTuple):
+    ids: np.ndarray      # unique term ids (int32)
+    counts: np.ndarray   # term frequencies (float32)
+    length: int          # number of terms
+
+def rank_terms(tokens: Iterable[str]) -> List[str]:
+    """Normalize lowercase tokens for ranking (strip punctuation, drop 1-char terms)"""
+    terms = []
+    for token in tokens:
+        term = token.strip(TERM_STRIP)
+        if len(term) > 1:
+            terms.append(term)
+    return terms
+
+class CVRanker:
+    """BM25 / TF-IDF ranking of many CVs against one JD with sparse matrices"""
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_vocabulary: int = 1_000_000,
+                 cache_size: int = 20_000):
+        self.k1 = k1
+        self.b = b
+        self.max_vocabulary = max_vocabulary
+        # Append-only, so cached document vectors stay valid until a reset
+        self.vocabulary: Dict[str, int] = {}
+        self.vectors = LRUStore(max_items=cache_size)
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.active = 0  # ranking passes in progress
+    
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        """One ranking pass; the vocabulary is only reset between passes
+        
+        Vectors built during a pass index the vocabulary of that pass, so a
+        full vocabulary waits for running passes to finish before starting over.
+        """
+        with self.idle:
+            if len(self.vocabulary) >= self.max_vocabulary:
+                self.idle.wait_for(lambda: self.active == 0)
+                if len(self.vocabulary) >= self.max_vocabulary:
+                    self.vocabulary = {}
+                    self.vectors = LRUStore(max_items=self.vectors.max_items)
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.idle:
+                self.active -= 1
+                if self.active == 0:
+                    self.idle.notify_all()
+    
+    def _term_ids(self, terms: List[str], grow: bool) -> np.ndarray:
+        with self.lock:
+            ids = []
+            for term in terms:
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    if not grow:
+                        continue
+                    term_id = self.vocabulary[term] = len(self.vocabulary)
+                ids.append(term_id)
+        return np.asarray(ids, dtype=np.int32)
+    
+    def cached(self, key: str) -> Optional[DocVector]:
+        return self.vectors.get(key)
+    
+    def doc_vector(self, key: str, tokens: Iterable[str]) -> DocVector:
+        """Build and cache the term-count vector of a CV under its content key"""
+        ids = self._term_ids(rank_terms(tokens), grow=True)
+        unique, counts = np.unique(ids, return_counts=True)
+        vector = DocVector(unique.astype(np.int32), counts.astype(np.float32), len(ids))
+        self.vectors.put(key, vector)
+        return vector
+    
+    def _matrix(self, docs: List[DocVector]) -> sparse.csr_matrix:
+        indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum([len(doc.ids) for doc in docs], out=indptr[1:])
+        indices = np.concatenate([doc.ids for doc in docs]) if docs else np.zeros(0, np.int32)
+        data = np.concatenate([doc.counts for doc in docs]) if docs else np.zeros(0, np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(docs), len(self.vocabulary)))
+    
+    def scores(self, query_tokens: Iterable[str], docs: List[DocVector], mode: str = "bm25") -> np.ndarray:
+        """Score every document against the query in a few vectorized passes"""
+        n_docs = len(docs)
+        if n_docs == 0:
+            return np.zeros(0, dtype=np.float32)
+        
+        query_ids = np.unique(self._term_ids(rank_terms(query_tokens), grow=False))
+        matrix = self._matrix(docs)
+        if query_ids.size == 0:
+            return np.zeros(n_docs, dtype=np.float32)
+        
+        if mode == "tfidf":
+            return self._tfidf(matrix, query_ids)
+        return self._bm25(matrix, query_ids, docs)
+    
+    def _bm25(self, matrix: sparse.csr_matrix, query_ids: np.ndarray, docs: List[DocVector]) -> np.ndarray:
+        n_docs = matrix.shape[0]
+        query_matrix = matrix[:, query_ids].tocsr()
+        
+        df = np.bincount(query_matrix.indices, minlength=query_ids.size)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        
+        doc_len = np.fromiter((doc.length for doc in docs), dtype=np.float32, count=n_docs)
+        avg_len = max(float(doc_len.mean()), 1.0)
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+        
+        rows = np.repeat(np.arange(n_docs), np.diff(query_matrix.indptr))
+        tf = query_matrix.data
+        query_matrix.data = tf * (self.k1 + 1) / (tf + norm[rows])
+        return np.asarray(query_matrix @ idf).ravel()
+    
+    def _tfidf(self, matrix: sparse.csr_matrix, query_ids: np.ndarray) -> np.ndarray:
+        n_docs = matrix.shape[0]
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        
+        weighted = matrix.copy()
+        weighted.data = (1 + np.log(weighted.data)) * idf[weighted.indices]
+        doc_norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        doc_norms[doc_norms == 0] = 1
+        
+        query_weights = idf[query_ids]
+        query_norm = float(np.sqrt((query_weights ** 2).sum())) or 1.0
+        scores = np.asarray(weighted[:, query_ids] @ query_weights).ravel()
+        return scores / (doc_norms * query_norm)
+    
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Indices and scores of the k best documents, best first"""
+        if scores.size == 0 or k <= 0:
+            return []
+        k = min(k, scores.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best]
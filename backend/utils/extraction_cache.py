@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+class ExtractionCache:
+    """Content-addressed cache of extraction results (memory LRU + optional SQLite tier)"""
+    
+    # Bump whenever the shape of cached extraction results changes
+    KEY_VERSION = 2
+    # Disk writes between two passes of disk eviction
+    PRUNE_INTERVAL = 100
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, db_path: str = "",
+                 max_rows: int = 50_000, ttl: int = 30 * 24 * 3600, limits: Tuple[int, ...] = ()):
+        self.max_bytes = max_bytes
+        # Extraction settings that shape the result (page cap, char cap) are part of the key
+        self.limits = limits
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.puts_since_prune = 0
+        self.disk_evicted = 0
+        self.current_bytes = 0
+        self.store: "OrderedDict[str, Tuple[tuple, int]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS extractions "
+                "(key TEXT PRIMARY KEY, payload BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS extractions_created ON extractions (created_at)")
+            self._prune_disk()
+    
+    @staticmethod
+    def new_hasher():
+        return hashlib.blake2b(digest_size=20)
+    
+    def make_key_from_hasher(self, hasher, file_ext: str) -> str:
+        limits = "-".join(str(limit) for limit in self.limits)
+        return f"v{self.KEY_VERSION}:{limits}:{hasher.hexdigest()}{file_ext.lower()}"
+    
+    def make_key(self, file_bytes: bytes, file_ext: str) -> str:
+        """Hash of file content plus extension and extraction limits"""
+        hasher = self.new_hasher()
+        hasher.update(file_bytes)
+        return self.make_key_from_hasher(hasher, file_ext)
+    
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        with self.db_lock:
+            row = self.db.execute(
+                "SELECT payload FROM extractions WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return tuple(json.loads(zlib.decompress(row[0]))) if row is not None else None
+    
+    def _disk_put(self, key: str, value: tuple):
+        payload = zlib.compress(json.dumps(list(value)).encode("utf-8"))
+        with self.db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO extractions (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, payload, time.time())
+            )
+            self.puts_since_prune += 1
+            if self.puts_since_prune >= self.PRUNE_INTERVAL:
+                self._prune_disk()
+            else:
+                self.db.commit()
+    
+    async def get(self, key: str) -> Optional[tuple]:
+        with self.lock:
+            entry = self.store.get(key)
+            if entry is not None:
+                self.store.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        
+        # SQLite reads and decompression run off the event loop
+        if self.db is not None:
+            value = await asyncio.to_thread(self._disk_get, key)
+            if value is not None:
+                with self.lock:
+                    self._put_memory(key, value)
+                    self.disk_hits += 1
+                return value
+        
+        with self.lock:
+            self.misses += 1
+        return None
+    
+    async def put(self, key: str, value: tuple):
+        with self.lock:
+            self._put_memory(key, value)
+        if self.db is not None:
+            await asyncio.to_thread(self._disk_put, key, value)
+    
+    def _prune_disk(self):
+        """Drop expired rows, then the oldest ones beyond max_rows (caller holds db_lock)"""
+        deleted = self.db.execute(
+            "DELETE FROM extractions WHERE created_at < ?", (time.time() - self.ttl,)
+        ).rowcount
+        deleted += self.db.execute(
+            "DELETE FROM extractions WHERE key IN "
+            "(SELECT key FROM extractions ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        ).rowcount
+        self.db.commit()
+        self.disk_evicted += deleted
+        self.puts_since_prune = 0
+    
+    def _put_memory(self, key: str, value: tuple):
+        # Caller holds the lock
+        size = sum(len(v) if isinstance(v, str) else 8 for v in value)
+        if size > self.max_bytes:
+            return
+        
+        previous = self.store.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= previous[1]
+        
+        self.store[key] = (value, size)
+        self.current_bytes += size
+        
+        # Evict least recently used entries until we fit the byte budget
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.store.popitem(last=False)
+            self.current_bytes -= evicted_size
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self.store),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_evicted": self.disk_evicted,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import asyncio
+import os
+
+class PoolSaturatedError(Exception):
+    """Raised when the extraction queue is full"""
+
+class WorkerCrashedError(PoolSaturatedError):
+    """Raised when a worker process died mid-job; the pool has been replaced"""
+
+class ExtractionPool:
+    """Bounded process pool running CPU-heavy parsing off the event loop"""
+    
+    def __init__(self, max_workers: int = 0, max_queue: int = 16, timeout: float = 30.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.recycled = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+    
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+    
+    def restart(self):
+        """Send new jobs to fresh workers; jobs already submitted finish on the old ones"""
+        old = self.executor
+        self.executor = None
+        self.start()
+        if old is not None:
+            old.shutdown(wait=False)
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Replace a broken or stuck executor; jobs still on it fail with BrokenProcessPool"""
+        if self.executor is not executor:
+            return  # another caller already replaced it
+        self.executor = None
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        self.recycled += 1
+        self.start()
+    
+    def _release(self, future: asyncio.Future):
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()  # consume it so a timed-out job doesn't warn later
+    
+    async def run(self, func: Callable, *args) -> Any:
+        """Run func(*args) in a worker process, bounded by queue depth and timeout"""
+        if self.pending >= self.capacity:
+            raise PoolSaturatedError(f"Extraction queue full ({self.capacity} jobs)")
+        
+        self.start()
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            self._recycle(executor)
+            raise WorkerCrashedError("Extraction worker died; pool restarted") from e
+        
+        # The slot is held until the worker really finishes or the pool is replaced
+        self.pending += 1
+        future.add_done_callback(self._release)
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except BrokenProcessPool as e:
+            # A worker was killed (OOM, segfault on a hostile file): every job on
+            # this executor fails, and it would refuse new ones until replaced
+            self._recycle(executor)
+            raise WorkerCrashedError("Extraction worker died; pool restarted") from e
+        except asyncio.TimeoutError:
+            # A running process job can't be interrupted; replace the pool so the
+            # stuck worker doesn't hold its slot forever
+            self._recycle(executor)
+            raise
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "capacity": self.capacity,
+            "recycled": self.recycled,
+            "saturation": round(self.pending / self.capacity, 3)
+        }
@@ -0,0 +1,33 @@
+from typing import Dict, FrozenSet, NamedTuple, Tuple
+
+from utils.skill_taxonomy import SkillTaxonomy
+
+PRIORITY_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+
+class JDProfile(NamedTuple):
+    text: str
+    tokens: Tuple[str, ...]
+    words: FrozenSet[str]
+    required_skills: Tuple[str, ...]
+    skill_weights: Dict[str, float]
+
+def build_jd_profile(jd_text: str, taxonomy: SkillTaxonomy) -> JDProfile:
+    """Tokenize a job description once and weight the skills it asks for"""
+    tokens = tuple(jd_text.lower().split())
+    found = taxonomy.matcher.find(jd_text)
+    required = sorted(
+        (key for key in found if key in taxonomy.skills),
+        key=taxonomy.order.get
+    )
+    weights = {
+        key: PRIORITY_WEIGHTS.get(taxonomy.skills[key].priority, 1.0)
+        for key in required
+    }
+    
+    return JDProfile(
+        text=jd_text,
+        tokens=tokens,
+        words=frozenset(w for w in tokens if len(w) > 3),
+        required_skills=tuple(required),
+        skill_weights=weights
+    )
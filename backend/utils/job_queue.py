@@ -0,0 +1,306 @@
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free slot"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def owner_alive(owner: Optional[str], current: str) -> bool:
+    """Whether the JobQueue that owns a job ("pid:boot id") may still be running it
+    
+    Our own pid under another boot id is a previous incarnation of this
+    process slot, so it is gone; a pid we may not signal still exists.
+    """
+    if owner == current:
+        return True
+    pid, _, _ = (owner or "").partition(":")
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MemoryJobBackend:
+    """Job records in a dict (lost on restart)"""
+    
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+    
+    def create(self, job: dict):
+        with self.lock:
+            self.jobs[job["id"]] = job
+    
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def update(self, job_id: str, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+    
+    def reclaim(self, owner: str) -> List[dict]:
+        return []
+    
+    def purge_expired(self, now: float) -> int:
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items() if job["expires_at"] and job["expires_at"] < now]
+            for job_id in expired:
+                del self.jobs[job_id]
+            return len(expired)
+
+class SQLiteJobBackend:
+    """Job records in SQLite, so queued jobs and results survive a restart"""
+    
+    COLUMNS = ("id", "kind", "payload", "status", "result", "error",
+               "created_at", "started_at", "finished_at", "expires_at", "owner")
+    
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, expires_at REAL, owner TEXT)"
+        )
+        # Stores created before jobs had an owner
+        if "owner" not in {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self.db.commit()
+        self.lock = threading.Lock()
+    
+    def _row_to_job(self, row) -> dict:
+        job = dict(zip(self.COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+    
+    def create(self, job: dict):
+        values = [job[column] for column in self.COLUMNS]
+        values[2] = json.dumps(values[2])
+        values[4] = json.dumps(values[4]) if values[4] is not None else None
+        with self.lock:
+            self.db.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                values
+            )
+            self.db.commit()
+    
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+    
+    def update(self, job_id: str, **fields):
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self.lock:
+            self.db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self.db.commit()
+    
+    def reclaim(self, owner: str) -> List[dict]:
+        """Take over unfinished jobs whose owner is gone, oldest first
+        
+        Several processes may share the store; jobs queued or running in a
+        live sibling stay with it. Each take-over is a conditional UPDATE,
+        so two processes starting together never claim the same job.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        
+        claimed = []
+        for job in map(self._row_to_job, rows):
+            if owner_alive(job["owner"], owner):
+                continue
+            with self.lock:
+                taken = self.db.execute(
+                    "UPDATE jobs SET owner = ?, status = ?, started_at = NULL WHERE id = ? AND owner IS ?",
+                    (owner, QUEUED, job["id"], job["owner"])
+                ).rowcount
+                self.db.commit()
+            if taken:
+                claimed.append(job)
+        return claimed
+    
+    def purge_expired(self, now: float) -> int:
+        with self.lock:
+            deleted = self.db.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (now,)
+            ).rowcount
+            self.db.commit()
+        return deleted
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed number of async workers
+    
+    Handlers are async callables taking the job payload and returning a
+    JSON-serializable result. Finished jobs are kept for result_ttl seconds.
+    Backend calls run in a thread, so a SQLite commit never blocks the loop.
+    """
+    
+    def __init__(self, backend, handlers: Dict[str, Callable[[dict], Awaitable[Any]]],
+                 max_queue: int = 100, workers: int = 4, result_ttl: int = 3600):
+        self.backend = backend
+        self.handlers = handlers
+        self.max_queue = max_queue
+        self.worker_count = workers
+        self.result_ttl = result_ttl
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:12]}"  # stamped on every job this queue holds
+        self.queue: Optional[asyncio.Queue] = None
+        self.reserved = 0  # slots held by submissions still being written to the backend
+        self.tasks: List[asyncio.Task] = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.avg_duration = 1.0  # seconds, exponential moving average
+    
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+    
+    def start(self):
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        
+        # Re-enqueue what a dead process left behind (persistent backends only)
+        for job in self.backend.reclaim(self.owner):
+            if self.queue.full():
+                self.backend.update(job["id"], status=FAILED, error="Queue full after restart",
+                                    finished_at=time.time(), expires_at=time.time() + self.result_ttl)
+                continue
+            self.queue.put_nowait(job["id"])
+        
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self.tasks.append(asyncio.create_task(self._janitor()))
+    
+    async def shutdown(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queue = None
+    
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up, for Retry-After"""
+        backlog = self.depth + self.running
+        return max(1, int(self.avg_duration * backlog / max(self.worker_count, 1)) + 1)
+    
+    async def submit(self, kind: str, payload: dict) -> dict:
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        if self.queue is None:
+            self.start()
+        if self.queue.qsize() + self.reserved >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Job queue full ({self.max_queue} jobs)", self.retry_after())
+        
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "payload": payload,
+            "status": QUEUED,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+            "owner": self.owner
+        }
+        self.reserved += 1
+        try:
+            await asyncio.to_thread(self.backend.create, job)
+        finally:
+            self.reserved -= 1
+        self.queue.put_nowait(job["id"])
+        return job
+    
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await asyncio.to_thread(self.backend.get, job_id)
+        if job is not None and job["expires_at"] and job["expires_at"] < time.time():
+            return None
+        return job
+    
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self.queue.task_done()
+    
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.backend.get, job_id)
+        if job is None:
+            return
+        
+        started = time.time()
+        await asyncio.to_thread(self.backend.update, job_id, status=RUNNING, started_at=started)
+        self.running += 1
+        try:
+            result = await self.handlers[job["kind"]](job["payload"])
+            status, error = DONE, None
+            self.completed += 1
+        except asyncio.CancelledError:
+            # Shutdown mid-run: leave it RUNNING so a persistent backend retries it
+            raise
+        except Exception as e:
+            result, status, error = None, FAILED, getattr(e, "detail", None) or str(e) or type(e).__name__
+            self.failed += 1
+        finally:
+            self.running -= 1
+        
+        finished = time.time()
+        self.avg_duration = 0.8 * self.avg_duration + 0.2 * (finished - started)
+        await asyncio.to_thread(self.backend.update, job_id, status=status, result=result, error=error,
+                                finished_at=finished, expires_at=finished + self.result_ttl)
+    
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(max(min(self.result_ttl, 60), 1))
+            await asyncio.to_thread(self.backend.purge_expired, time.time())
+    
+    def stats(self) -> dict:
+        return {
+            "queued": self.depth,
+            "running": self.running,
+            "workers": self.worker_count,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_duration": round(self.avg_duration, 3)
+        }
@@ -0,0 +1,170 @@
+from typing import Any, Iterable, List, Optional, Tuple
+import json
+
+WHITESPACE = " \t\r\n"
+
+class JSONObjectStream:
+    """Incremental parser for one top-level JSON object arriving in chunks
+    
+    feed() returns events as soon as they can be decided:
+    ("field", key, value) once a top-level member is complete, and
+    ("delta", key, text) for decoded pieces of string values whose key is
+    listed in stream_keys. Text before the opening brace (e.g. a ```json
+    fence) is skipped.
+    """
+    
+    def __init__(self, stream_keys: Iterable[str] = ()):
+        self.stream_keys = frozenset(stream_keys)
+        self.state = "start"
+        self.key_raw: List[str] = []
+        self.key: Optional[str] = None
+        self.value_raw: List[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.decoded: List[str] = []
+        self.escape_buf = ""
+        self.high_surrogate = ""
+        self.result: dict = {}
+    
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+    
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        delta: List[str] = []
+        
+        for ch in chunk:
+            state = self.state
+            
+            if state == "stream_string":
+                if self.escape_buf:
+                    self.escape_buf += ch
+                    if self.escape_buf[1] == "u" and len(self.escape_buf) < 6:
+                        continue
+                    self._decode_escape(delta)
+                elif ch == "\\":
+                    self.escape_buf = ch
+                elif ch == '"':
+                    if self.high_surrogate:
+                        delta.append(self.high_surrogate)
+                        self.high_surrogate = ""
+                    self._flush_delta(delta, events)
+                    self._finish_value("".join(self.decoded), events)
+                else:
+                    delta.append(ch)
+                    self.decoded.append(ch)
+            
+            elif state == "value":
+                self.value_raw.append(ch)
+                if self.in_string:
+                    if self.escaped:
+                        self.escaped = False
+                    elif ch == "\\":
+                        self.escaped = True
+                    elif ch == '"':
+                        self.in_string = False
+                        if self.depth == 0:
+                            self._finish_value(json.loads("".join(self.value_raw)), events)
+                elif self.depth == 0 and (ch in WHITESPACE or ch in ",}]"):
+                    # Scalar (number / true / false / null) ends at its delimiter,
+                    # which may be the closing brace itself in compact output
+                    self.value_raw.pop()
+                    self._finish_value(json.loads("".join(self.value_raw)), events)
+                    if ch not in WHITESPACE:
+                        self._after_value(ch)
+                elif ch == '"':
+                    self.in_string = True
+                elif ch in "{[":
+                    self.depth += 1
+                elif ch in "}]":
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self._finish_value(json.loads("".join(self.value_raw)), events)
+            
+            elif state == "start":
+                if ch == "{":
+                    self.state = "key_or_end"
+            
+            elif state == "key_or_end":
+                if ch == '"':
+                    self.key_raw = []
+                    self.escaped = False
+                    self.state = "key"
+                elif ch == "}":
+                    self.state = "done"
+                elif ch not in WHITESPACE and ch != ",":
+                    raise ValueError(f"Unexpected {ch!r} where a key was expected")
+            
+            elif state == "key":
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.key = json.loads('"' + "".join(self.key_raw) + '"')
+                    self.state = "colon"
+                    continue
+                self.key_raw.append(ch)
+            
+            elif state == "colon":
+                if ch == ":":
+                    self.state = "value_start"
+                elif ch not in WHITESPACE:
+                    raise ValueError(f"Unexpected {ch!r} where ':' was expected")
+            
+            elif state == "value_start":
+                if ch in WHITESPACE:
+                    continue
+                if ch == '"' and self.key in self.stream_keys:
+                    self.decoded = []
+                    self.escape_buf = ""
+                    self.state = "stream_string"
+                    continue
+                self.value_raw = [ch]
+                self.depth = 1 if ch in "{[" else 0
+                self.in_string = ch == '"'
+                self.escaped = False
+                self.state = "value"
+            
+            elif state == "after_value":
+                if ch not in WHITESPACE:
+                    self._after_value(ch)
+        
+        self._flush_delta(delta, events)
+        return events
+    
+    def _decode_escape(self, delta: List[str]):
+        text = json.loads('"' + self.escape_buf + '"')
+        self.escape_buf = ""
+        # Hold a UTF-16 high surrogate until its pair arrives
+        if "\ud800" <= text <= "\udbff":
+            self.high_surrogate = text
+            return
+        if self.high_surrogate:
+            if "\udc00" <= text <= "\udfff":
+                text = (self.high_surrogate + text).encode("utf-16", "surrogatepass").decode("utf-16")
+            else:
+                text = self.high_surrogate + text
+            self.high_surrogate = ""
+        delta.append(text)
+        self.decoded.append(text)
+    
+    def _flush_delta(self, delta: List[str], events: List[Tuple[str, str, Any]]):
+        if delta:
+            events.append(("delta", self.key, "".join(delta)))
+            delta.clear()
+    
+    def _finish_value(self, value: Any, events: List[Tuple[str, str, Any]]):
+        self.result[self.key] = value
+        events.append(("field", self.key, value))
+        self.state = "after_value"
+    
+    def _after_value(self, ch: str):
+        if ch == ",":
+            self.state = "key_or_end"
+        elif ch == "}":
+            self.state = "done"
+        else:
+            raise ValueError(f"Unexpected {ch!r} after a value")
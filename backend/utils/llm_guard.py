@@ -0,0 +1,110 @@
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import random
+import time
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM could not answer within its deadline or retry budget"""
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+class LLMRequestRejectedError(LLMUnavailableError):
+    """Raised when the LLM API refuses the request itself (bad key, unknown model, prompt too long)"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class InvalidLLMReplyError(LLMUnavailableError):
+    """Raised when the LLM answered with something that isn't the requested JSON"""
+    
+    def __init__(self, message: str, content: str = ""):
+        super().__init__(message)
+        self.content = content
+
+class LLMReplyTruncatedError(InvalidLLMReplyError):
+    """Raised when the reply stopped at max_tokens (finish_reason "length")"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = self.CLOSED
+        self.probe_in_flight = False
+        self.trips = 0
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.probe_in_flight = False
+        self.state = self.CLOSED
+    
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """Give back a half-open probe slot without judging upstream health"""
+        self.probe_in_flight = False
+    
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips
+        }
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from Retry-After / retry-after-ms response headers"""
+    if headers is None:
+        return None
+    
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -1,31 +1,140 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, Optional
 
-def setup_logger(name: str, log_file: str = "app.log", level: str = "INFO"):
-    """Configure structured logging"""
+# Id of the request being handled, set by RequestIdMiddleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request id, message, extras"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ContextFilter(logging.Filter):
+    """Stamp the request id and sample records per level, in the calling thread
+    
+    Runs before the record is queued, so sampled-out records cost no I/O and
+    the request id is read from the caller's context, not the listener's.
+    """
+    
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.sample_rates = {
+            logging.getLevelName(level.upper()): rate for level, rate in (sample_rates or {}).items()
+        }
+        self.sampled_out = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render arguments and traceback now, keep extras for the JSON line
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logger(
+    name: str,
+    log_file: str = "app.log",
+    level: str = "INFO",
+    sample_rates: Optional[Dict[str, float]] = None,
+    queue_size: int = 10_000,
+    log_dir: str = "logs"
+):
+    """Configure structured logging
+    
+    Callers only enqueue records; a background listener thread formats them
+    as JSON lines and writes them to stdout and log_dir/log_file. Calling it
+    again for the same name returns the logger as already configured.
+    """
     logger = logging.getLogger(name)
+    if getattr(logger, "queue_listener", None) is not None:
+        return logger
+    
     logger.setLevel(getattr(logging, level.upper()))
+    logger.propagate = False
+    formatter = JSONFormatter()
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter(
-        '%(asctime)s | %(name)s | %(levelname)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(console_formatter)
+    console_handler.setFormatter(formatter)
     
     # File handler
-    Path("logs").mkdir(exist_ok=True)
-    file_handler = logging.FileHandler(f"logs/{log_file}")
+    Path(log_dir).mkdir(parents=True, exist_ok=True)
+    file_handler = logging.FileHandler(Path(log_dir) / log_file, encoding="utf-8")
     file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(
-        '%(asctime)s | %(name)s | %(levelname)s | %(funcName)s:%(lineno)d | %(message)s'
+    file_handler.setFormatter(formatter)
+    
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(ContextFilter(sample_rates))
+    listener = logging.handlers.QueueListener(
+        queue_handler.queue, console_handler, file_handler, respect_handler_level=True
     )
-    file_handler.setFormatter(file_formatter)
+    listener.start()
+    atexit.register(listener.stop)  # drain what is still queued on exit
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(queue_handler)
+    logger.queue_listener = listener
+    logger.queue_handler = queue_handler
     
     return logger
+
+def logger_stats(logger: logging.Logger) -> dict:
+    handler = getattr(logger, "queue_handler", None)
+    if handler is None:
+        return {}
+    return {
+        "queued": handler.queue.qsize(),
+        "dropped": handler.dropped,
+        "sampled_out": sum(f.sampled_out for f in handler.filters if isinstance(f, ContextFilter))
+    }
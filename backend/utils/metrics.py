@@ -0,0 +1,187 @@
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import inspect
+import threading
+import time
+
+# Seconds; the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class StageSeries:
+    """One thread's accumulators for one stage (only that thread writes them)"""
+    
+    __slots__ = ("counts", "total", "errors", "in_flight")
+    
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.errors = 0
+        self.in_flight = 0
+
+class StageTimer:
+    """Context manager timing one run of a stage"""
+    
+    __slots__ = ("metrics", "series", "started")
+    
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.series = metrics._series(stage)
+        self.started = 0.0
+    
+    def __enter__(self):
+        self.series.in_flight += 1
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        series = self.series
+        elapsed = time.perf_counter() - self.started
+        series.counts[bisect_left(self.metrics.buckets, elapsed)] += 1
+        series.total += elapsed
+        series.in_flight -= 1
+        if exc_type is not None:
+            series.errors += 1
+        return False
+
+class Metrics:
+    """Per-stage latency histograms, error counters and in-flight gauges
+    
+    Every thread writes to its own accumulators, so recording takes no
+    lock; a scrape sums them across threads. Gauges are callbacks read at
+    scrape time (cache hit ratios, pool depth, loop lag).
+    """
+    
+    def __init__(self, namespace: str = "cv", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.local = threading.local()
+        self.shards: List[Dict[str, StageSeries]] = []
+        self.register_lock = threading.Lock()  # taken once per thread, never when recording
+        self.gauges: List[Tuple[str, str, Callable[[], Union[float, Dict[str, float]]], str]] = []
+    
+    def _series(self, stage: str) -> StageSeries:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = {}
+            with self.register_lock:
+                self.shards.append(shard)
+        series = shard.get(stage)
+        if series is None:
+            series = shard[stage] = StageSeries(len(self.buckets) + 1)
+        return series
+    
+    def stage(self, name: str) -> StageTimer:
+        return StageTimer(self, name)
+    
+    def timed(self, name: str):
+        """Decorator timing every call of a sync or async function as a stage"""
+        def decorate(func):
+            if inspect.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with StageTimer(self, name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+            
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with StageTimer(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+    
+    def gauge(self, name: str, help_text: str, read: Callable[[], Union[float, Dict[str, float]]], label: str = ""):
+        """Register a gauge read at scrape time; read() returns a value or {label value: value}"""
+        self.gauges.append((name, help_text, read, label))
+    
+    def snapshot(self) -> Dict[str, dict]:
+        """Stage totals summed over all threads"""
+        with self.register_lock:
+            shards = list(self.shards)
+        
+        merged: Dict[str, dict] = {}
+        for shard in shards:
+            for stage, series in list(shard.items()):
+                entry = merged.setdefault(stage, {
+                    "counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "errors": 0, "in_flight": 0
+                })
+                for index, count in enumerate(series.counts):
+                    entry["counts"][index] += count
+                entry["sum"] += series.total
+                entry["errors"] += series.errors
+                entry["in_flight"] += series.in_flight
+        return merged
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        ns = self.namespace
+        stages = sorted(self.snapshot().items())
+        lines = [
+            f"# HELP {ns}_stage_duration_seconds Time spent in each processing stage",
+            f"# TYPE {ns}_stage_duration_seconds histogram"
+        ]
+        for stage, entry in stages:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                lines.append(f'{ns}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            count = cumulative + entry["counts"][-1]
+            lines.append(f'{ns}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{ns}_stage_duration_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'{ns}_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+        
+        lines.append(f"# HELP {ns}_stage_errors_total Stage runs that raised")
+        lines.append(f"# TYPE {ns}_stage_errors_total counter")
+        lines.extend(f'{ns}_stage_errors_total{{stage="{stage}"}} {entry["errors"]}' for stage, entry in stages)
+        lines.append(f"# HELP {ns}_stage_in_flight Stage runs in progress")
+        lines.append(f"# TYPE {ns}_stage_in_flight gauge")
+        lines.extend(f'{ns}_stage_in_flight{{stage="{stage}"}} {entry["in_flight"]}' for stage, entry in stages)
+        
+        for name, help_text, read, label in self.gauges:
+            try:
+                value = read()
+            except Exception:
+                continue  # a broken gauge must not break the scrape
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} gauge")
+            if isinstance(value, dict):
+                lines.extend(f'{ns}_{name}{{{label}="{key}"}} {float(v)}' for key, v in value.items() if v is not None)
+            elif value is not None:
+                lines.append(f"{ns}_{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+class LoopLagMonitor:
+    """Measures event-loop lag: how late a periodic sleep wakes up"""
+    
+    def __init__(self, interval: float = 0.5, window: int = 120):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self.lag = 0.0
+        self.task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+    
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.samples.append(self.lag)
+    
+    def stats(self) -> dict:
+        return {
+            "lag_ms": round(self.lag * 1000, 2),
+            "max_lag_ms": round(max(self.samples, default=0.0) * 1000, 2),
+            "window_s": round(self.interval * len(self.samples), 1)
+        }
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Sequence, Set, Tuple
+import threading
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+class MinHasher:
+    """MinHash signatures over word shingles"""
+    
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Fixed seed: signatures stay comparable across workers and restarts
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    
+    def shingles(self, tokens: Sequence[str]) -> np.ndarray:
+        size = self.shingle_size
+        if len(tokens) < size:
+            grams = [" ".join(tokens)] if tokens else []
+        else:
+            grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+        # crc32 rather than hash(): stable across processes (no hash randomization)
+        return np.unique(np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)
+        ))
+    
+    def signature(self, tokens: Sequence[str]) -> np.ndarray:
+        hashes = self.shingles(tokens)
+        if hashes.size == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1)
+
+def estimate_jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    return float(np.count_nonzero(left == right)) / left.size
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Bands and rows whose S-curve threshold (1/b)^(1/r) is closest to the target"""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures, bounded with LRU eviction"""
+    
+    def __init__(self, num_perm: int = 128, threshold: float = 0.85, max_items: int = 50_000):
+        self.threshold = threshold
+        self.max_items = max_items
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self.signatures: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self.buckets: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(self.bands)]
+        self.lock = threading.Lock()
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+    
+    def insert(self, key: Hashable, signature: np.ndarray):
+        with self.lock:
+            if key in self.signatures:
+                self.signatures.move_to_end(key)
+                return
+            self.signatures[key] = signature
+            for band, band_key in enumerate(self._band_keys(signature)):
+                self.buckets[band].setdefault(band_key, set()).add(key)
+            
+            while len(self.signatures) > self.max_items:
+                old_key, old_signature = self.signatures.popitem(last=False)
+                for band, band_key in enumerate(self._band_keys(old_signature)):
+                    bucket = self.buckets[band].get(band_key)
+                    if bucket is not None:
+                        bucket.discard(old_key)
+                        if not bucket:
+                            del self.buckets[band][band_key]
+    
+    def query(self, signature: np.ndarray) -> List[Tuple[Hashable, float]]:
+        """Stored keys whose estimated Jaccard similarity meets the threshold, best first"""
+        with self.lock:
+            candidates: Set[Hashable] = set()
+            for band, band_key in enumerate(self._band_keys(signature)):
+                candidates |= self.buckets[band].get(band_key, set())
+            
+            matches = []
+            for key in candidates:
+                similarity = estimate_jaccard(signature, self.signatures[key])
+                if similarity >= self.threshold:
+                    matches.append((key, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+    
+    def __len__(self) -> int:
+        return len(self.signatures)
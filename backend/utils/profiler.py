@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from contextvars import ContextVar
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+import cProfile
+import io
+import marshal
+import pstats
+import secrets
+import threading
+import time
+import uuid
+
+# Profile of the request being handled, if it asked for one
+current_profile: ContextVar[Optional["ProfileSession"]] = ContextVar("current_profile", default=None)
+
+class ProfileLimitError(Exception):
+    """Raised when the maximum number of concurrent profiles is reached"""
+
+class RawStats:
+    """Wraps a raw stats dict so pstats.Stats can load it"""
+    
+    def __init__(self, stats: dict):
+        self.stats = stats
+    
+    def create_stats(self):
+        pass
+
+def profiled_call(func: Callable, *args) -> Tuple[Any, dict]:
+    """Run func(*args) under cProfile (in a worker process); (result, raw stats)"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args)
+    profiler.create_stats()
+    return result, profiler.stats
+
+class ProfileSession:
+    """cProfile around one request, plus stats sent back by worker processes"""
+    
+    def __init__(self, store: "ProfileStore", label: str):
+        self.store = store
+        self.label = label
+        self.profile_id = uuid.uuid4().hex  # known up front, so it can go in the response headers
+        self.profiler = cProfile.Profile()
+        self.worker_stats: List[dict] = []
+        self.started = 0.0
+    
+    def add_worker_stats(self, stats: dict):
+        self.worker_stats.append(stats)
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        self.store._finish(self, time.perf_counter() - self.started)
+        return False
+
+class ProfileStore:
+    """Bounded store of request profiles, kept as pstats data
+    
+    cProfile hooks the whole event-loop thread while enabled, so a profile
+    also shows whatever else the loop ran meanwhile; keep max_concurrent at 1
+    (two profilers on one thread would steal each other's events).
+    """
+    
+    def __init__(self, max_concurrent: int = 1, max_stored: int = 20):
+        self.max_concurrent = max_concurrent
+        self.max_stored = max_stored
+        self.active = 0
+        self.profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def start(self, label: str) -> ProfileSession:
+        with self.lock:
+            if self.active >= self.max_concurrent:
+                raise ProfileLimitError(f"{self.active} profile(s) already running")
+            self.active += 1
+        return ProfileSession(self, label)
+    
+    def _finish(self, session: ProfileSession, duration: float):
+        stats = pstats.Stats(session.profiler)
+        for raw in session.worker_stats:
+            stats.add(RawStats(raw))
+        
+        profile = {
+            "id": session.profile_id,
+            "label": session.label,
+            "created_at": time.time(),
+            "duration": round(duration, 4),
+            "functions": len(stats.stats),
+            "worker_profiles": len(session.worker_stats),
+            "pstats": marshal.dumps(stats.stats)
+        }
+        with self.lock:
+            self.active -= 1
+            self.profiles[profile["id"]] = profile
+            while len(self.profiles) > self.max_stored:
+                self.profiles.popitem(last=False)
+    
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self.lock:
+            return self.profiles.get(profile_id)
+    
+    def summaries(self) -> List[dict]:
+        """Stored profiles without their data, newest first"""
+        with self.lock:
+            return [
+                {key: value for key, value in profile.items() if key != "pstats"}
+                for profile in reversed(self.profiles.values())
+            ]
+    
+    @staticmethod
+    def as_text(profile: dict, sort: str = "cumulative", limit: int = 50) -> str:
+        """Human-readable top functions, as printed by pstats"""
+        stream = io.StringIO()
+        stats = pstats.Stats(RawStats(marshal.loads(profile["pstats"])), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+class ProfilingMiddleware:
+    """Profile a request that sends X-Profile: 1 with the admin API key
+    
+    Only installed when profiling is enabled, so other requests never reach
+    it. The profile id is returned in the X-Profile-Id header.
+    """
+    
+    def __init__(self, app: ASGIApp, store: ProfileStore, api_key: str, paths: Iterable[str]):
+        self.app = app
+        self.store = store
+        self.api_key = api_key
+        self.paths = set(paths)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1":
+            await self.app(scope, receive, send)
+            return
+        
+        api_key = headers.get(b"x-api-key", b"")
+        if not api_key or not secrets.compare_digest(api_key, self.api_key.encode("utf-8")):
+            response = JSONResponse(status_code=401, content={"error": "Clé API invalide", "status_code": 401})
+            await response(scope, receive, send)
+            return
+        
+        try:
+            session = self.store.start(f"{scope['method']} {scope['path']}")
+        except ProfileLimitError:
+            response = JSONResponse(
+                status_code=429,
+                content={"error": "Profilage déjà en cours, réessayez plus tard", "status_code": 429},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", session.profile_id.encode())]
+            await send(message)
+        
+        token = current_profile.set(session)
+        try:
+            with session:
+                await self.app(scope, receive, send_with_id)
+        finally:
+            current_profile.reset(token)
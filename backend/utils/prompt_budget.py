@@ -0,0 +1,213 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import re
+
+from utils.cv_features import HEADER_STRIP
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a local estimate
+    tiktoken = None
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# "Page 2", "page 2 of 3", "2 / 3": a page word, or a small n/m (dates like 09/2019 don't match)
+PAGE_MARKER = re.compile(r'^(?:page\s*(\d+)(?:\s*(?:/|of|sur|de)\s*(\d+))?|(\d{1,2})\s*(?:/|of|sur)\s*(\d{1,2}))$', re.IGNORECASE)
+RUNNING_LINE_REACH = 2  # lines from a page boundary where running headers/footers sit
+BOILERPLATE_LINES = {"curriculum vitae", "page"}
+TRUNCATION_MARKER = "[…]"
+
+# Which CV sections survive first when a prompt has to be trimmed
+SECTION_PRIORITY = [
+    "header", "summary", "experience", "skills", "education",
+    "projects", "certifications", "other", "languages", "interests"
+]
+ESSENTIAL_RANK = SECTION_PRIORITY.index("other")
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "") -> int:
+    """Token count with tiktoken when installed, else a close estimate
+    
+    The estimate counts words and punctuation, plus one token per extra
+    four characters of long words, which tracks BPE counts on CV text.
+    """
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    return sum(1 + (len(piece) - 1) // 4 for piece in TOKEN_PATTERN.findall(text))
+
+def is_page_marker(line: str) -> bool:
+    match = PAGE_MARKER.match(line)
+    if match is None:
+        return False
+    if match.group(3) is not None:
+        return 0 < int(match.group(3)) <= int(match.group(4))
+    return match.group(2) is None or int(match.group(1)) <= int(match.group(2))
+
+def compact_text(text: str) -> str:
+    """Collapse whitespace and drop layout boilerplate (rules, page markers, running headers)"""
+    lines: List[str] = []
+    boundaries = [0]  # positions in lines where a page starts or ends
+    for raw in text.replace("\r", "\n").splitlines():
+        line = " ".join(raw.split())
+        if line and not line.strip(HEADER_STRIP):
+            line = ""  # decorative rule
+        elif is_page_marker(line):
+            boundaries.append(len(lines))
+            continue
+        elif line.lower() in BOILERPLATE_LINES:
+            continue
+        lines.append(line)
+    boundaries.append(len(lines))
+    
+    # Running headers/footers: lines repeated three or more times, every time
+    # next to a page boundary. Repeats elsewhere (job titles, bullets) are content.
+    positions: Dict[str, List[int]] = {}
+    for index, line in enumerate(lines):
+        if line:
+            positions.setdefault(line, []).append(index)
+    
+    def near_boundary(index: int) -> bool:
+        return any(
+            boundary - RUNNING_LINE_REACH <= index < boundary + RUNNING_LINE_REACH for boundary in boundaries
+        )
+    
+    running = {
+        line for line, found in positions.items()
+        if len(found) >= 3 and len(boundaries) > 2 and all(near_boundary(index) for index in found)
+    }
+    seen = set()
+    compacted: List[str] = []
+    for line in lines:
+        if line in running:
+            if line in seen:
+                continue
+            seen.add(line)
+        if not line and (not compacted or not compacted[-1]):
+            continue
+        compacted.append(line)
+    return "\n".join(compacted).strip()
+
+class PromptBuilder:
+    """Fits prompt inputs into a token budget, trimming low-priority CV sections first"""
+    
+    def __init__(self, max_input_tokens: int, section_headers: Dict[str, str], model: str = ""):
+        self.max_input_tokens = max_input_tokens
+        self.section_headers = section_headers
+        self.model = model
+    
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+    
+    def split_sections(self, text: str) -> List[Tuple[str, List[str]]]:
+        """(section name, lines) in document order, starting with the untitled header block"""
+        sections: List[Tuple[str, List[str]]] = [("header", [])]
+        for line in text.splitlines():
+            header = line.strip(HEADER_STRIP).lower()
+            if header and len(header) <= 40 and header in self.section_headers:
+                sections.append((self.section_headers[header], [line]))
+            else:
+                sections[-1][1].append(line)
+        return [(name, lines) for name, lines in sections if any(lines)]
+    
+    def fit(self, text: str, budget: int) -> Tuple[str, bool]:
+        """Text within budget tokens, keeping whole high-priority sections; (text, trimmed)"""
+        if self.count(text) <= budget:
+            return text, False
+        
+        sections = self.split_sections(text)
+        marker_cost = self.count(TRUNCATION_MARKER) + 1
+        remaining = budget
+        kept: Dict[int, List[str]] = {}
+        
+        def rank(index: int) -> int:
+            name = sections[index][0]
+            return SECTION_PRIORITY.index(name if name in SECTION_PRIORITY else "other")
+        
+        costs = [[self.count(line) + 1 for line in lines] for _, lines in sections]
+        order = sorted(range(len(sections)), key=rank)
+        
+        # Pass 1: essential sections that fit whole, so one long section can't starve them
+        for index in order:
+            if rank(index) <= ESSENTIAL_RANK and sum(costs[index]) <= remaining:
+                kept[index] = sections[index][1]
+                remaining -= sum(costs[index])
+        
+        # Pass 2: the rest in priority order, leading lines first
+        for index in order:
+            if index in kept:
+                continue
+            lines = sections[index][1]
+            if sum(costs[index]) <= remaining:
+                kept[index] = lines
+                remaining -= sum(costs[index])
+                continue
+            
+            partial = []
+            room = remaining - marker_cost
+            for line, cost in zip(lines, costs[index]):
+                if cost > room:
+                    if not partial and room > 0:
+                        # One oversized line (e.g. text without breaks): cut it conservatively
+                        partial.append(line[:room * 3])
+                        room = 0
+                    break
+                partial.append(line)
+                room -= cost
+            if partial:
+                kept[index] = partial + [TRUNCATION_MARKER]
+                remaining = room
+        
+        if not kept:
+            # A single giant line: cut by characters at a conservative ratio
+            return text[:max(budget, 0) * 3] + TRUNCATION_MARKER, True
+        return "\n".join(line for index in sorted(kept) for line in kept[index]), True
+    
+    def build(self, template: str, fields: Sequence[Tuple[str, str, float]],
+              max_field_tokens: Optional[int] = None) -> Tuple[str, int, bool]:
+        """Render template with compacted fields sharing the input budget
+        
+        fields are (placeholder, text, share). Each field first gets up to its
+        share of the room left after the template itself; room a field doesn't
+        need goes to the others. max_field_tokens further caps what the fields
+        may take together. Returns (prompt, prompt tokens, trimmed).
+        """
+        overhead = self.count(template.format(**{name: "" for name, _, _ in fields}))
+        limit = self.max_input_tokens
+        if max_field_tokens is not None:
+            limit = min(limit, overhead + max_field_tokens)
+        
+        # Compaction is lossy; a prompt that already fits goes out verbatim
+        prompt = template.format(**{name: text for name, text, _ in fields})
+        tokens = self.count(prompt)
+        if tokens <= limit:
+            return prompt, tokens, False
+        
+        texts = {name: compact_text(text) for name, text, _ in fields}
+        available = max(limit - overhead, 0)
+        
+        needs = {name: self.count(texts[name]) for name in texts}
+        budgets = {name: min(needs[name], int(available * share)) for name, _, share in fields}
+        spare = available - sum(budgets.values())
+        for name, _, _ in fields:
+            extra = min(needs[name] - budgets[name], spare)
+            budgets[name] += extra
+            spare -= extra
+        
+        trimmed = False
+        for name in texts:
+            texts[name], was_trimmed = self.fit(texts[name], budgets[name])
+            trimmed = trimmed or was_trimmed
+        
+        prompt = template.format(**texts)
+        return prompt, self.count(prompt), trimmed
+    
+    def stats(self) -> dict:
+        return {
+            "max_input_tokens": self.max_input_tokens,
+            "tokenizer": "tiktoken" if tiktoken is not None else "estimate"
+        }
@@ -1,39 +1,253 @@
 from fastapi import HTTPException, Request
-from collections import defaultdict
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
 import asyncio
+import math
+import threading
+import time
+import zlib
+
+from utils.counter_store import CounterStoreError
 
 class RateLimiter:
-    def __init__(self, requests: int = 10, period: int = 60):
+    """Token bucket per client: `requests` per `period` seconds, bursts up to `requests`
+    
+    Each key costs one (tokens, last_seen) tuple. Keys are spread over
+    sharded LRU maps, each with its own lock; a key idle long enough to
+    have refilled completely is evicted, since it is equivalent to a new
+    one, and each shard is capped at max_keys / shards entries.
+    """
+    
+    def __init__(self, requests: int = 10, period: int = 60, scope: str = "",
+                 max_keys: int = 100_000, shards: int = 16):
         self.requests = requests
         self.period = period
-        self.store = defaultdict(list)
-        self.lock = asyncio.Lock()
+        self.scope = scope
+        self.rate = requests / period  # tokens per second
+        self.idle_after = period  # a full refill takes one period
+        self.shard_cap = max(max_keys // shards, 1)
+        self.shards: List["OrderedDict[str, Tuple[float, float]]"] = [OrderedDict() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.evicted = 0
+        self.rejected = 0
     
-    async def check_rate_limit(self, identifier: str) -> bool:
-        """Check if request is within rate limit"""
-        async with self.lock:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=self.period)
-            
-            # Clean old entries
-            self.store[identifier] = [
-                timestamp for timestamp in self.store[identifier]
-                if timestamp > cutoff
-            ]
+    def _shard(self, identifier: str) -> int:
+        return zlib.crc32(identifier.encode("utf-8")) % len(self.shards)
+    
+    def acquire(self, identifier: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take cost tokens for identifier; (allowed, seconds until enough tokens)"""
+        index = self._shard(identifier)
+        buckets = self.shards[index]
+        now = time.monotonic()
+        
+        with self.locks[index]:
+            state = buckets.pop(identifier, None)
+            if state is None:
+                tokens = float(self.requests)
+            else:
+                tokens = min(self.requests, state[0] + (now - state[1]) * self.rate)
             
-            if len(self.store[identifier]) >= self.requests:
-                return False
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            buckets[identifier] = (tokens, now)  # re-inserted at the most recent end
             
-            self.store[identifier].append(now)
-            return True
+            # Amortized eviction: the oldest entries are the idlest ones
+            while buckets:
+                oldest_key, (_, last_seen) = next(iter(buckets.items()))
+                if len(buckets) <= self.shard_cap and now - last_seen < self.idle_after:
+                    break
+                del buckets[oldest_key]
+                self.evicted += 1
+        
+        if allowed:
+            return True, 0.0
+        self.rejected += 1
+        return False, (cost - tokens) / self.rate
+    
+    async def check_rate_limit(self, identifier: str) -> bool:
+        """Check if request is within rate limit"""
+        allowed, _ = self.acquire(identifier)
+        return allowed
     
     async def __call__(self, request: Request):
         # Use IP address as identifier
-        client_ip = request.client.host
+        client_ip = request.client.host if request.client else "unknown"
         
-        if not await self.check_rate_limit(client_ip):
+        allowed, retry_after = self.acquire(client_ip)
+        if not allowed:
             raise HTTPException(
                 status_code=429,
-                detail=f"Rate limit exceeded. Max {self.requests} requests per {self.period}s"
+                detail=f"Rate limit exceeded. Max {self.requests} requests per {self.period}s",
+                headers={"Retry-After": str(math.ceil(retry_after))}
             )
+    
+    def stats(self) -> dict:
+        return {
+            "scope": self.scope,
+            "limit": f"{self.requests}/{self.period}s",
+            "keys": sum(len(shard) for shard in self.shards),
+            "rejected": self.rejected,
+            "evicted": self.evicted
+        }
+
+class SharedRateLimiter:
+    """Sliding-window-counter limit shared by every worker through a counter store
+    
+    Hits are counted locally and pushed to the store in batches (every
+    sync_interval seconds or batch_size hits) by a background task, which
+    also pulls back the global totals. Decisions never wait on the store;
+    cross-worker overshoot is bounded by one batch per worker. If the
+    store is unreachable the limiter fails open and keeps the hits for the
+    next flush.
+    """
+    
+    def __init__(self, store, requests: int = 10, period: int = 60, scope: str = "",
+                 max_keys: int = 100_000, sync_interval: float = 0.5, batch_size: int = 50):
+        self.store = store
+        self.requests = requests
+        self.period = period
+        self.scope = scope
+        self.max_keys = max_keys
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.pending: Dict[str, int] = {}
+        self.pending_hits = 0
+        self.known: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # window key -> (global total, synced at)
+        self.stale: Set[str] = set()
+        self.last_flush = 0.0
+        self.flush_task: Optional[asyncio.Task] = None
+        self.rejected = 0
+        self.flushes = 0
+        self.store_errors = 0
+    
+    def _global_count(self, key: str, now: float) -> int:
+        entry = self.known.get(key)
+        if entry is None or now - entry[1] > self.sync_interval:
+            self.stale.add(key)
+        return entry[0] if entry is not None else 0
+    
+    def acquire(self, identifier: str) -> Tuple[bool, float]:
+        now = time.time()
+        window, offset = divmod(now, self.period)
+        fraction = offset / self.period
+        current = f"rl:{self.scope}:{identifier}:{int(window)}"
+        previous = f"rl:{self.scope}:{identifier}:{int(window) - 1}"
+        
+        current_count = self._global_count(current, now) + self.pending.get(current, 0)
+        previous_count = self._global_count(previous, now)
+        
+        # Previous window weighted by how much of it still overlaps the sliding window
+        if previous_count * (1 - fraction) + current_count < self.requests:
+            self.pending[current] = self.pending.get(current, 0) + 1
+            self.pending_hits += 1
+            allowed, retry_after = True, 0.0
+        else:
+            self.rejected += 1
+            allowed = False
+            room = self.requests - 1 - current_count
+            if room < 0 or previous_count == 0:
+                retry_after = (1 - fraction) * self.period
+            else:
+                retry_after = max(1 - room / previous_count - fraction, 0) * self.period
+        
+        if self.pending_hits >= self.batch_size or now - self.last_flush >= self.sync_interval:
+            self._schedule_flush()
+        return allowed, retry_after
+    
+    def _schedule_flush(self):
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.get_running_loop().create_task(self.flush())
+    
+    async def flush(self):
+        """Push pending hits and refresh stale totals in one store round trip"""
+        self.last_flush = time.time()
+        if not self.pending and not self.stale:
+            return
+        
+        items = list(self.pending.items())
+        items.extend((key, 0) for key in self.stale if key not in self.pending)
+        self.pending = {}
+        self.pending_hits = 0
+        self.stale = set()
+        
+        try:
+            totals = await asyncio.to_thread(self.store.incr_many, items, 2 * self.period)
+        except CounterStoreError:
+            self.store_errors += 1
+            # Keep the hits for the next attempt, bounded so an outage can't grow them forever
+            if len(self.pending) < self.max_keys:
+                for key, amount in items:
+                    if amount:
+                        self.pending[key] = self.pending.get(key, 0) + amount
+                        self.pending_hits += amount
+            return
+        
+        self.flushes += 1
+        synced_at = time.time()
+        for (key, _), total in zip(items, totals):
+            # Hits counted locally while the round trip was in flight stay in pending
+            self.known[key] = (total, synced_at)
+            self.known.move_to_end(key)
+        while len(self.known) > self.max_keys:
+            self.known.popitem(last=False)
+    
+    async def __call__(self, request: Request):
+        client_ip = request.client.host if request.client else "unknown"
+        
+        allowed, retry_after = self.acquire(client_ip)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded. Max {self.requests} requests per {self.period}s",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+            )
+    
+    def stats(self) -> dict:
+        return {
+            "scope": self.scope,
+            "limit": f"{self.requests}/{self.period}s",
+            "store": self.store.describe(),
+            "keys": len(self.known),
+            "pending_hits": self.pending_hits,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "store_errors": self.store_errors
+        }
+
+class DailyQuota:
+    """Per-identity daily call quota (UTC days) kept in a counter store"""
+    
+    def __init__(self, store, limit: int):
+        self.store = store
+        self.limit = limit
+        self.rejected = 0
+        self.store_errors = 0
+    
+    async def consume(self, identity: str) -> Tuple[bool, int]:
+        """Count one call; (allowed, seconds until the quota resets)"""
+        if self.limit <= 0:
+            return True, 0
+        
+        now = datetime.now(timezone.utc)
+        key = f"quota:{identity}:{now:%Y%m%d}"
+        try:
+            total = (await asyncio.to_thread(self.store.incr_many, [(key, 1)], 2 * 86400))[0]
+        except CounterStoreError:
+            self.store_errors += 1
+            return True, 0  # fail open: an outage of the store shouldn't block analyses
+        
+        if total <= self.limit:
+            return True, 0
+        self.rejected += 1
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return False, math.ceil((midnight - now).total_seconds())
+    
+    def stats(self) -> dict:
+        return {
+            "daily_limit": self.limit,
+            "store": self.store.describe(),
+            "rejected": self.rejected,
+            "store_errors": self.store_errors
+        }
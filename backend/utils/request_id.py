@@ -0,0 +1,34 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import re
+import uuid
+
+from utils.logger import request_id_var
+
+# Ids accepted from callers: short and log-safe
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class RequestIdMiddleware:
+    """Tag each request with an id (the caller's X-Request-ID or a new one) for log correlation"""
+    
+    def __init__(self, app: ASGIApp, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = dict(scope["headers"]).get(self.header, b"").decode("latin-1")
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex[:16]
+        # Each request runs in its own context, so exception handlers outside this
+        # middleware still see the id; no reset needed
+        request_id_var.set(request_id)
+        
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (self.header, request_id.encode("latin-1"))]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_id)
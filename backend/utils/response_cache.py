@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.lru_store import LRUStore
+
+class LeaderCancelledError(Exception):
+    """Set on a coalesced call whose leader was cancelled; waiters retry"""
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) TTL cache with request coalescing"""
+    
+    def __init__(self, max_items: int = 1024, ttl: int = 7 * 24 * 3600, db_path: str = ""):
+        self.ttl = ttl
+        self.memory = LRUStore(max_items=max_items, ttl=ttl)
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, payload BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+    
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Stable hash of the call parameters (model, temperature, template version, inputs)"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+    
+    def _disk_get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload FROM responses WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+    
+    def _disk_put(self, key: str, value: Any):
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, payload, time.time() + self.ttl)
+            )
+            self.db.commit()
+    
+    async def _get_from_disk(self, key: str) -> Optional[Any]:
+        if self.db is not None:
+            value = await asyncio.to_thread(self._disk_get, key)
+            if value is not None:
+                self.memory.put(key, value)
+                self.disk_hits += 1
+                return value
+        
+        self.misses += 1
+        return None
+    
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        return await self._get_from_disk(key)
+    
+    async def put(self, key: str, value: Any):
+        self.memory.put(key, value)
+        if self.db is not None:
+            await asyncio.to_thread(self._disk_put, key, value)
+    
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Any:
+        """Cached value for key, else run compute() once for all concurrent callers
+        
+        compute returns (value, cacheable); fallback answers are returned
+        to every waiter but not stored. If the caller running compute() is
+        cancelled, the others retry instead of being cancelled with it.
+        """
+        while True:
+            value = self.memory.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            
+            # Singleflight: identical concurrent requests share one upstream call
+            pending = self.in_flight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except LeaderCancelledError:
+                continue
+        
+        # Registered before the first await, so later callers coalesce onto it
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            value = await self._get_from_disk(key)
+            if value is None:
+                value, cacheable = await compute()
+                if cacheable:
+                    await self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(LeaderCancelledError())
+            future.exception()  # retrieved here so an unawaited future doesn't warn
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight),
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,47 @@
+from typing import Dict, Iterable, Set
+import re
+
+class SkillMatcher:
+    """Single-pass keyword matcher compiled from a trie of surface forms"""
+    
+    def __init__(self, keywords: Iterable[str], aliases: Dict[str, Iterable[str]] = None):
+        # Every surface form maps to the canonical keywords it implies
+        self.mapping: Dict[str, Set[str]] = {}
+        for keyword in keywords:
+            self.mapping.setdefault(keyword.lower(), set()).add(keyword.lower())
+        for surface, targets in (aliases or {}).items():
+            self.mapping.setdefault(surface.lower(), set()).update(t.lower() for t in targets)
+        
+        # Word boundaries stop 'go' matching "good" and 'java' matching "javascript"
+        body = self._trie_pattern(self._build_trie(self.mapping)) if self.mapping else "(?!)"
+        self.pattern = re.compile(rf"(?<!\w)(?:{body})(?!\w)", re.IGNORECASE)
+    
+    @staticmethod
+    def _build_trie(words: Iterable[str]) -> dict:
+        trie: dict = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = True
+        return trie
+    
+    @classmethod
+    def _trie_pattern(cls, node: dict) -> str:
+        """Turn a trie into a regex whose cost doesn't grow with the keyword count"""
+        branches = [re.escape(char) + cls._trie_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            # Greedy optional: the longest keyword wins ('github' over 'git')
+            return f"(?:{pattern})?"
+        return pattern
+    
+    def find(self, text: str) -> Set[str]:
+        """Return every canonical keyword present in text"""
+        found: Set[str] = set()
+        for match in self.pattern.finditer(text):
+            found |= self.mapping.get(match.group(0).lower(), set())
+        return found
@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+import hashlib
+import json
+
+from utils.skill_matcher import SkillMatcher
+
+PRIORITIES = ("high", "medium", "low")
+
+class Skill(NamedTuple):
+    key: str
+    name: str
+    category: str
+    technical: bool
+    priority: Optional[str]
+    suggestion: Optional[str]
+
+class SkillTaxonomy:
+    """Immutable, compiled view of the skill taxonomy data file"""
+    
+    def __init__(self, data: dict, source: str = ""):
+        self.source = source
+        self.version = data.get("version", 1)
+        # Identifies this exact content, so caches can tell taxonomies apart after a reload
+        self.fingerprint = hashlib.blake2b(
+            json.dumps(data, sort_keys=True).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        
+        skills = []
+        aliases: Dict[str, set] = {}
+        for entry in data.get("skills", []):
+            priority = entry.get("priority")
+            if priority is not None and priority not in PRIORITIES:
+                raise ValueError(f"Invalid priority '{priority}' for skill '{entry['key']}'")
+            
+            key = entry["key"].lower()
+            skills.append(Skill(
+                key=key,
+                name=entry.get("name", entry["key"]),
+                category=entry.get("category", ""),
+                technical=entry.get("technical", True),
+                priority=priority,
+                suggestion=entry.get("suggestion")
+            ))
+            # A skill implies itself plus anything listed in "implies"; aliases inherit both
+            implied = {key, *(k.lower() for k in entry.get("implies", []))}
+            for surface in [key, *entry.get("aliases", [])]:
+                aliases.setdefault(surface.lower(), set()).update(implied)
+        
+        for surface, targets in data.get("keyword_aliases", {}).items():
+            aliases.setdefault(surface.lower(), set()).update(t.lower() for t in targets)
+        
+        self.skills: Dict[str, Skill] = {skill.key: skill for skill in skills}
+        self.key_by_name: Dict[str, str] = {skill.name.lower(): skill.key for skill in skills}
+        self.order: Dict[str, int] = {skill.key: index for index, skill in enumerate(skills)}
+        self.technical_keys: FrozenSet[str] = frozenset(s.key for s in skills if s.technical)
+        self.experience_keywords: FrozenSet[str] = frozenset(
+            w.lower() for w in data.get("experience_keywords", [])
+        )
+        self.education_keywords: FrozenSet[str] = frozenset(
+            w.lower() for w in data.get("education_keywords", [])
+        )
+        
+        # Section header line (lowercase) -> section name
+        self.section_headers: Dict[str, str] = {
+            header.lower(): section
+            for section, headers in data.get("sections", {}).items()
+            for header in headers
+        }
+        
+        # Gap candidates grouped by priority, in file order
+        self.gaps_by_priority: Dict[str, Tuple[Skill, ...]] = {
+            priority: tuple(s for s in skills if s.suggestion and s.priority == priority)
+            for priority in PRIORITIES
+        }
+        
+        self.matcher = SkillMatcher(
+            list(self.skills) + list(self.experience_keywords) + list(self.education_keywords),
+            aliases
+        )
+    
+    @classmethod
+    def load(cls, path: Path) -> "SkillTaxonomy":
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle), source=str(path))
+    
+    def resolve(self, name: str) -> Optional[str]:
+        """Skill key for a key, display name or alias (e.g. 'k8s' -> 'kubernetes')"""
+        lower = name.strip().lower()
+        if lower in self.skills:
+            return lower
+        if lower in self.key_by_name:
+            return self.key_by_name[lower]
+        implied = sorted(
+            (key for key in self.matcher.mapping.get(lower, ()) if key in self.skills),
+            key=self.order.get
+        )
+        return implied[0] if implied else None
+    
+    def display_names(self, keys) -> list:
+        """Display names for skill keys, in taxonomy order (unknown keys last)"""
+        ordered = sorted(keys, key=lambda key: self.order.get(key, len(self.order)))
+        return [self.skills[key].name if key in self.skills else key for key in ordered]
+    
+    def technical_skills(self, found_keywords: FrozenSet[str]) -> list:
+        """Display names of detected technical skills, in taxonomy order"""
+        keys = sorted(found_keywords & self.technical_keys, key=self.order.get)
+        return [self.skills[key].name for key in keys]
+    
+    def stats(self) -> dict:
+        return {
+            "source": self.source,
+            "version": self.version,
+            "skills": len(self.skills),
+            "surface_forms": len(self.matcher.mapping)
+        }
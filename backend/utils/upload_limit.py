@@ -0,0 +1,44 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Iterable
+
+class UploadLimitMiddleware:
+    """Reject oversized request bodies before they are buffered"""
+    
+    def __init__(self, app: ASGIApp, max_body_size: int, paths: Iterable[str] = ("/extract",)):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.paths = set(paths)
+    
+    def _too_large(self) -> str:
+        return f"Requête trop volumineuse. Max {self.max_body_size // (1024 * 1024)}MB"
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        # Fast path: trust Content-Length when the client sends one
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse(
+                status_code=413,
+                content={"error": self._too_large(), "status_code": 413}
+            )
+            await response(scope, receive, send)
+            return
+        
+        # Chunked or lying clients: count bytes as the multipart parser pulls them
+        received = 0
+        
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(413, self._too_large())
+            return message
+        
+        await self.app(scope, limited_receive, send)